@@ -0,0 +1,166 @@
+"""
+Analytics Engine Benchmark
+
+Compares the legacy multi-pass analytics calculations with the single-pass
+AnalyticsAggregate engine (row accumulators and, when NumPy is installed, the
+columnar accumulators) on synthetic invoice sets, and checks that every
+analytics section serializes to byte-identical JSON.
+
+Usage:
+    python3 benchmarks/analytics_benchmark.py [--sizes 1000,10000,100000] [--repeat 3] [--seed 42]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'common_lib'))
+
+import analytics_columnar
+from analytics_aggregate import AnalyticsAggregate
+from legacy_analytics import LegacyAnalytics
+
+SECTIONS = {
+    'summary': ('_calculate_summary_metrics', 'build_summary_metrics'),
+    'revenue_analytics': ('_calculate_revenue_analytics', 'build_revenue_analytics'),
+    'service_analytics': ('_calculate_service_analytics', 'build_service_analytics'),
+    'product_analytics': ('_calculate_product_analytics', 'build_product_analytics'),
+    'customer_analytics': ('_calculate_customer_analytics', 'build_customer_analytics'),
+    'vehicle_analytics': ('_calculate_vehicle_analytics', 'build_vehicle_analytics'),
+    'payment_analytics': ('_calculate_payment_analytics', 'build_payment_analytics'),
+    'booking_analytics': ('_calculate_booking_analytics', 'build_booking_analytics'),
+    'trend_analytics': ('_calculate_trend_analytics', 'build_trend_analytics'),
+    'operational_metrics': ('_calculate_operational_metrics', 'build_operational_metrics')
+}
+
+START_DATE = '2024-01-01'
+END_DATE = '2024-12-31'
+
+
+def make_invoices(count, seed):
+    """Generate synthetic invoices shaped like the Invoices table analyticsData records"""
+    rng = random.Random(seed)
+    services = ['Pre-Purchase Inspection', 'Comprehensive Inspection', 'Roadworthy Check', 'Diagnostic Scan']
+    items = ['Brake Pads', 'Oil Filter', 'Engine Oil 5L', 'Wiper Blades', 'Air Filter', 'Spark Plugs']
+    makes = ['Toyota', 'Ford', 'Mazda', 'Holden', 'Hyundai', 'Kia ', '']
+    models = ['Camry', 'Ranger', 'CX-5', 'Commodore', 'i30', 'Corolla', '']
+    years = ['2012', '2018', '2021', '1899', '', 2016, 2020.0]
+
+    invoices = []
+    for index in range(count):
+        invoice = {
+            'invoiceId': f"inv-{index}",
+            'createdAt': 1704067200 + rng.randint(0, 365 * 86400),
+            'status': 'generated'
+        }
+        if rng.random() < 0.02:
+            # Invoices without analytics data only count towards the period total
+            invoices.append(invoice)
+            continue
+
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        invoice['analyticsData'] = {
+            'operation_type': 'transaction',
+            'operation_data': {
+                'services': [
+                    {'service_name': rng.choice(services), 'price': str(rng.choice([99, 189.5, 249, 329.95]))}
+                    for _ in range(rng.randint(0, 2))
+                ],
+                'orders': [
+                    {
+                        'item_name': rng.choice(items),
+                        'quantity': str(rng.randint(1, 4)),
+                        'total_price': str(rng.randint(500, 40000) / 100)
+                    }
+                    for _ in range(rng.randint(0, 3))
+                ],
+                'customerId': rng.choice([f"customer{index % 400}@example.com", f"user{index % 90}@mail.com.au", '', 'walk-in']),
+                'vehicleDetails': {
+                    'make': rng.choice(makes),
+                    'model': rng.choice(models),
+                    'year': rng.choice(years)
+                },
+                'paymentDetails': {
+                    'payment_method': rng.choice(['stripe', 'cash', 'bank_transfer']),
+                    'amount': str(rng.randint(2000, 120000) / 100),
+                    'paid_before_operation': rng.choice([0, 1])
+                },
+                'bookingDetails': {
+                    'bookedBy': rng.choice(['NONE', 'STAFF', f"user{index % 30}@example.com"]),
+                    'bookedDate': rng.choice([f"2024-{month:02d}-{day:02d}", ''])
+                },
+                'effectiveDate': rng.choice([f"{day:02d}/{month:02d}/2024", f"{day}/{month}/2024", ''])
+            }
+        }
+        invoices.append(invoice)
+    return invoices
+
+
+def run_legacy(invoices):
+    legacy = LegacyAnalytics()
+    valid_invoices = [
+        invoice for invoice in invoices
+        if invoice.get('analyticsData') and invoice.get('analyticsData', {}).get('operation_data')
+    ]
+    result = {}
+    for section, (method_name, _) in SECTIONS.items():
+        method = getattr(legacy, method_name)
+        if section in ('revenue_analytics', 'trend_analytics'):
+            result[section] = method(valid_invoices, START_DATE, END_DATE)
+        else:
+            result[section] = method(valid_invoices)
+    return result
+
+
+def run_single_pass(invoices, columnar):
+    aggregate = AnalyticsAggregate().add_invoices(invoices, columnar=columnar)
+    return {section: getattr(aggregate, builder)() for section, (_, builder) in SECTIONS.items()}
+
+
+def time_run(function, repeat):
+    """Return (best seconds, result) over repeat runs"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analytics engines')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma separated invoice counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per engine (best time is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    args = parser.parse_args()
+
+    engines = [('single-pass', lambda invoices: run_single_pass(invoices, False))]
+    if analytics_columnar.is_available():
+        engines.append(('columnar', lambda invoices: run_single_pass(invoices, True)))
+    else:
+        print('NumPy is not installed; skipping the columnar engine')
+
+    print(f"{'invoices':>10} {'engine':>12} {'seconds':>10} {'speedup':>9}  output")
+    identical = True
+    for size in [int(size) for size in args.sizes.split(',')]:
+        invoices = make_invoices(size, args.seed)
+        legacy_seconds, legacy_result = time_run(lambda: run_legacy(invoices), args.repeat)
+        legacy_json = json.dumps(legacy_result)
+        print(f"{size:>10} {'legacy':>12} {legacy_seconds:>10.4f} {'1.00x':>9}  reference")
+
+        for name, engine in engines:
+            seconds, result = time_run(lambda: engine(invoices), args.repeat)
+            matches = json.dumps(result) == legacy_json
+            identical = identical and matches
+            print(f"{size:>10} {name:>12} {seconds:>10.4f} {legacy_seconds / seconds:>8.2f}x  "
+                  f"{'identical' if matches else 'DIFFERENT'}")
+
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
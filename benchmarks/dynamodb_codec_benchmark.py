@@ -0,0 +1,159 @@
+"""
+DynamoDB Item Codec Benchmark
+
+Compares the legacy item conversion (TypeDeserializer plus recursive Decimal
+conversion, recursive convert_to_dynamodb_format and the copying response
+Decimal conversion) with the single-pass dynamodb_codec on Invoices table
+items with nested metadata and analyticsData. Checks that both produce the
+same values for every item and for edge-case attribute values, then times
+deserialization, serialization and the full invoice listing response path.
+
+Usage:
+    python3 benchmarks/dynamodb_codec_benchmark.py [--sizes 100,1000,10000] [--repeat 3] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'common_lib'))
+
+import dynamodb_codec as codec
+import legacy_dynamodb_codec as legacy
+import response_utils as resp
+from analytics_benchmark import make_invoices
+from boto3.dynamodb.types import Binary
+
+EDGE_VALUES = [
+    {'S': ''}, {'N': '0'}, {'N': '-0'}, {'N': '007'}, {'N': '1.0'}, {'N': '-12.50'}, {'N': '1E+3'},
+    {'N': '2.5e-3'}, {'N': '1234567890123456789012345'}, {'N': '0.1'},
+    {'BOOL': True}, {'BOOL': False}, {'NULL': True}, {'SS': ['a', 'b']}, {'NS': ['1', '2.5']},
+    {'B': b'\x00\x01'}, {'BS': [b'a', b'b']}, {'M': {}}, {'L': []},
+    {'L': [{'M': {'a': {'L': [{'N': '1.5'}, {'NULL': True}, {'M': {'b': {'S': 'x'}}}]}}}, {'N': '3'}]}
+]
+
+PYTHON_VALUES = [
+    '', 'text', 0, -3, 10 ** 20, 1.5, 2.0, 1e-7, True, False, None, Decimal('1.25'),
+    {'a': [1, {'b': [True, 'c', 2.5, []]}], 'd': {}}, [[], [[1]], {'e': None}]
+]
+
+
+def make_invoice_items(count, seed):
+    """Build Invoices table items the way create_invoice_record writes them"""
+    rng = random.Random(seed)
+    items = []
+    for invoice in make_invoices(count, seed):
+        index = invoice['invoiceId'].split('-')[1]
+        item = {
+            'invoiceId': {'S': invoice['invoiceId']},
+            'paymentIntentId': {'S': f"pi_{rng.getrandbits(64):016x}"},
+            'referenceNumber': {'S': f"ref-{index}"},
+            'referenceType': {'S': rng.choice(['appointment', 'order'])},
+            's3Key': {'S': f"invoices/{invoice['invoiceId']}.html"},
+            'fileUrl': {'S': f"https://cdn.example.com/invoices/{invoice['invoiceId']}.html"},
+            'fileSize': {'N': str(rng.randint(8000, 60000))},
+            'format': {'S': 'html'},
+            'createdAt': {'N': str(invoice['createdAt'])},
+            'status': {'S': invoice['status']},
+            'metadata': legacy.convert_to_dynamodb_format({
+                'generatedBy': 'system',
+                'totalAmount': rng.randint(2000, 120000) / 100,
+                'lineItems': rng.randint(1, 6),
+                'emailed': rng.random() < 0.5
+            })
+        }
+        if 'analyticsData' in invoice:
+            item['analyticsData'] = legacy.convert_to_dynamodb_format(invoice['analyticsData'])
+        items.append(item)
+    return items
+
+
+def check_equivalence(items):
+    """Return the names of the conversions whose output differs from the legacy implementation"""
+    failures = set()
+    for item in items + [{f"attr{index}": value for index, value in enumerate(EDGE_VALUES)}]:
+        if _typed(codec.deserialize_item(item)) != _typed(legacy.deserialize_item_json_safe(item)):
+            failures.add('deserialize_item_json_safe')
+        if _typed(codec.deserialize_item(item, keep_decimals=True)) != _typed(legacy.deserialize_item(item)):
+            failures.add('deserialize_item')
+    for item in items:
+        record = legacy.deserialize_item(item)
+        if resp.safe_json_dumps(resp.convert_decimal(record)) != legacy.safe_json_dumps(record):
+            failures.add('safe_json_dumps')
+    for value in EDGE_VALUES:
+        if _typed(codec.deserialize_value(value)) != _typed(legacy.deserialize_item_json_safe({'v': value})['v']):
+            failures.add('deserialize_value')
+    for value in PYTHON_VALUES + [legacy.deserialize_item(item) for item in items[:50]]:
+        if codec.serialize_value(value) != legacy.convert_to_dynamodb_format(value):
+            failures.add('serialize_value')
+    return sorted(failures)
+
+
+def _typed(value):
+    """Comparable form that tells int, float, Decimal and bool apart"""
+    if isinstance(value, dict):
+        return {key: _typed(entry) for key, entry in value.items()}
+    if isinstance(value, list):
+        return [_typed(entry) for entry in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((type(entry).__name__, repr(entry)) for entry in value)
+    return type(value).__name__, repr(value)
+
+
+def time_run(function, repeat):
+    """Return the best seconds over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def legacy_listing_response(items):
+    invoices = [legacy.deserialize_item_json_safe(item) for item in items]
+    return legacy.safe_json_dumps({'success': True, 'invoices': legacy.convert_decimal(invoices)})
+
+
+def codec_listing_response(items):
+    invoices = [codec.deserialize_item(item) for item in items]
+    return resp.safe_json_dumps({'success': True, 'invoices': resp.convert_decimal(invoices)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the DynamoDB item codec')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma separated invoice item counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best time is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    failures = check_equivalence(make_invoice_items(min(sizes), args.seed))
+    print(f"equivalence: {'all matched' if not failures else 'FAILED ' + ', '.join(failures)}")
+
+    print(f"{'items':>8} {'operation':>18} {'legacy':>10} {'codec':>10} {'speedup':>9}")
+    for size in sizes:
+        items = make_invoice_items(size, args.seed)
+        records = [legacy.deserialize_item_json_safe(item) for item in items]
+        for name, legacy_function, codec_function in (
+            ('deserialize', lambda: [legacy.deserialize_item_json_safe(item) for item in items],
+             lambda: [codec.deserialize_item(item) for item in items]),
+            ('deserialize_dec', lambda: [legacy.deserialize_item(item) for item in items],
+             lambda: [codec.deserialize_item(item, keep_decimals=True) for item in items]),
+            ('serialize', lambda: [legacy.convert_to_dynamodb_format(record) for record in records],
+             lambda: [codec.serialize_value(record) for record in records]),
+            ('listing_response', lambda: legacy_listing_response(items), lambda: codec_listing_response(items)),
+        ):
+            legacy_seconds = time_run(legacy_function, args.repeat)
+            codec_seconds = time_run(codec_function, args.repeat)
+            print(f"{size:>8} {name:>18} {legacy_seconds:>10.5f} {codec_seconds:>10.5f} "
+                  f"{legacy_seconds / codec_seconds:>8.1f}x")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Legacy DynamoDB Item Conversion Reference Implementation
+
+The item conversion used by db_utils and response_utils before the single-pass
+dynamodb_codec: boto3's TypeDeserializer followed by a recursive Decimal
+conversion, the recursive convert_to_dynamodb_format serializer, and the
+response Decimal conversion that copied every response before json.dumps.
+Kept only as the baseline (and output reference) for
+dynamodb_codec_benchmark.py; it is not deployed.
+"""
+import json
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer
+
+deserializer = TypeDeserializer()
+
+
+def deserialize_item(item):
+    return {k: deserializer.deserialize(v) for k, v in item.items()} if item else None
+
+
+def deserialize_item_json_safe(item):
+    """Deserialize DynamoDB item and convert Decimal objects to JSON-safe types"""
+    if not item:
+        return None
+
+    deserialized = {k: deserializer.deserialize(v) for k, v in item.items()}
+
+    # Convert Decimal objects to int or float for JSON serialization
+    def convert_decimals(obj):
+        if isinstance(obj, Decimal):
+            # Convert to int if it's a whole number, otherwise float
+            if obj % 1 == 0:
+                return int(obj)
+            else:
+                return float(obj)
+        elif isinstance(obj, dict):
+            return {k: convert_decimals(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [convert_decimals(item) for item in obj]
+        else:
+            return obj
+
+    return convert_decimals(deserialized)
+
+
+def convert_to_dynamodb_format(obj):
+    """Convert Python objects to DynamoDB format"""
+    if isinstance(obj, str):
+        return {'S': obj}
+    elif isinstance(obj, bool):  # Check bool before int/float since bool is a subclass of int
+        return {'BOOL': obj}
+    elif isinstance(obj, int):
+        return {'N': str(obj)}
+    elif isinstance(obj, float):
+        return {'N': str(obj)}
+    elif isinstance(obj, dict):
+        return {'M': {k: convert_to_dynamodb_format(v) for k, v in obj.items()}}
+    elif isinstance(obj, list):
+        return {'L': [convert_to_dynamodb_format(item) for item in obj]}
+    else:
+        return {'S': str(obj)}
+
+
+def convert_decimal(obj):
+    """Convert Decimal objects to float for JSON serialization"""
+    if isinstance(obj, list):
+        return [convert_decimal(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_decimal(v) for k, v in obj.items()}
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+
+def safe_json_dumps(data):
+    return json.dumps(convert_decimal(data), default=str)
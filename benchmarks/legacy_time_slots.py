@@ -0,0 +1,150 @@
+"""
+Legacy Time Slot Reference Implementation
+
+The datetime.time based slot helpers used by unavailable_slots_utils before the
+integer-minute TimeSlotSet. Kept only as the reference for
+time_slots_benchmark.py; it is not deployed.
+"""
+from datetime import datetime, time
+
+
+def parse_time_slot(slot_str):
+    """Parse a time slot string into start and end time objects"""
+    try:
+        start_str, end_str = slot_str.split('-')
+        start_time = datetime.strptime(start_str, '%H:%M').time()
+        end_time = datetime.strptime(end_str, '%H:%M').time()
+        return start_time, end_time
+    except ValueError:
+        raise ValueError(f"Invalid time slot format: {slot_str}")
+
+
+def format_time_slot(start_time, end_time):
+    """Format start and end time objects into a time slot string"""
+    return f"{start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}"
+
+
+def time_slots_overlap(slot1_start, slot1_end, slot2_start, slot2_end):
+    """Check if two time slots overlap or are adjacent"""
+    # Convert to minutes for easier comparison
+    slot1_start_min = slot1_start.hour * 60 + slot1_start.minute
+    slot1_end_min = slot1_end.hour * 60 + slot1_end.minute
+    slot2_start_min = slot2_start.hour * 60 + slot2_start.minute
+    slot2_end_min = slot2_end.hour * 60 + slot2_end.minute
+    
+    # Check if they overlap or are adjacent (touching)
+    return not (slot1_end_min < slot2_start_min or slot2_end_min < slot1_start_min)
+
+    # # Only count as overlap if there is a true intersection (not just touching)
+    # # i.e., [a, b) and [c, d) overlap iff a < d and c < b
+    # return slot1_start_min < slot2_end_min and slot2_start_min < slot1_end_min
+
+
+def merge_time_slots(slots):
+    """Merge overlapping or adjacent time slots"""
+    if not slots:
+        return []
+    
+    # Parse all slots into (start_time, end_time) tuples
+    parsed_slots = []
+    for slot in slots:
+        try:
+            start_time, end_time = parse_time_slot(slot)
+            parsed_slots.append((start_time, end_time))
+        except ValueError as e:
+            print(f"Warning: Skipping invalid slot {slot}: {e}")
+            continue
+    
+    if not parsed_slots:
+        return []
+    
+    # Sort by start time
+    parsed_slots.sort(key=lambda x: (x[0].hour, x[0].minute))
+    
+    merged = []
+    current_start, current_end = parsed_slots[0]
+    
+    for start_time, end_time in parsed_slots[1:]:
+        if time_slots_overlap(current_start, current_end, start_time, end_time):
+            # Merge overlapping or adjacent slots
+            current_end = max(current_end, end_time, key=lambda t: t.hour * 60 + t.minute)
+        else:
+            # No overlap, add current slot and start new one
+            merged.append(format_time_slot(current_start, current_end))
+            current_start, current_end = start_time, end_time
+    
+    # Add the last slot
+    merged.append(format_time_slot(current_start, current_end))
+    
+    return merged
+
+
+def subtract_time_slots(existing_slots, slots_to_remove):
+    """Remove time slots from existing slots, handling partial overlaps"""
+    if not existing_slots:
+        return []
+    
+    if not slots_to_remove:
+        return existing_slots
+    
+    # Parse existing slots
+    existing_parsed = []
+    for slot in existing_slots:
+        try:
+            start_time, end_time = parse_time_slot(slot)
+            existing_parsed.append((start_time, end_time))
+        except ValueError as e:
+            print(f"Warning: Skipping invalid existing slot {slot}: {e}")
+            continue
+    
+    # Parse slots to remove
+    remove_parsed = []
+    for slot in slots_to_remove:
+        try:
+            start_time, end_time = parse_time_slot(slot)
+            remove_parsed.append((start_time, end_time))
+        except ValueError as e:
+            print(f"Warning: Skipping invalid remove slot {slot}: {e}")
+            continue
+    
+    result = []
+    
+    for existing_start, existing_end in existing_parsed:
+        current_segments = [(existing_start, existing_end)]
+        
+        # For each slot to remove, check if it affects current segments
+        for remove_start, remove_end in remove_parsed:
+            new_segments = []
+            
+            for seg_start, seg_end in current_segments:
+                # Convert to minutes for easier comparison
+                seg_start_min = seg_start.hour * 60 + seg_start.minute
+                seg_end_min = seg_end.hour * 60 + seg_end.minute
+                remove_start_min = remove_start.hour * 60 + remove_start.minute
+                remove_end_min = remove_end.hour * 60 + remove_end.minute
+                
+                # Check if remove slot overlaps with current segment
+                if remove_end_min <= seg_start_min or remove_start_min >= seg_end_min:
+                    # No overlap, keep segment as is
+                    new_segments.append((seg_start, seg_end))
+                else:
+                    # There's overlap, split the segment
+                    # Add part before the remove slot (if any)
+                    if seg_start_min < remove_start_min:
+                        before_end_min = remove_start_min
+                        before_end = time(before_end_min // 60, before_end_min % 60)
+                        new_segments.append((seg_start, before_end))
+                    
+                    # Add part after the remove slot (if any)
+                    if seg_end_min > remove_end_min:
+                        after_start_min = remove_end_min
+                        after_start = time(after_start_min // 60, after_start_min % 60)
+                        new_segments.append((after_start, seg_end))
+            
+            current_segments = new_segments
+        
+        # Add remaining segments to result
+        for seg_start, seg_end in current_segments:
+            result.append(format_time_slot(seg_start, seg_end))
+    
+    return result
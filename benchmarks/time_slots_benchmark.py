@@ -0,0 +1,149 @@
+"""
+Time Slot Benchmark
+
+Checks the integer-minute TimeSlotSet used by unavailable_slots_utils against
+the legacy datetime.time based slot helpers on randomly generated slots
+(parsing, merging, subtraction, overlap checks and overlap counts, plus union
+and intersection against a per-minute reference), then times both
+implementations on growing slot lists.
+
+Usage:
+    python3 benchmarks/time_slots_benchmark.py [--cases 2000] [--sizes 10,100,1000] [--repeat 3] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'common_lib'))
+
+import legacy_time_slots as legacy
+from unavailable_slots_utils import (
+    TimeSlotSet, count_overlapping_slots, merge_time_slots, parse_time_slot, subtract_time_slots
+)
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def random_slot(rng, granularity):
+    start = rng.randrange(0, 24 * 60, granularity)
+    end = min(start + rng.randrange(0, 4 * 60, granularity), 23 * 60 + 59)
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+
+def random_slots(rng, count):
+    granularity = rng.choice([1, 15, 30, 60])
+    return [random_slot(rng, granularity) for _ in range(count)]
+
+
+def random_slot_string(rng):
+    """Slot-like strings, valid and invalid, for parser equivalence"""
+    parts = [str(rng.randint(0, 25)), f"{rng.randint(0, 25):02d}", str(rng.randint(0, 61)), '', 'ab', ' 9']
+    return f"{rng.choice(parts)}:{rng.choice(parts)}{rng.choice(['-', '', '--'])}{rng.choice(parts)}:{rng.choice(parts)}"
+
+
+def legacy_parse(slot):
+    try:
+        start, end = legacy.parse_time_slot(slot)
+        return to_minutes(start), to_minutes(end)
+    except ValueError:
+        return None
+
+
+def new_parse(slot):
+    try:
+        return parse_time_slot(slot)
+    except ValueError:
+        return None
+
+
+def minutes_covered(slot_set):
+    return {minute for start, end in slot_set for minute in range(start, end + 1)}
+
+
+def check_properties(cases, seed):
+    """Return the names of the properties that failed"""
+    rng = random.Random(seed)
+    failures = set()
+    for _ in range(cases):
+        slot_string = random_slot_string(rng)
+        if legacy_parse(slot_string) != new_parse(slot_string):
+            failures.add('parse')
+
+        slots = random_slots(rng, rng.randint(0, 12))
+        removed = random_slots(rng, rng.randint(0, 6))
+        if legacy.merge_time_slots(slots) != merge_time_slots(slots):
+            failures.add('merge')
+
+        # TimeSlotSet normalizes both operands, so compare against the legacy helper on merged slots
+        existing = legacy.merge_time_slots(slots)
+        legacy_subtracted = legacy.subtract_time_slots(existing, legacy.merge_time_slots(removed))
+        if legacy_subtracted != subtract_time_slots(existing, removed):
+            failures.add('subtract')
+
+        check = random_slot(rng, 15)
+        check_start, check_end = legacy.parse_time_slot(check)
+        parsed = [legacy.parse_time_slot(slot) for slot in slots]
+        legacy_overlaps = [legacy.time_slots_overlap(check_start, check_end, start, end) for start, end in parsed]
+        ranges = [parse_time_slot(slot) for slot in slots]
+        check_range = parse_time_slot(check)
+        if any(legacy_overlaps) != TimeSlotSet.from_slots(slots).overlaps(*check_range):
+            failures.add('overlaps')
+        if sum(legacy_overlaps) != count_overlapping_slots(ranges, *check_range):
+            failures.add('count_overlapping_slots')
+
+        first, second = TimeSlotSet.from_slots(slots), TimeSlotSet.from_slots(removed)
+        if minutes_covered(first.union(second)) != minutes_covered(first) | minutes_covered(second):
+            failures.add('union')
+        if minutes_covered(first.intersection(second)) != minutes_covered(first) & minutes_covered(second):
+            failures.add('intersection')
+        if first.union(second) != TimeSlotSet.from_slots(slots + removed):
+            failures.add('union_normalized')
+    return sorted(failures)
+
+
+def time_run(function, repeat):
+    """Return the best seconds over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the time slot helpers')
+    parser.add_argument('--cases', type=int, default=2000, help='Random cases per property')
+    parser.add_argument('--sizes', default='10,100,1000', help='Comma separated slot counts to time')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best time is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    failures = check_properties(args.cases, args.seed)
+    print(f"properties: {'all passed' if not failures else 'FAILED ' + ', '.join(failures)} ({args.cases} cases)")
+
+    rng = random.Random(args.seed)
+    print(f"{'slots':>8} {'operation':>10} {'legacy':>10} {'interval':>10} {'speedup':>9}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        slots = random_slots(rng, size)
+        removed = random_slots(rng, size)
+        existing = legacy.merge_time_slots(slots)
+        for name, legacy_function, new_function in (
+            ('merge', lambda: legacy.merge_time_slots(slots), lambda: merge_time_slots(slots)),
+            ('subtract', lambda: legacy.subtract_time_slots(existing, removed),
+             lambda: subtract_time_slots(existing, removed)),
+        ):
+            legacy_seconds = time_run(legacy_function, args.repeat)
+            new_seconds = time_run(new_function, args.repeat)
+            print(f"{size:>8} {name:>10} {legacy_seconds:>10.5f} {new_seconds:>10.5f} {legacy_seconds / new_seconds:>8.1f}x")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+WebSocket Gateway Client Benchmark
+
+Sends notifications to a local stub of the API Gateway Management API and
+compares creating a new apigatewaymanagementapi client for every send (the
+behaviour before the client registry) with the cached per-endpoint client of
+wsgw_utils, both for repeated single sends and for staff fan-outs through
+send_notifications. The stub can add a fixed latency per request to mimic the
+round trip to API Gateway.
+
+Usage:
+    python3 benchmarks/wsgw_client_benchmark.py [--sends 200] [--fanout 50] [--latency-ms 5] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'common_lib'))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Accepts every PostToConnection request, answering Gone for connection IDs starting with 'gone'"""
+    protocol_version = 'HTTP/1.1'
+    latency_seconds = 0.0
+    requests = 0
+    connections = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with StubHandler.lock:
+            StubHandler.requests += 1
+            StubHandler.connections.add(self.client_address)
+        if StubHandler.latency_seconds:
+            time.sleep(StubHandler.latency_seconds)
+        status = 410 if self.path.rsplit('/', 1)[-1].startswith('gone') else 200
+        body = b'{"message":"Gone"}' if status == 410 else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status == 410:
+            self.send_header('x-amzn-ErrorType', 'GoneException')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency_ms):
+    StubHandler.latency_seconds = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/benchmark"
+
+
+def time_run(function, repeat):
+    """Return the best seconds over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def reset_counters():
+    with StubHandler.lock:
+        StubHandler.requests = 0
+        StubHandler.connections = set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cached API Gateway Management clients')
+    parser.add_argument('--sends', type=int, default=200, help='Sequential single sends per run')
+    parser.add_argument('--fanout', type=int, default=50, help='Staff connections per fan-out')
+    parser.add_argument('--latency-ms', type=float, default=5, help='Stub latency per request in milliseconds')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (best time is reported)')
+    args = parser.parse_args()
+
+    server, endpoint_url = start_stub(args.latency_ms)
+    # The stub doesn't check signatures, but the client needs credentials to sign with
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['WEBSOCKET_ENDPOINT_URL'] = endpoint_url
+
+    import boto3
+    import wsgw_utils as wsgw
+    import db_utils as db
+    # Stale connections found by the stub aren't in a real table
+    db.delete_connection = lambda connection_id: None
+    db.delete_connections = lambda connection_ids: True
+
+    message = {'type': 'notification', 'subtype': 'user-typing', 'userId': 'benchmark-user'}
+
+    def uncached_sends():
+        for index in range(args.sends):
+            client = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+            wsgw.send_notification(client, f"conn-{index}", message)
+
+    def cached_sends():
+        for index in range(args.sends):
+            wsgw.send_notification(wsgw.get_apigateway_client(), f"conn-{index}", message)
+
+    connection_ids = [f"gone-{index}" if index % 10 == 9 else f"conn-{index}" for index in range(args.fanout)]
+
+    def uncached_fanout():
+        for connection_id in connection_ids:
+            client = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+            wsgw.send_notification(client, connection_id, message)
+
+    def cached_fanout():
+        result = wsgw.send_notifications(wsgw.get_apigateway_client(), connection_ids, message)
+        assert result['sent'] + result['stale'] == len(connection_ids), result
+
+    # Silence the per-send logging while timing
+    devnull = open(os.devnull, 'w')
+    print(f"{'operation':>22} {'sends':>6} {'seconds':>9} {'per send ms':>12} {'TCP conns':>10}")
+    rows = []
+    for name, function, sends in (
+        ('new client per send', uncached_sends, args.sends),
+        ('cached client', cached_sends, args.sends),
+        ('serial fan-out', uncached_fanout, args.fanout),
+        ('cached fan-out', cached_fanout, args.fanout),
+    ):
+        reset_counters()
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            seconds = time_run(function, args.repeat)
+        finally:
+            sys.stdout = stdout
+        connections = len(StubHandler.connections)
+        rows.append((name, seconds))
+        print(f"{name:>22} {sends:>6} {seconds:>9.4f} {seconds / sends * 1000:>12.3f} {connections:>10}")
+
+    timings = dict(rows)
+    print(f"single sends: {timings['new client per send'] / timings['cached client']:.1f}x faster with the cached client")
+    print(f"fan-out: {timings['serial fan-out'] / timings['cached fan-out']:.1f}x faster with the cached client and thread pool")
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
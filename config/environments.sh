@@ -164,6 +164,11 @@ get_env_config() {
     export INQUIRIES_TABLE="Inquiries-${ENVIRONMENT}"
     export PAYMENTS_TABLE="Payments-${ENVIRONMENT}"
     export INVOICES_TABLE="Invoices-${ENVIRONMENT}"
+    export ANALYTICS_ROLLUPS_TABLE="AnalyticsRollups-${ENVIRONMENT}"
+    export ANALYTICS_CACHE_TABLE="AnalyticsCache-${ENVIRONMENT}"
+    export AVAILABILITY_INDEX_TABLE="AvailabilityIndex-${ENVIRONMENT}"
+    export CONVERSATION_SUMMARIES_TABLE="ConversationSummaries-${ENVIRONMENT}"
+    export CACHE_VERSIONS_TABLE="CacheVersions-${ENVIRONMENT}"
     export EMAIL_SUPPRESSION_TABLE="EmailSuppression-${ENVIRONMENT}"
     export EMAIL_METADATA_TABLE="EmailMetadata-${ENVIRONMENT}"
     
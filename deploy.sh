@@ -603,10 +603,52 @@ validate_route53_records() {
     fi
 }
 
+# Get the GSI stage to deploy for a staged stack parameter
+# DynamoDB creates only one GSI per table in a stack update: new stacks get the final
+# stage, existing stacks advance one stage per deployment (an explicit value wins)
+get_index_stage() {
+    local parameter_key="$1"
+    local final_stage="$2"
+    local explicit_stage="$3"
+    
+    if [[ -n "$explicit_stage" ]]; then
+        echo "$explicit_stage"
+        return
+    fi
+    
+    if ! aws cloudformation describe-stacks --stack-name "$STACK_NAME" --region "$AWS_REGION" &> /dev/null; then
+        echo "$final_stage"
+        return
+    fi
+    
+    local current_stage
+    current_stage=$(aws cloudformation describe-stacks \
+        --stack-name "$STACK_NAME" \
+        --region "$AWS_REGION" \
+        --query "Stacks[0].Parameters[?ParameterKey=='$parameter_key'].ParameterValue | [0]" \
+        --output text 2>/dev/null)
+    if [[ ! "$current_stage" =~ ^[0-9]+$ ]]; then
+        current_stage=0
+    fi
+    
+    if (( current_stage < final_stage )); then
+        echo $((current_stage + 1))
+    else
+        echo "$final_stage"
+    fi
+}
+
 # Deploy CloudFormation stack
 deploy_stack() {
     print_status "Deploying CloudFormation stack..."
     
+    local listing_indexes_stage
+    listing_indexes_stage=$(get_index_stage ListingIndexesStage 5 "${LISTING_INDEXES_STAGE:-}")
+    print_status "Listing indexes stage: $listing_indexes_stage of 5"
+    if (( listing_indexes_stage < 5 )); then
+        print_warning "⚠️  Deploy again once this update completes to add the next listing index stage"
+    fi
+    
     # Prepare CloudFormation parameters
     local cf_params=(
         "ParameterKey=Environment,ParameterValue=$ENVIRONMENT"
@@ -614,6 +656,7 @@ deploy_stack() {
         "ParameterKey=S3BucketName,ParameterValue=$REPORTS_BUCKET_NAME"
         "ParameterKey=CloudFormationBucket,ParameterValue=$CLOUDFORMATION_BUCKET"
         "ParameterKey=BackupBucketName,ParameterValue=$BACKUP_BUCKET_NAME"
+        "ParameterKey=ListingIndexesStage,ParameterValue=$listing_indexes_stage"
         "ParameterKey=ReportsBucketName,ParameterValue=$REPORTS_BUCKET_NAME"
         "ParameterKey=StripeSecretKey,ParameterValue=$STRIPE_SECRET_KEY"
         "ParameterKey=StripeWebhookSecret,ParameterValue=$STRIPE_WEBHOOK_SECRET"
@@ -139,14 +139,13 @@ def send_payment_confirmation_notification(record, record_type, status='paid'):
         receiverConnections.extend(staff_connections)
 
         # Send WebSocket notifications
-        for connection in receiverConnections:
-            wsgw.send_notification(wsgw_client, connection.get('connectionId'), {
-                "type": record_type,
-                "subtype": "payment-status",
-                "success": True,
-                "referenceNumber": record.get(f'{record_type}Id'),
-                "paymentStatus": "paid"
-            })
+        wsgw.send_notifications(wsgw_client, [connection.get('connectionId') for connection in receiverConnections], {
+            "type": record_type,
+            "subtype": "payment-status",
+            "success": True,
+            "referenceNumber": record.get(f'{record_type}Id'),
+            "paymentStatus": "paid"
+        })
         
         # Queue enhanced Firebase push notification to staff
         reference_id = record.get(f'{record_type}Id')
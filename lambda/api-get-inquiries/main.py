@@ -18,9 +18,10 @@ def lambda_handler(event, context):
             "inquiry": resp.convert_decimal(inquiry)
         })
     else:
-        # Get all inquiries with filters
-        inquiries = inquiry_manager.get_all_inquiries_with_filters(event)
+        # Get one page of inquiries with filters
+        inquiries, page_fields = inquiry_manager.get_inquiries_page(event)
         return resp.success_response({
             "inquiries": resp.convert_decimal(inquiries),
-            "count": len(inquiries)
+            "count": len(inquiries),
+            **page_fields
         })
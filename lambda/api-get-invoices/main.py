@@ -11,13 +11,13 @@ def lambda_handler(event, context):
     
     Query parameters:
     - start_date, end_date (YYYY-MM-DD format) - REQUIRED
-    - limit (optional) - defaults to 2000
+    - limit (optional) - page size, defaults to 2000 (the maximum)
+    - cursor (optional) - nextCursor of the previous page
     """
     # Get query parameters
     query_params = event.get('queryStringParameters', {}) or {}
     start_date = query_params.get('start_date')
     end_date = query_params.get('end_date')
-    limit = query_params.get('limit', '2000')
     
     # Validate required parameters
     if not start_date:
@@ -26,17 +26,18 @@ def lambda_handler(event, context):
     if not end_date:
         raise biz.BusinessLogicError("end_date parameter is required (YYYY-MM-DD format)")
     
-    # Get invoice manager and retrieve ALL invoices (including cancelled ones)
+    # Get invoice manager and retrieve one page of ALL invoices (including cancelled ones)
     invoice_manager = biz.get_invoice_manager()
-    invoices = invoice_manager.get_all_invoices_by_date_range_formatted(start_date, end_date, limit)
+    invoices, page_fields = invoice_manager.get_all_invoices_page_formatted(event, start_date, end_date)
     
-    # Count active vs cancelled invoices for summary
+    # Count active vs cancelled invoices of this page for summary
     active_count = sum(1 for inv in invoices if inv.get('status') != 'cancelled')
     cancelled_count = sum(1 for inv in invoices if inv.get('status') == 'cancelled')
     
     return resp.success_response({
         "invoices": resp.convert_decimal(invoices),
         "count": len(invoices),
+        **page_fields,
         "summary": {
             "total": len(invoices),
             "active": active_count,
@@ -45,6 +46,7 @@ def lambda_handler(event, context):
         "query": {
             "start_date": start_date,
             "end_date": end_date,
-            "limit": limit
+            "limit": query_params.get('limit', '2000'),
+            "cursor": query_params.get('cursor')
         }
     })
\ No newline at end of file
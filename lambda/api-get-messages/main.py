@@ -10,11 +10,12 @@ def lambda_handler(event, context):
         
         # Get message manager and retrieve messages
         message_manager = biz.get_message_manager()
-        messages = message_manager.get_user_messages(client_id)
+        messages, page_fields = message_manager.get_user_messages_page(client_id, event)
         
         print(f"Retrieved {len(messages)} messages for clientId: {client_id}")
         return resp.success_response({
-            "messages": resp.convert_decimal(messages)
+            "messages": resp.convert_decimal(messages),
+            **page_fields
         })
 
     except Exception as e:
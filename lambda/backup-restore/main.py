@@ -41,6 +41,16 @@ def lambda_handler(event, context):
         "reason": "Manual backup requested",
         "skip_cleanup": true/false (backup only, default: false)
     }
+    
+    Maintenance operations:
+    - "backfill_invoice_index": Writes effectiveDateKey/effectiveDateMonth on invoices
+      created before the effectiveDateMonth-index GSI existed
+    - "rebuild_analytics_rollups": Rebuilds the AnalyticsRollups table from active invoices
+    - "rebuild_availability_index": Rebuilds the AvailabilityIndex table from the appointments
+    - "backfill_message_conversations": Writes conversationId on messages created before the
+      conversationId-createdAt-index GSI existed and builds the ConversationSummaries table
+    - "backfill_connection_partitions": Writes connectionPartition on connections initialized
+      before the connectionPartition-index GSI existed
     """
     try:
         # Log the incoming event
@@ -57,8 +67,18 @@ def lambda_handler(event, context):
             return handle_cleanup_only(event, context)
         elif operation == 'list_backups':
             return handle_list_backups(event, context)
+        elif operation == 'backfill_invoice_index':
+            return handle_backfill_invoice_index(event, context)
+        elif operation == 'rebuild_analytics_rollups':
+            return handle_rebuild_analytics_rollups(event, context)
+        elif operation == 'rebuild_availability_index':
+            return handle_rebuild_availability_index(event, context)
+        elif operation == 'backfill_message_conversations':
+            return handle_backfill_message_conversations(event, context)
+        elif operation == 'backfill_connection_partitions':
+            return handle_backfill_connection_partitions(event, context)
         else:
-            return resp.error_response(f"Invalid operation: {operation}. Must be 'backup', 'restore', 'cleanup', or 'list_backups'", 400)
+            return resp.error_response(f"Invalid operation: {operation}. Must be 'backup', 'restore', 'cleanup', 'list_backups', 'backfill_invoice_index', 'rebuild_analytics_rollups', 'rebuild_availability_index', 'backfill_message_conversations' or 'backfill_connection_partitions'", 400)
             
     except Exception as e:
         print(f"Error in lambda_handler: {str(e)}")
@@ -258,6 +278,19 @@ def handle_restore(event, context):
                 print(error_msg)
                 results['errors'].append(error_msg)
         
+        # Restored invoices bypass the invoice update hooks, so drop every cached analytics result
+        # and stop trusting the rollups until they are rebuilt
+        if any(table_name.startswith('Invoices-') for table_name in results['tables_restored']):
+            import analytics_cache
+            import analytics_rollups
+            analytics_cache.invalidate_all()
+            analytics_rollups.mark_stale()
+        
+        # Restored appointments bypass the appointment update hooks, so rebuild the availability index
+        if db.AVAILABILITY_INDEX_TABLE and any(table_name.startswith('Appointments-') for table_name in results['tables_restored']):
+            import availability_index
+            results['availability_index'] = availability_index.rebuild_index()
+        
         # Restore S3 objects (reports and invoices) if requested
         if restore_s3_objects:
             reports_bucket = os.environ.get('REPORTS_BUCKET')
@@ -440,8 +473,8 @@ def clear_table(table_name):
         key_schema = db.get_table_key_schema(table_name)
         key_names = [key['AttributeName'] for key in key_schema]
         
-        # Get all items (keys only)
-        items = db.scan_table_keys_only(table_name, key_names)
+        # Stream the keys of every item from a parallel scan
+        items = db.parallel_scan(table_name, **db.build_key_projection(key_names))
         
         # Delete items in batches
         deleted_count = 0
@@ -590,6 +623,88 @@ def handle_list_backups(event, context):
         print(f"Error in handle_list_backups: {str(e)}")
         return resp.error_response(f"Failed to list backups: {str(e)}", 500)
 
+def handle_backfill_invoice_index(event, context):
+    """Handle backfilling the invoice effective date index keys"""
+    try:
+        backfill_result = db.backfill_invoice_effective_date_keys()
+        
+        return resp.success_response({
+            'operation': 'backfill_invoice_index',
+            'environment': os.environ.get('ENVIRONMENT'),
+            'result': backfill_result,
+            'request_id': context.aws_request_id if context else 'unknown'
+        }, status_code=200 if not backfill_result['errors'] else 207)
+        
+    except Exception as e:
+        print(f"Error in handle_backfill_invoice_index: {str(e)}")
+        return resp.error_response(f"Invoice index backfill failed: {str(e)}", 500)
+
+def handle_rebuild_analytics_rollups(event, context):
+    """Handle rebuilding the analytics rollups from the active invoices"""
+    try:
+        import analytics_rollups
+        rebuild_result = analytics_rollups.rebuild_rollups()
+        
+        return resp.success_response({
+            'operation': 'rebuild_analytics_rollups',
+            'environment': os.environ.get('ENVIRONMENT'),
+            'result': rebuild_result,
+            'request_id': context.aws_request_id if context else 'unknown'
+        })
+        
+    except Exception as e:
+        print(f"Error in handle_rebuild_analytics_rollups: {str(e)}")
+        return resp.error_response(f"Analytics rollups rebuild failed: {str(e)}", 500)
+
+def handle_rebuild_availability_index(event, context):
+    """Handle rebuilding the availability index from the appointments"""
+    try:
+        import availability_index
+        rebuild_result = availability_index.rebuild_index()
+        
+        return resp.success_response({
+            'operation': 'rebuild_availability_index',
+            'environment': os.environ.get('ENVIRONMENT'),
+            'result': rebuild_result,
+            'request_id': context.aws_request_id if context else 'unknown'
+        })
+        
+    except Exception as e:
+        print(f"Error in handle_rebuild_availability_index: {str(e)}")
+        return resp.error_response(f"Availability index rebuild failed: {str(e)}", 500)
+
+def handle_backfill_message_conversations(event, context):
+    """Handle backfilling message conversation IDs and the conversation summaries"""
+    try:
+        backfill_result = db.backfill_message_conversations()
+        
+        return resp.success_response({
+            'operation': 'backfill_message_conversations',
+            'environment': os.environ.get('ENVIRONMENT'),
+            'result': backfill_result,
+            'request_id': context.aws_request_id if context else 'unknown'
+        }, status_code=200 if not backfill_result['errors'] else 207)
+        
+    except Exception as e:
+        print(f"Error in handle_backfill_message_conversations: {str(e)}")
+        return resp.error_response(f"Message conversation backfill failed: {str(e)}", 500)
+
+def handle_backfill_connection_partitions(event, context):
+    """Handle backfilling the index partition of connections opened before it existed"""
+    try:
+        backfill_result = db.backfill_connection_partitions()
+        
+        return resp.success_response({
+            'operation': 'backfill_connection_partitions',
+            'environment': os.environ.get('ENVIRONMENT'),
+            'result': backfill_result,
+            'request_id': context.aws_request_id if context else 'unknown'
+        }, status_code=200 if not backfill_result['errors'] else 207)
+        
+    except Exception as e:
+        print(f"Error in handle_backfill_connection_partitions: {str(e)}")
+        return resp.error_response(f"Connection partition backfill failed: {str(e)}", 500)
+
 def cleanup_old_records(table_name, backup_bucket, cleanup_prefix):
     """
     Clean up old records from DynamoDB table based on table-specific policies.
@@ -658,17 +773,12 @@ def cleanup_old_records(table_name, backup_bucket, cleanup_prefix):
 def get_old_records(table_name, base_table_name, cutoff_timestamp):
     """Get records that are older than the cutoff timestamp"""
     try:
-        # Get all items from table
-        items = db.scan_all_items(table_name)
-        
-        if not items:
-            return []
+        # Stream deserialized items from a parallel scan of the table
+        records = db.parallel_scan(table_name, db.deserialize_item_json_safe)
         
         old_records = []
         
-        for item in items:
-            # Deserialize the item for easier processing
-            record = db.deserialize_item_json_safe(item)
+        for record in records:
             if not record:
                 continue
             
@@ -707,7 +817,8 @@ def get_timestamp_field(base_table_name):
         'Invoices': 'createdAt',
         'UnavailableSlots': 'date',  # Special handling needed
         'EmailMetadata': 'timestamp',
-        'Connections': 'connectedAt'
+        'Connections': 'connectedAt',
+        'ConversationSummaries': 'lastMessageAt'
     }
     return timestamp_fields.get(base_table_name)
 
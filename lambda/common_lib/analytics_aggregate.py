@@ -0,0 +1,950 @@
+"""
+Analytics Aggregate for Business Intelligence Operations
+
+This module provides an additive representation of the analytics computed by
+AnalyticsManager. An aggregate holds the running counters for every analytics
+section, can be fed invoices one at a time, merged with other aggregates (for
+example pre-computed daily rollups) and finalized into the same section
+dictionaries returned by get_comprehensive_analytics.
+Invoices are walked once: each is normalized into an InvoiceRecord (amounts
+converted and dates parsed a single time) and fed to every section accumulator.
+All date/time operations use Australia/Perth timezone.
+"""
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from collections import Counter
+from functools import lru_cache
+
+
+# Invoice sets at least this large use the columnar accumulators when NumPy is available
+COLUMNAR_MIN_RECORDS = 5000
+
+# Section accumulators fed with every normalized invoice record, keyed by state section
+SECTION_ACCUMULATORS = {
+    'summary': '_add_summary',
+    'revenue': '_add_revenue',
+    'services': '_add_services',
+    'products': '_add_products',
+    'customers': '_add_customers',
+    'vehicles': '_add_vehicles',
+    'payments': '_add_payments',
+    'bookings': '_add_bookings',
+    'trends': '_add_trends',
+    'operations': '_add_operations'
+}
+
+
+# Normalized record field groups each state section reads
+SECTION_FIELDS = {
+    'summary': ('amount', 'line_items', 'booking'),
+    'revenue': ('amount', 'payment', 'dates'),
+    'services': ('line_items', 'booking'),
+    'products': ('line_items',),
+    'customers': ('amount', 'customer'),
+    'vehicles': ('vehicle',),
+    'payments': ('amount', 'payment'),
+    'bookings': ('booking', 'booking_day'),
+    'trends': ('amount', 'line_items', 'dates'),
+    'operations': ('line_items',)
+}
+
+ALL_FIELDS = frozenset(field for fields in SECTION_FIELDS.values() for field in fields)
+
+# Result sections of get_comprehensive_analytics: builder method and the state sections it reads
+# (every builder may also read the transaction count, which is always accumulated)
+RESULT_SECTIONS = {
+    'summary': ('build_summary_metrics', ('summary',)),
+    'revenue_analytics': ('build_revenue_analytics', ('revenue',)),
+    'service_analytics': ('build_service_analytics', ('services',)),
+    'product_analytics': ('build_product_analytics', ('products',)),
+    'customer_analytics': ('build_customer_analytics', ('customers',)),
+    'vehicle_analytics': ('build_vehicle_analytics', ('vehicles',)),
+    'payment_analytics': ('build_payment_analytics', ('payments',)),
+    'booking_analytics': ('build_booking_analytics', ('bookings',)),
+    'trend_analytics': ('build_trend_analytics', ('trends',)),
+    'operational_metrics': ('build_operational_metrics', ('operations',))
+}
+
+
+def plan_state_sections(result_sections):
+    """Get the state sections that must be accumulated to build the given result sections"""
+    state_sections = []
+    for result_section in result_sections:
+        for state_section in RESULT_SECTIONS[result_section][1]:
+            if state_section not in state_sections:
+                state_sections.append(state_section)
+    return state_sections
+
+
+def plan_fields(state_sections):
+    """Get the normalized record field groups the given state sections read"""
+    return frozenset(field for section in state_sections for field in SECTION_FIELDS[section])
+
+
+class InvoiceRecord:
+    """Analytics fields of a single invoice, converted and parsed once for all sections"""
+    __slots__ = (
+        'amount', 'payment_method', 'paid_before', 'booked_by', 'is_prebooked', 'booking_day',
+        'services', 'orders', 'customer_id', 'make', 'model', 'year',
+        'revenue_day', 'revenue_month', 'trend_day', 'trend_week'
+    )
+
+
+def normalize_invoice(invoice, current_year, fields=ALL_FIELDS):
+    """
+    Normalize an invoice into an InvoiceRecord
+
+    Args:
+        invoice: Invoice record
+        current_year: Current Perth year (vehicle years after it are ignored)
+        fields: Field groups to populate (see SECTION_FIELDS); other fields are left unset
+
+    Returns:
+        InvoiceRecord: Normalized record, or None if the invoice has no operation data
+    """
+    analytics_data = invoice.get('analyticsData')
+    if not analytics_data or not analytics_data.get('operation_data'):
+        return None
+
+    operation_data = analytics_data.get('operation_data', {})
+    record = InvoiceRecord()
+
+    if 'amount' in fields:
+        record.amount = float(operation_data.get('paymentDetails', {}).get('amount', '0'))
+
+    if 'payment' in fields:
+        payment_details = operation_data.get('paymentDetails', {})
+        record.payment_method = payment_details.get('payment_method', 'unknown')
+        record.paid_before = bool(payment_details.get('paid_before_operation', 0))
+
+    if 'booking' in fields:
+        record.booked_by = operation_data.get('bookingDetails', {}).get('bookedBy', 'NONE')
+        record.is_prebooked = record.booked_by != 'NONE'
+
+    if 'booking_day' in fields:
+        record.booking_day = get_booking_day(operation_data.get('bookingDetails', {}).get('bookedDate', ''))
+
+    if 'line_items' in fields:
+        record.services = [
+            (service.get('service_name', 'Unknown Service'), float(service.get('price', '0')))
+            for service in operation_data.get('services', [])
+        ]
+        record.orders = [
+            (order.get('item_name', 'Unknown Item'), float(order.get('total_price', '0')), int(order.get('quantity', '1')))
+            for order in operation_data.get('orders', [])
+        ]
+
+    if 'customer' in fields:
+        customer_id = operation_data.get('customerId', '')
+        if customer_id and isinstance(customer_id, str) and '@' in customer_id and '.' in customer_id.split('@')[-1]:
+            record.customer_id = customer_id
+        else:
+            record.customer_id = None
+
+    if 'vehicle' in fields:
+        record.make, record.model, record.year = get_vehicle_keys(operation_data.get('vehicleDetails', {}), current_year)
+
+    if 'dates' in fields:
+        record.revenue_day, record.revenue_month, record.trend_day, record.trend_week = get_invoice_date_keys(
+            invoice, operation_data
+        )
+    return record
+
+
+class AnalyticsAggregate:
+    """Additive analytics counters for a set of invoices"""
+
+    def __init__(self, state=None, sections=None):
+        """
+        Args:
+            state: Existing aggregate state (default: empty counters)
+            sections: State sections to accumulate when adding invoices (default: all);
+                      the invoice and transaction counts are always accumulated
+        """
+        self.state = state if state is not None else self._empty_state()
+        self.sections = list(sections) if sections is not None else list(SECTION_ACCUMULATORS)
+
+    @staticmethod
+    def _empty_state():
+        """Build empty section counters (initial values mirror the original section calculations)"""
+        return {
+            'invoice_count': 0,
+            'summary': {
+                'transactions': 0,
+                'total_revenue': 0,
+                'service_revenue': 0,
+                'product_revenue': 0,
+                'pre_booked': 0,
+                'non_booked': 0
+            },
+            'revenue': {'daily': {}, 'monthly': {}, 'payment_methods': {}},
+            'services': {},
+            'products': {'items': {}, 'categories': {}},
+            'customers': {'customers': {}, 'domains': {}},
+            'vehicles': {'makes': {}, 'models': {}, 'years': {}, 'make_models': {}},
+            'payments': {'methods': {}, 'timing': {'before_operation': 0, 'after_operation': 0}},
+            'bookings': {'booked_by': {}, 'days': {}},
+            'trends': {'daily': {}, 'weekly': {}},
+            'operations': {
+                'services': 0,
+                'products': 0,
+                'mixed': 0,
+                'service_only': 0,
+                'product_only': 0
+            }
+        }
+
+    # ------------------  Accumulation ------------------
+
+    def add_invoices(self, invoices, columnar=None):
+        """
+        Add a list of invoices (as returned by db_utils invoice readers)
+
+        Every invoice is normalized once and fed to all section accumulators in a single pass.
+
+        Args:
+            invoices: Invoice records
+            columnar: Use the NumPy columnar accumulators for invoice-level counters
+                      (default: automatically for large invoice sets when NumPy is available)
+        """
+        current_year = datetime.now(ZoneInfo('Australia/Perth')).year
+        fields = plan_fields(self.sections)
+        invoices = list(invoices)
+        if columnar is None:
+            columnar = len(invoices) >= COLUMNAR_MIN_RECORDS
+        if columnar:
+            import analytics_columnar
+            if analytics_columnar.is_available():
+                analytics_columnar.add_invoices(self, invoices, current_year, fields)
+                return self
+
+        accumulators = self.get_accumulators()
+        state = self.state
+        for invoice in invoices:
+            state['invoice_count'] += 1
+            record = normalize_invoice(invoice, current_year, fields)
+            if record is not None:
+                state['summary']['transactions'] += 1
+                for accumulate in accumulators:
+                    accumulate(record)
+        return self
+
+    def add_invoice(self, invoice):
+        """
+        Add a single invoice to the aggregate
+
+        Invoices without analyticsData.operation_data only count towards invoice_count,
+        matching the valid invoice filter of get_comprehensive_analytics.
+        """
+        return self.add_invoices([invoice], columnar=False)
+
+    def get_accumulators(self, sections=None):
+        """Get the bound accumulator methods for the given sections (default: the aggregate's sections)"""
+        sections = self.sections if sections is None else sections
+        return [getattr(self, SECTION_ACCUMULATORS[section]) for section in sections]
+
+    def _add_summary(self, record):
+        summary = self.state['summary']
+        summary['total_revenue'] += record.amount
+
+        for _, price in record.services:
+            summary['service_revenue'] += price
+
+        for _, total_price, _ in record.orders:
+            summary['product_revenue'] += total_price
+
+        if record.is_prebooked:
+            summary['pre_booked'] += 1
+        else:
+            summary['non_booked'] += 1
+
+    def _add_revenue(self, record):
+        revenue = self.state['revenue']
+        amount = record.amount
+
+        if record.revenue_day:
+            revenue['daily'][record.revenue_day] = revenue['daily'].get(record.revenue_day, 0.0) + amount
+            revenue['monthly'][record.revenue_month] = revenue['monthly'].get(record.revenue_month, 0.0) + amount
+
+        revenue['payment_methods'][record.payment_method] = revenue['payment_methods'].get(record.payment_method, 0.0) + amount
+
+    def _add_services(self, record):
+        services = self.state['services']
+        is_prebooked = record.is_prebooked
+
+        for service_name, price in record.services:
+            if service_name not in services:
+                services[service_name] = {
+                    'preBookedCount': 0,
+                    'preBookedRevenue': 0.0,
+                    'walkInCount': 0,
+                    'walkInRevenue': 0.0
+                }
+            stats = services[service_name]
+            if is_prebooked:
+                stats['preBookedCount'] += 1
+                stats['preBookedRevenue'] += price
+            else:
+                stats['walkInCount'] += 1
+                stats['walkInRevenue'] += price
+
+    def _add_products(self, record):
+        items = self.state['products']['items']
+        categories = self.state['products']['categories']
+
+        for item_name, total_price, quantity in record.orders:
+            if item_name not in items:
+                items[item_name] = {'quantity': 0, 'revenue': 0.0}
+            items[item_name]['quantity'] += quantity
+            items[item_name]['revenue'] += total_price
+
+            # Extract category from item name (first word typically)
+            category = item_name.split(' ')[0] if item_name else 'Unknown'
+            if category not in categories:
+                categories[category] = {'count': 0, 'revenue': 0, 'quantity': 0}
+            categories[category]['count'] += 1
+            categories[category]['revenue'] += total_price
+            categories[category]['quantity'] += quantity
+
+    def _add_customers(self, record):
+        customers = self.state['customers']
+        customer_id = record.customer_id
+
+        # Only count as unique customer if customer_id is a non-empty, valid email
+        if customer_id:
+            if customer_id not in customers['customers']:
+                customers['customers'][customer_id] = {'transactions': 0, 'revenue': 0.0}
+            customers['customers'][customer_id]['transactions'] += 1
+            customers['customers'][customer_id]['revenue'] += record.amount
+
+            domain = customer_id.split('@')[1].lower()
+            customers['domains'][domain] = customers['domains'].get(domain, 0) + 1
+
+    def _add_vehicles(self, record):
+        vehicles = self.state['vehicles']
+        make = record.make
+        model = record.model
+        year = record.year
+
+        if make:
+            vehicles['makes'][make] = vehicles['makes'].get(make, 0) + 1
+        if model:
+            vehicles['models'][model] = vehicles['models'].get(model, 0) + 1
+        if year:
+            vehicles['years'][year] = vehicles['years'].get(year, 0) + 1
+        if make and model:
+            make_model = f"{make} {model}"
+            vehicles['make_models'][make_model] = vehicles['make_models'].get(make_model, 0) + 1
+
+    def _add_payments(self, record):
+        payments = self.state['payments']
+        method = record.payment_method
+
+        if method not in payments['methods']:
+            payments['methods'][method] = {'count': 0, 'amount': 0}
+        payments['methods'][method]['count'] += 1
+        payments['methods'][method]['amount'] += record.amount
+
+        if record.paid_before:
+            payments['timing']['before_operation'] += 1
+        else:
+            payments['timing']['after_operation'] += 1
+
+    def _add_bookings(self, record):
+        bookings = self.state['bookings']
+        bookings['booked_by'][record.booked_by] = bookings['booked_by'].get(record.booked_by, 0) + 1
+
+        if record.booking_day:
+            bookings['days'][record.booking_day] = bookings['days'].get(record.booking_day, 0) + 1
+
+    def _add_trends(self, record):
+        if not record.trend_day:
+            return
+
+        trends = self.state['trends']
+        for bucket, key in ((trends['daily'], record.trend_day), (trends['weekly'], record.trend_week)):
+            if key not in bucket:
+                bucket[key] = {
+                    'transaction_count': 0,
+                    'revenue': 0,
+                    'service_count': 0,
+                    'product_count': 0
+                }
+            bucket[key]['transaction_count'] += 1
+            bucket[key]['revenue'] += record.amount
+            bucket[key]['service_count'] += len(record.services)
+            bucket[key]['product_count'] += len(record.orders)
+
+    def _add_operations(self, record):
+        operations = self.state['operations']
+        service_count = len(record.services)
+        product_count = len(record.orders)
+
+        operations['services'] += service_count
+        operations['products'] += product_count
+
+        if service_count > 0 and product_count > 0:
+            operations['mixed'] += 1
+        elif service_count > 0:
+            operations['service_only'] += 1
+        elif product_count > 0:
+            operations['product_only'] += 1
+
+    # ------------------  Merging and serialization ------------------
+
+    def merge(self, other, sign=1):
+        """
+        Merge another aggregate into this one
+
+        Args:
+            other: AnalyticsAggregate or aggregate state dict
+            sign: 1 to add the other aggregate, -1 to subtract it (e.g. on invoice cancellation)
+        """
+        other_state = other.state if isinstance(other, AnalyticsAggregate) else other
+        _merge_counters(self.state, other_state, sign)
+        if sign < 0:
+            _prune_counters(self.state)
+        return self
+
+    def to_json(self):
+        """Serialize the aggregate state for storage"""
+        return json.dumps(_round_counters(self.state), separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data):
+        """Load an aggregate from a serialized state (missing sections are initialized empty)"""
+        aggregate = cls()
+        if data:
+            aggregate.merge(json.loads(data))
+        return aggregate
+
+    # ------------------  Finalization ------------------
+
+    @property
+    def invoice_count(self):
+        return self.state['invoice_count']
+
+    @property
+    def transaction_count(self):
+        return self.state['summary']['transactions']
+
+    def build_sections(self, result_sections):
+        """Build the given result sections (see RESULT_SECTIONS), in order"""
+        return {
+            result_section: getattr(self, RESULT_SECTIONS[result_section][0])()
+            for result_section in result_sections
+        }
+
+    def build_summary_metrics(self):
+        """Build high-level summary metrics"""
+        summary = self.state['summary']
+        total_revenue = summary['total_revenue']
+        total_transactions = summary['transactions']
+        service_revenue = summary['service_revenue']
+        product_revenue = summary['product_revenue']
+
+        avg_transaction_value = total_revenue / total_transactions if total_transactions > 0 else 0
+
+        return {
+            'total_revenue': round(total_revenue, 2),
+            'total_transactions': total_transactions,
+            'average_transaction_value': round(avg_transaction_value, 2),
+            'service_revenue': round(service_revenue, 2),
+            'product_revenue': round(product_revenue, 2),
+            'pre_booked_transactions': summary['pre_booked'],
+            'non_booked_transactions': summary['non_booked'],
+            'service_vs_product_ratio': {
+                'service_percentage': round((service_revenue / total_revenue * 100), 2) if total_revenue > 0 else 0,
+                'product_percentage': round((product_revenue / total_revenue * 100), 2) if total_revenue > 0 else 0
+            }
+        }
+
+    def build_revenue_analytics(self):
+        """Build detailed revenue analytics with time-based trends using effectiveDate"""
+        revenue = self.state['revenue']
+        daily_revenue = revenue['daily']
+        monthly_revenue = revenue['monthly']
+
+        return {
+            'daily_breakdown': dict(daily_revenue),
+            'monthly_breakdown': dict(monthly_revenue),
+            'payment_method_breakdown': dict(revenue['payment_methods']),
+            'trend_analysis': calculate_revenue_growth(daily_revenue),
+            'peak_day': max(daily_revenue.items(), key=lambda x: x[1]) if daily_revenue else ('N/A', 0),
+            'peak_month': max(monthly_revenue.items(), key=lambda x: x[1]) if monthly_revenue else ('N/A', 0)
+        }
+
+    def build_service_analytics(self):
+        """Build service analytics with pre-booked/walk-in breakdown for frontend table"""
+        service_table = []
+        for service_name, counters in self.state['services'].items():
+            stats = {
+                'service': service_name,
+                'preBookedCount': counters['preBookedCount'],
+                'preBookedRevenue': counters['preBookedRevenue'],
+                'walkInCount': counters['walkInCount'],
+                'walkInRevenue': counters['walkInRevenue']
+            }
+            total_count = stats['preBookedCount'] + stats['walkInCount']
+            stats['preBookedRate'] = round(
+                (stats['preBookedCount'] / total_count * 100) if total_count > 0 else 0, 2
+            )
+            stats['preBookedRevenue'] = round(stats['preBookedRevenue'], 2)
+            stats['walkInRevenue'] = round(stats['walkInRevenue'], 2)
+            service_table.append(stats)
+
+        # Sorted by total revenue (preBooked + walkIn)
+        service_table.sort(key=lambda x: x['preBookedRevenue'] + x['walkInRevenue'], reverse=True)
+        return {
+            'service_table': service_table,
+            'total_unique_services': len(service_table)
+        }
+
+    def build_product_analytics(self):
+        """Build detailed product/item analytics"""
+        items = self.state['products']['items']
+        product_popularity = Counter({name: counters['quantity'] for name, counters in items.items()})
+        product_revenue = {name: counters['revenue'] for name, counters in items.items()}
+        product_quantities = {name: counters['quantity'] for name, counters in items.items()}
+
+        avg_unit_prices = {}
+        for item_name, total_revenue in product_revenue.items():
+            total_qty = product_quantities[item_name]
+            avg_unit_prices[item_name] = round(total_revenue / total_qty, 2) if total_qty > 0 else 0
+
+        return {
+            'most_popular_products': dict(product_popularity.most_common(10)),
+            'product_revenue_breakdown': product_revenue,
+            'total_quantities_sold': product_quantities,
+            'average_unit_prices': avg_unit_prices,
+            'category_analysis': {
+                category: dict(counters) for category, counters in self.state['products']['categories'].items()
+            },
+            'top_revenue_products': sorted(
+                product_revenue.items(),
+                key=lambda x: x[1],
+                reverse=True
+            )[:10],
+            'total_unique_products': len(items)
+        }
+
+    def build_customer_analytics(self):
+        """Build customer behavior analytics"""
+        customers = self.state['customers']['customers']
+        customer_transactions = {customer: counters['transactions'] for customer, counters in customers.items()}
+        customer_revenue = {customer: counters['revenue'] for customer, counters in customers.items()}
+        customer_domains = Counter(self.state['customers']['domains'])
+
+        avg_customer_value = sum(customer_revenue.values()) / len(customer_revenue) if customer_revenue else 0
+        repeat_customers = {k: v for k, v in customer_transactions.items() if v > 1}
+
+        return {
+            'total_unique_customers': len(customer_transactions),
+            'average_customer_value': round(avg_customer_value, 2),
+            'customer_transaction_counts': customer_transactions,
+            'customer_lifetime_values': dict(customer_revenue),
+            'repeat_customers': repeat_customers,
+            'top_customers_by_revenue': sorted(
+                customer_revenue.items(),
+                key=lambda x: x[1],
+                reverse=True
+            )[:10],
+            'customer_retention_rate': round(
+                (len(repeat_customers) / len(customer_transactions) * 100), 2
+            ) if customer_transactions else 0,
+            'domain_analysis': dict(customer_domains.most_common(10))
+        }
+
+    def build_vehicle_analytics(self):
+        """Build vehicle-related analytics"""
+        vehicles = self.state['vehicles']
+        vehicle_years = vehicles['years']
+
+        vehicle_ages = []
+        current_year = datetime.now(ZoneInfo('Australia/Perth')).year
+        for year_str, count in vehicle_years.items():
+            try:
+                age = current_year - int(year_str)
+                if 0 <= age < 100:  # Only count reasonable ages
+                    vehicle_ages.extend([age] * count)
+            except ValueError:
+                continue
+
+        avg_vehicle_age = sum(vehicle_ages) / len(vehicle_ages) if vehicle_ages else 0
+
+        return {
+            'popular_makes': dict(Counter(vehicles['makes']).most_common(10)),
+            'popular_models': dict(Counter(vehicles['models']).most_common(10)),
+            'popular_years': dict(Counter(vehicle_years).most_common(10)),
+            'popular_make_model_combinations': dict(Counter(vehicles['make_models']).most_common(10)),
+            'average_vehicle_age': round(avg_vehicle_age, 1),
+            'total_unique_makes': len(vehicles['makes']),
+            'total_unique_models': len(vehicles['models']),
+            'vehicle_age_distribution': calculate_age_distribution(vehicle_ages)
+        }
+
+    def build_payment_analytics(self):
+        """Build payment method and timing analytics"""
+        methods = self.state['payments']['methods']
+        timing = self.state['payments']['timing']
+        total_transactions = self.state['summary']['transactions']
+        payment_methods = Counter({method: counters['count'] for method, counters in methods.items()})
+        payment_timing = {
+            'before_operation': timing['before_operation'],
+            'after_operation': timing['after_operation']
+        }
+
+        avg_amounts_by_method = {}
+        for method, counters in methods.items():
+            avg_amounts_by_method[method] = round(counters['amount'] / counters['count'], 2) if counters['count'] else 0
+
+        return {
+            'payment_method_distribution': dict(payment_methods),
+            'payment_timing_analysis': payment_timing,
+            'average_amounts_by_method': avg_amounts_by_method,
+            'payment_timing_percentage': {
+                'before_operation_percentage': round(
+                    (payment_timing['before_operation'] / total_transactions * 100), 2
+                ) if total_transactions else 0,
+                'after_operation_percentage': round(
+                    (payment_timing['after_operation'] / total_transactions * 100), 2
+                ) if total_transactions else 0
+            },
+            'preferred_payment_method': payment_methods.most_common(1)[0] if payment_methods else ('N/A', 0)
+        }
+
+    def build_booking_analytics(self):
+        """Build booking behavior analytics"""
+        booked_by = self.state['bookings']['booked_by']
+        booking_days = self.state['bookings']['days']
+        total_transactions = self.state['summary']['transactions']
+
+        staff_bookings = booked_by.get('STAFF', 0)
+        no_booking = booked_by.get('NONE', 0)
+        user_bookings = sum(count for key, count in booked_by.items() if key not in ('STAFF', 'NONE'))
+
+        return {
+            'booking_type_distribution': dict(booked_by),
+            'booking_statistics': {
+                'staff_initiated': staff_bookings,
+                'user_initiated': user_bookings,
+                'walk_in_non_booked': no_booking,
+                'pre_booking_rate': round(
+                    ((staff_bookings + user_bookings) / total_transactions * 100), 2
+                ) if total_transactions > 0 else 0
+            },
+            'booking_day_patterns': dict(booking_days),
+            'popular_booking_day': max(booking_days.items(), key=lambda x: x[1])[0] if booking_days else 'N/A'
+        }
+
+    def build_trend_analytics(self):
+        """Build trend analytics over time using effectiveDate"""
+        daily_data = self.state['trends']['daily']
+        weekly_data = self.state['trends']['weekly']
+
+        # Calculate growth rates using weekly data
+        sorted_weeks = sorted(weekly_data.keys())
+        growth_rates = []
+        for i in range(1, len(sorted_weeks)):
+            prev_week = weekly_data[sorted_weeks[i-1]]
+            curr_week = weekly_data[sorted_weeks[i]]
+            if prev_week['revenue'] > 0:
+                growth_rate = ((curr_week['revenue'] - prev_week['revenue']) / prev_week['revenue']) * 100
+                growth_rates.append(growth_rate)
+
+        avg_growth_rate = sum(growth_rates) / len(growth_rates) if growth_rates else 0
+
+        # Calculate day-of-week patterns
+        day_patterns = {}
+        for day_key, day_data in daily_data.items():
+            try:
+                date_obj = datetime.strptime(day_key, '%Y-%m-%d').replace(tzinfo=ZoneInfo('Australia/Perth'))
+                day_name = date_obj.strftime('%A')
+                day_patterns[day_name] = day_patterns.get(day_name, 0.0) + day_data['revenue']
+            except ValueError:
+                continue
+
+        trend_direction = 'increasing' if avg_growth_rate > 0 else 'decreasing' if avg_growth_rate < 0 else 'stable'
+
+        return {
+            'daily_transaction_counts': {k: v['transaction_count'] for k, v in daily_data.items()},
+            'weekly_patterns': day_patterns,
+            'monthly_growth': {
+                'growth_rate': round(avg_growth_rate, 2),
+                'trend_direction': trend_direction
+            },
+            'seasonal_insights': {
+                'peak_day': max(day_patterns.items(), key=lambda x: x[1])[0] if day_patterns else 'N/A',
+                'peak_revenue_day': max(daily_data.items(), key=lambda x: x[1]['revenue'])[0] if daily_data else 'N/A'
+            },
+            'weekly_trends': {k: dict(v) for k, v in weekly_data.items()},
+            'average_weekly_growth_rate': round(avg_growth_rate, 2),
+            'trend_direction': trend_direction,
+            'peak_week': max(
+                ((k, dict(v)) for k, v in weekly_data.items()), key=lambda x: x[1]['revenue']
+            ) if weekly_data else ('N/A', {}),
+            'total_weeks_analyzed': len(weekly_data)
+        }
+
+    def build_operational_metrics(self):
+        """Build operational efficiency metrics"""
+        operations = self.state['operations']
+        total_transactions = self.state['summary']['transactions']
+        total_services = operations['services']
+        total_products = operations['products']
+        mixed_transactions = operations['mixed']
+
+        return {
+            'transaction_composition': {
+                'service_only': operations['service_only'],
+                'product_only': operations['product_only'],
+                'mixed_service_product': mixed_transactions,
+                'mixed_transaction_rate': round(
+                    (mixed_transactions / total_transactions * 100), 2
+                ) if total_transactions > 0 else 0
+            },
+            'average_items_per_transaction': {
+                'services_per_transaction': round(total_services / total_transactions, 2) if total_transactions > 0 else 0,
+                'products_per_transaction': round(total_products / total_transactions, 2) if total_transactions > 0 else 0
+            },
+            'cross_selling_metrics': {
+                'cross_sell_success_rate': round(
+                    (mixed_transactions / total_transactions * 100), 2
+                ) if total_transactions > 0 else 0,
+                'total_cross_sell_opportunities': total_transactions,
+                'realized_cross_sells': mixed_transactions
+            }
+        }
+
+
+# ------------------  Normalization helpers ------------------
+
+def get_vehicle_keys(vehicle_details, current_year):
+    """
+    Get the (make, model, year) counter keys of a vehicle
+
+    Make and model are stripped; the year is only returned when it is a 4 digit
+    year between 1900 and the current year, otherwise it is an empty string.
+    """
+    make = vehicle_details.get('make', '')
+    model = vehicle_details.get('model', '')
+    year = vehicle_details.get('year', '')
+
+    if isinstance(make, str):
+        make = make.strip()
+    elif make:
+        make = str(make).strip()
+
+    if isinstance(model, str):
+        model = model.strip()
+    elif model:
+        model = str(model).strip()
+
+    if isinstance(year, str):
+        year = year.strip()
+    elif isinstance(year, (int, float)):
+        year = str(int(year))
+    else:
+        year = ''
+
+    # Only count valid years (4 digits, not '0', not empty, not in the future)
+    if not (year and year.isdigit() and len(year) == 4 and year != '0' and 1900 <= int(year) <= current_year):
+        year = ''
+
+    return make, model, year
+
+
+@lru_cache(maxsize=4096)
+def get_booking_day(booked_date):
+    """Get the weekday name of a YYYY-MM-DD booking date (None if missing or invalid)"""
+    if not booked_date:
+        return None
+    try:
+        booking_date = datetime.strptime(booked_date, '%Y-%m-%d').replace(tzinfo=ZoneInfo('Australia/Perth'))
+        return booking_date.strftime('%A')
+    except ValueError:
+        return None
+
+
+# ------------------  Date helpers ------------------
+
+def get_invoice_date_keys(invoice, operation_data):
+    """
+    Get the revenue and trend date keys of an invoice from effectiveDate (DD/MM/YYYY),
+    falling back to the createdAt date
+
+    Revenue keys only need the date parts while trend keys need a valid calendar date,
+    so an effectiveDate such as 31/02/2024 keys revenue but falls back for trends.
+
+    Returns:
+        tuple: (revenue_day, revenue_month, trend_day, trend_week); keys are None
+               when no date is available
+    """
+    revenue_day = revenue_month = trend_day = trend_week = None
+
+    effective_date = operation_data.get('effectiveDate', '')
+    if effective_date:
+        revenue_day, revenue_month, trend_day, trend_week = parse_effective_date(effective_date)
+        if trend_day:
+            return revenue_day, revenue_month, trend_day, trend_week
+
+    creation_timestamp = invoice.get('createdAt', 0)
+    if creation_timestamp:
+        created_date = datetime.fromtimestamp(creation_timestamp, ZoneInfo('Australia/Perth'))
+        fallback_day = created_date.strftime('%Y-%m-%d')
+        if not revenue_day:
+            revenue_day, revenue_month = fallback_day, fallback_day[:7]
+        trend_day, trend_week = fallback_day, get_week_key(created_date)
+
+    return revenue_day, revenue_month, trend_day, trend_week
+
+
+@lru_cache(maxsize=4096)
+def parse_effective_date(effective_date):
+    """
+    Parse a DD/MM/YYYY effectiveDate into (revenue_day, revenue_month, trend_day, trend_week)
+
+    Revenue keys are None when the value doesn't have three parts; trend keys are None
+    when it isn't a valid calendar date.
+    """
+    try:
+        day, month, year = effective_date.split('/')
+    except ValueError:
+        return None, None, None, None
+
+    # Convert from DD/MM/YYYY to YYYY-MM-DD for consistency
+    revenue_day = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    revenue_month = f"{year}-{month.zfill(2)}"
+    try:
+        date_obj = datetime(int(year), int(month), int(day))
+    except ValueError:
+        return revenue_day, revenue_month, None, None
+    return revenue_day, revenue_month, date_obj.strftime('%Y-%m-%d'), get_week_key(date_obj)
+
+
+def get_week_key(date_obj):
+    """Get the ISO week key (YYYY-Www) of a date"""
+    year, week, _ = date_obj.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# ------------------  Shared calculations ------------------
+
+def calculate_revenue_growth(daily_revenue):
+    """Calculate revenue growth metrics from a daily revenue mapping"""
+    if not daily_revenue:
+        return {'growth_rate': 0, 'trend': 'no_data'}
+
+    sorted_dates = sorted(daily_revenue.keys())
+    if len(sorted_dates) < 2:
+        return {'growth_rate': 0, 'trend': 'insufficient_data'}
+
+    # Calculate overall growth from first to last period
+    first_period_revenue = daily_revenue[sorted_dates[0]]
+    last_period_revenue = daily_revenue[sorted_dates[-1]]
+
+    if first_period_revenue > 0:
+        overall_growth = ((last_period_revenue - first_period_revenue) / first_period_revenue) * 100
+    else:
+        overall_growth = 0
+
+    if overall_growth > 5:
+        trend = 'strong_growth'
+    elif overall_growth > 0:
+        trend = 'moderate_growth'
+    elif overall_growth > -5:
+        trend = 'stable'
+    else:
+        trend = 'declining'
+
+    return {
+        'overall_growth_rate': round(overall_growth, 2),
+        'trend': trend,
+        'first_period_revenue': first_period_revenue,
+        'last_period_revenue': last_period_revenue,
+        'periods_analyzed': len(sorted_dates)
+    }
+
+
+def calculate_age_distribution(vehicle_ages):
+    """Calculate vehicle age distribution"""
+    if not vehicle_ages:
+        return {}
+
+    age_ranges = {
+        '0-2 years': 0,
+        '3-5 years': 0,
+        '6-10 years': 0,
+        '11-15 years': 0,
+        '16+ years': 0
+    }
+
+    for age in vehicle_ages:
+        if age <= 2:
+            age_ranges['0-2 years'] += 1
+        elif age <= 5:
+            age_ranges['3-5 years'] += 1
+        elif age <= 10:
+            age_ranges['6-10 years'] += 1
+        elif age <= 15:
+            age_ranges['11-15 years'] += 1
+        else:
+            age_ranges['16+ years'] += 1
+
+    return age_ranges
+
+
+# ------------------  Counter helpers ------------------
+
+# Counter maps keyed by data values (dates, names, methods); entries are dropped once a
+# subtraction brings all of their counters back to zero
+_DYNAMIC_COUNTER_MAPS = [
+    ('revenue', 'daily'), ('revenue', 'monthly'), ('revenue', 'payment_methods'),
+    ('services',),
+    ('products', 'items'), ('products', 'categories'),
+    ('customers', 'customers'), ('customers', 'domains'),
+    ('vehicles', 'makes'), ('vehicles', 'models'), ('vehicles', 'years'), ('vehicles', 'make_models'),
+    ('payments', 'methods'),
+    ('bookings', 'booked_by'), ('bookings', 'days'),
+    ('trends', 'daily'), ('trends', 'weekly')
+]
+
+
+def _merge_counters(target, source, sign):
+    """Recursively add (sign=1) or subtract (sign=-1) numeric counters of source into target"""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _merge_counters(target.setdefault(key, {}), value, sign)
+        else:
+            target[key] = target.get(key, 0) + sign * value
+
+
+def _prune_counters(state):
+    """Remove dynamic map entries whose counters have all dropped to zero"""
+    for path in _DYNAMIC_COUNTER_MAPS:
+        counters = state
+        for key in path:
+            counters = counters.get(key, {})
+        for key in list(counters.keys()):
+            if _is_zero(counters[key]):
+                del counters[key]
+
+
+def _is_zero(value):
+    if isinstance(value, dict):
+        return all(_is_zero(v) for v in value.values())
+    return abs(value) < 1e-6
+
+
+def _round_counters(counters):
+    """Round accumulated currency values so repeated add/subtract cycles don't drift"""
+    rounded = {}
+    for key, value in counters.items():
+        if isinstance(value, dict):
+            rounded[key] = _round_counters(value)
+        elif isinstance(value, float):
+            rounded[key] = round(value, 6)
+        else:
+            rounded[key] = value
+    return rounded
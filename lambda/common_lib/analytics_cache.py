@@ -0,0 +1,167 @@
+"""
+Analytics Result Cache
+
+This module caches AnalyticsManager results per (date window, requested sections)
+in two tiers: an in-process LRU that survives warm Lambda invocations and the
+AnalyticsCache table shared by every container.
+
+Cached results are validated against per-month generation counters. Invoice
+mutations increment the counter of the invoice's effective month, so only the
+windows containing that month are recomputed. Every entry also expires after a
+TTL, short for windows including today and long for windows that ended before
+today, so a result cached past a missed invalidation eventually heals itself.
+Results are only cached when compute() returns; failed reads raise instead.
+All date/time operations use Australia/Perth timezone.
+"""
+import json
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import db_utils as db
+
+MEMORY_CACHE_SIZE = 64
+OPEN_WINDOW_TTL_SECONDS = 900
+CLOSED_WINDOW_TTL_SECONDS = 7 * 24 * 3600
+
+# DynamoDB items are limited to 400 KB; larger results are only cached in memory
+MAX_PERSISTED_RESULT_BYTES = 350 * 1024
+
+# Incremented to invalidate every cached result (e.g. after restoring invoices)
+GLOBAL_GENERATION_KEY = 'GEN#ALL'
+
+# Cache key -> (serialized result, generations, expires_at); kept across warm invocations
+_memory_cache = OrderedDict()
+
+
+def get_or_compute(start_date_str, end_date_str, view, compute):
+    """
+    Get a cached analytics result or compute and cache it
+
+    Args:
+        start_date_str: Window start date in YYYY-MM-DD format
+        end_date_str: Window end date in YYYY-MM-DD format (inclusive)
+        view: Identifier of the requested result sections
+        compute: Function computing the result when it isn't cached (raises when its
+                 reads are incomplete, so partial results are never stored)
+
+    Returns:
+        dict: Analytics result
+    """
+    if not db.ANALYTICS_CACHE_TABLE:
+        return compute()
+
+    cache_key = f"RESULT#{start_date_str}#{end_date_str}#{view}"
+    generation_keys = get_generation_keys(start_date_str, end_date_str)
+
+    # Read the generations before computing so concurrent invalidations are never lost
+    records = db.get_analytics_cache_records(generation_keys)
+    if records is None:
+        return compute()
+    generations = {key: int(records.get(key, {}).get('generation', 0)) for key in generation_keys}
+
+    cached = _get_memory_result(cache_key, generations)
+    if cached is None:
+        cached = _get_persisted_result(cache_key, generations)
+    if cached is not None:
+        return json.loads(cached)
+
+    result = compute()
+    _store_result(cache_key, json.dumps(result), generations, end_date_str)
+    return result
+
+
+def get_generation_keys(start_date_str, end_date_str):
+    """Get the generation counter keys a window depends on (one per month plus the global counter)"""
+    keys = [GLOBAL_GENERATION_KEY]
+    year, month = int(start_date_str[:4]), int(start_date_str[5:7])
+    end_year, end_month = int(end_date_str[:4]), int(end_date_str[5:7])
+    while (year, month) <= (end_year, end_month):
+        keys.append(f"GEN#{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return keys
+
+
+def invalidate_invoice(invoice):
+    """
+    Invalidate cached results for windows containing the invoice's effective date
+
+    Falls back to invalidating every cached result when the month counter cannot be
+    incremented; if that fails too, the stale entries expire with their TTL.
+
+    Returns:
+        bool: True if the cached results were invalidated
+    """
+    date_key = db.get_invoice_effective_date_key(invoice.get('analyticsData'), invoice.get('createdAt'))
+    if not date_key:
+        return True
+    if db.increment_analytics_cache_generation(f"GEN#{date_key[:7]}"):
+        return True
+
+    _memory_cache.clear()
+    return db.increment_analytics_cache_generation(GLOBAL_GENERATION_KEY)
+
+
+def invalidate_all():
+    """Invalidate every cached analytics result"""
+    _memory_cache.clear()
+    if db.ANALYTICS_CACHE_TABLE:
+        db.increment_analytics_cache_generation(GLOBAL_GENERATION_KEY)
+
+
+def is_closed_window(end_date_str):
+    """Check whether a window ended before today (its invoices are no longer expected to change)"""
+    return end_date_str < datetime.now(ZoneInfo('Australia/Perth')).strftime('%Y-%m-%d')
+
+
+def _get_memory_result(cache_key, generations):
+    entry = _memory_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    result_json, entry_generations, expires_at = entry
+    if entry_generations != generations or (expires_at and expires_at <= time.time()):
+        del _memory_cache[cache_key]
+        return None
+
+    _memory_cache.move_to_end(cache_key)
+    return result_json
+
+
+def _get_persisted_result(cache_key, generations):
+    records = db.get_analytics_cache_records([cache_key])
+    record = records.get(cache_key) if records else None
+    if not record:
+        return None
+
+    expires_at = record.get('ttl')
+    if json.loads(record['generations']) != generations or (expires_at and expires_at <= time.time()):
+        return None
+
+    result_data = record['result']
+    result_json = zlib.decompress(getattr(result_data, 'value', result_data)).decode('utf-8')
+    _set_memory_result(cache_key, result_json, generations, expires_at)
+    return result_json
+
+
+def _store_result(cache_key, result_json, generations, end_date_str):
+    ttl_seconds = CLOSED_WINDOW_TTL_SECONDS if is_closed_window(end_date_str) else OPEN_WINDOW_TTL_SECONDS
+    expires_at = int(time.time()) + ttl_seconds
+    _set_memory_result(cache_key, result_json, generations, expires_at)
+
+    result_data = zlib.compress(result_json.encode('utf-8'))
+    if len(result_data) > MAX_PERSISTED_RESULT_BYTES:
+        print(f"Analytics result {cache_key} is too large to persist ({len(result_data)} bytes)")
+        return
+    db.put_analytics_cache_result(cache_key, result_data, json.dumps(generations, sort_keys=True), expires_at)
+
+
+def _set_memory_result(cache_key, result_json, generations, expires_at):
+    _memory_cache[cache_key] = (result_json, generations, expires_at)
+    _memory_cache.move_to_end(cache_key)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
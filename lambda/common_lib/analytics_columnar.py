@@ -0,0 +1,206 @@
+"""
+Columnar Analytics Accumulators
+
+This module accumulates the invoice-level analytics counters (summary, revenue,
+payments, trends and operations) of an AnalyticsAggregate from column arrays of
+amounts, date keys and category codes instead of updating dictionaries per
+invoice. Sections with nested line items (services, products, customers,
+vehicles, bookings) are still fed record by record.
+
+Amounts are summed with cumulative sums in invoice order, so every total is
+bit-for-bit identical to the row-by-row accumulation. NumPy is optional; when
+it is not installed callers fall back to the row accumulators.
+"""
+import gc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from analytics_aggregate import normalize_invoice, plan_fields
+
+# Sections accumulated from column arrays; the others are fed record by record
+COLUMNAR_SECTIONS = ('summary', 'revenue', 'payments', 'trends', 'operations')
+
+
+def is_available():
+    """Check whether the columnar accumulators can be used"""
+    return np is not None
+
+
+def add_invoices(aggregate, invoices, current_year, fields):
+    """
+    Normalize invoices and add them to an aggregate
+
+    Args:
+        aggregate: AnalyticsAggregate to update
+        invoices: List of invoice records
+        current_year: Current Perth year (see normalize_invoice)
+        fields: Record field groups to populate (see normalize_invoice)
+    """
+    # The records are acyclic, so skip cyclic garbage collection passes while allocating them
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        records = [normalize_invoice(invoice, current_year, fields) for invoice in invoices]
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    aggregate.state['invoice_count'] += len(invoices)
+    return add_records(aggregate, [record for record in records if record is not None])
+
+
+def add_records(aggregate, records):
+    """
+    Add normalized invoice records to an aggregate
+
+    Args:
+        aggregate: AnalyticsAggregate to update
+        records: List of InvoiceRecord
+    """
+    row_accumulators = aggregate.get_accumulators(
+        [section for section in aggregate.sections if section not in COLUMNAR_SECTIONS]
+    )
+    for record in records:
+        for accumulate in row_accumulators:
+            accumulate(record)
+
+    state = aggregate.state
+    state['summary']['transactions'] += len(records)
+    sections = [section for section in COLUMNAR_SECTIONS if section in aggregate.sections]
+    if not records or not sections:
+        return aggregate
+
+    fields = plan_fields(sections)
+    amounts = service_counts = product_counts = None
+    if 'amount' in fields:
+        amounts = np.fromiter((record.amount for record in records), dtype=np.float64, count=len(records))
+    if 'line_items' in fields:
+        service_counts = np.fromiter((len(record.services) for record in records), dtype=np.int64, count=len(records))
+        product_counts = np.fromiter((len(record.orders) for record in records), dtype=np.int64, count=len(records))
+
+    if 'summary' in sections:
+        _add_summary(state['summary'], records, amounts)
+    if 'revenue' in sections:
+        _add_revenue(state['revenue'], records, amounts)
+    if 'payments' in sections:
+        _add_payments(state['payments'], records, amounts)
+    if 'trends' in sections:
+        _add_trends(state['trends'], records, amounts, service_counts, product_counts)
+    if 'operations' in sections:
+        _add_operations(state['operations'], service_counts, product_counts)
+    return aggregate
+
+
+def _add_summary(summary, records, amounts):
+    service_prices = [price for record in records for _, price in record.services]
+    product_prices = [total_price for record in records for _, total_price, _ in record.orders]
+    prebooked = sum(1 for record in records if record.is_prebooked)
+
+    summary['total_revenue'] = _running_sum(summary['total_revenue'], amounts)
+    if service_prices:
+        summary['service_revenue'] = _running_sum(summary['service_revenue'], np.array(service_prices, dtype=np.float64))
+    if product_prices:
+        summary['product_revenue'] = _running_sum(summary['product_revenue'], np.array(product_prices, dtype=np.float64))
+    summary['pre_booked'] += prebooked
+    summary['non_booked'] += len(records) - prebooked
+
+
+def _add_revenue(revenue, records, amounts):
+    dated = np.array([bool(record.revenue_day) for record in records])
+    dated_amounts = amounts[dated]
+    dated_records = [record for record in records if record.revenue_day]
+
+    _add_grouped_sums(revenue['daily'], [record.revenue_day for record in dated_records], dated_amounts, 0.0)
+    _add_grouped_sums(revenue['monthly'], [record.revenue_month for record in dated_records], dated_amounts, 0.0)
+    _add_grouped_sums(revenue['payment_methods'], [record.payment_method for record in records], amounts, 0.0)
+
+
+def _add_payments(payments, records, amounts):
+    methods = payments['methods']
+    codes, keys = _encode([record.payment_method for record in records])
+    counts = np.bincount(codes, minlength=len(keys))
+    for code, key, total in _group_running_sums(codes, keys, amounts, lambda key: methods.get(key, {}).get('amount', 0)):
+        counters = methods.setdefault(key, {'count': 0, 'amount': 0})
+        counters['count'] += int(counts[code])
+        counters['amount'] = total
+
+    paid_before = sum(1 for record in records if record.paid_before)
+    payments['timing']['before_operation'] += paid_before
+    payments['timing']['after_operation'] += len(records) - paid_before
+
+
+def _add_trends(trends, records, amounts, service_counts, product_counts):
+    dated = np.array([bool(record.trend_day) for record in records])
+    if not dated.any():
+        return
+    dated_records = [record for record in records if record.trend_day]
+    dated_amounts = amounts[dated]
+    dated_services = service_counts[dated]
+    dated_products = product_counts[dated]
+
+    for bucket, keys in ((trends['daily'], [record.trend_day for record in dated_records]),
+                         (trends['weekly'], [record.trend_week for record in dated_records])):
+        codes, unique_keys = _encode(keys)
+        counts = np.bincount(codes, minlength=len(unique_keys))
+        services = np.bincount(codes, weights=dated_services, minlength=len(unique_keys))
+        products = np.bincount(codes, weights=dated_products, minlength=len(unique_keys))
+        for code, key, total in _group_running_sums(codes, unique_keys, dated_amounts,
+                                                    lambda key: bucket.get(key, {}).get('revenue', 0)):
+            counters = bucket.setdefault(key, {
+                'transaction_count': 0,
+                'revenue': 0,
+                'service_count': 0,
+                'product_count': 0
+            })
+            counters['transaction_count'] += int(counts[code])
+            counters['revenue'] = total
+            counters['service_count'] += int(services[code])
+            counters['product_count'] += int(products[code])
+
+
+def _add_operations(operations, service_counts, product_counts):
+    has_services = service_counts > 0
+    has_products = product_counts > 0
+
+    operations['services'] += int(service_counts.sum())
+    operations['products'] += int(product_counts.sum())
+    operations['mixed'] += int(np.count_nonzero(has_services & has_products))
+    operations['service_only'] += int(np.count_nonzero(has_services & ~has_products))
+    operations['product_only'] += int(np.count_nonzero(~has_services & has_products))
+
+
+# ------------------  Column helpers ------------------
+
+def _encode(keys):
+    """Encode keys as integer codes in first-occurrence order"""
+    index = {}
+    codes = np.fromiter((index.setdefault(key, len(index)) for key in keys), dtype=np.int64, count=len(keys))
+    return codes, list(index)
+
+
+def _running_sum(initial, values):
+    """Sum values onto initial in order (matches repeated += on Python floats)"""
+    if not len(values):
+        return initial
+    return float(np.cumsum(np.concatenate(([initial], values)))[-1])
+
+
+def _group_running_sums(codes, keys, values, get_initial):
+    """Yield (code, key, total) per group in first-occurrence order, summing each group's values in order"""
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+    for code, key in enumerate(keys):
+        group_values = values[order[bounds[code]:bounds[code + 1]]]
+        yield code, key, _running_sum(get_initial(key), group_values)
+
+
+def _add_grouped_sums(target, keys, values, default):
+    """Add values into a {key: total} mapping, grouped by key"""
+    if not keys:
+        return
+    codes, unique_keys = _encode(keys)
+    for _, key, total in _group_running_sums(codes, unique_keys, values, lambda key: target.get(key, default)):
+        target[key] = total
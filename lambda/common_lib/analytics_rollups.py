@@ -0,0 +1,353 @@
+"""
+Analytics Rollups for Business Intelligence Operations
+
+This module maintains pre-aggregated analytics counters per day, ISO week and
+calendar month in the AnalyticsRollups table. Invoice mutations apply their
+delta to the affected periods, and analytics requests combine the smallest set
+of periods that exactly covers the requested date range instead of reading
+every invoice in it.
+
+The periods of an invoice change are written in one transaction that is fenced
+by the rebuild marker, so they never disagree and never race a rebuild. A change
+that cannot be applied marks the rollups stale, and analytics read the invoices
+until the next rebuild.
+All date/time operations use Australia/Perth timezone.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import db_utils as db
+import analytics_cache
+from analytics_aggregate import AnalyticsAggregate
+
+PERIOD_DAY = 'DAY'
+PERIOD_WEEK = 'WEEK'
+PERIOD_MONTH = 'MONTH'
+
+# Rebuild marker: its state says whether the rollups can be trusted, and every rebuild
+# (or fencing write) increments its version, failing updates that read it before
+REBUILD_MARKER_KEY = 'META#rebuild'
+STATE_READY = 'READY'
+STATE_REBUILDING = 'REBUILDING'
+STATE_STALE = 'STALE'
+
+# Periods whose counters exceed this size are stored as overflow records and read from their days
+# (DynamoDB items are limited to 400 KB)
+MAX_ROLLUP_DATA_BYTES = 350 * 1024
+
+MAX_UPDATE_ATTEMPTS = 5
+MAX_REBUILD_ATTEMPTS = 3
+
+
+def get_day_key(date_key):
+    """Get the daily period key for a YYYY-MM-DD date"""
+    return f"{PERIOD_DAY}#{date_key}"
+
+
+def get_week_key(date_key):
+    """Get the ISO week period key (WEEK#YYYY-Www) for a YYYY-MM-DD date"""
+    iso_year, iso_week, _ = datetime.strptime(date_key, '%Y-%m-%d').isocalendar()
+    return f"{PERIOD_WEEK}#{iso_year}-W{iso_week:02d}"
+
+
+def get_month_key(date_key):
+    """Get the monthly period key (MONTH#YYYY-MM) for a YYYY-MM-DD date"""
+    return f"{PERIOD_MONTH}#{date_key[:7]}"
+
+
+def get_period_keys(date_key):
+    """Get every rollup period key that includes the given date"""
+    return [get_day_key(date_key), get_week_key(date_key), get_month_key(date_key)]
+
+
+def get_period_type(period_key):
+    """Get the period type (DAY, WEEK or MONTH) of a period key"""
+    return period_key.split('#', 1)[0]
+
+
+def get_period_day_keys(period_key):
+    """Get the daily period keys of every date in a period"""
+    period_type, period_value = period_key.split('#', 1)
+    if period_type == PERIOD_DAY:
+        return [period_key]
+
+    if period_type == PERIOD_WEEK:
+        iso_year, iso_week = period_value.split('-W')
+        first_day = datetime.fromisocalendar(int(iso_year), int(iso_week), 1).date()
+        days = 7
+    else:
+        first_day = datetime.strptime(f"{period_value}-01", '%Y-%m-%d').date()
+        days = ((first_day.replace(day=28) + timedelta(days=4)).replace(day=1) - first_day).days
+    return [get_day_key((first_day + timedelta(days=offset)).isoformat()) for offset in range(days)]
+
+
+def get_marker_state(marker):
+    """Get the state of a rebuild marker record (None if the rollups were never rebuilt)"""
+    if not marker:
+        return None
+    # Markers written before the state was recorded only existed once a rebuild completed
+    return marker.get('state', STATE_READY)
+
+
+def plan_periods(start_date_str, end_date_str):
+    """
+    Plan the rollup periods that cover a date range exactly once
+
+    Whole calendar months are read as MONTH rollups, whole Monday-Sunday weeks
+    outside those months as WEEK rollups and the remaining days as DAY rollups.
+
+    Args:
+        start_date_str: Start date in YYYY-MM-DD format
+        end_date_str: End date in YYYY-MM-DD format (inclusive)
+
+    Returns:
+        list: Period keys in chronological order
+    """
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+
+    def full_month_end(day):
+        """Last day of the month starting at day, if the whole month is in range"""
+        if day.day != 1:
+            return None
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        month_end = next_month - timedelta(days=1)
+        return month_end if month_end <= end_date else None
+
+    period_keys = []
+    current = start_date
+    while current <= end_date:
+        month_end = full_month_end(current)
+        if month_end:
+            period_keys.append(get_month_key(current.isoformat()))
+            current = month_end + timedelta(days=1)
+            continue
+
+        week_end = current + timedelta(days=6)
+        if current.weekday() == 0 and week_end <= end_date and not any(
+            full_month_end(current + timedelta(days=offset)) for offset in range(1, 7)
+        ):
+            period_keys.append(get_week_key(current.isoformat()))
+            current = week_end + timedelta(days=1)
+            continue
+
+        period_keys.append(get_day_key(current.isoformat()))
+        current += timedelta(days=1)
+
+    return period_keys
+
+
+def apply_invoice(invoice, sign=1):
+    """Add (sign=1) or remove (sign=-1) an invoice from its day, week and month rollups"""
+    if sign < 0:
+        return apply_invoice_change(old_invoice=invoice)
+    return apply_invoice_change(new_invoice=invoice)
+
+
+def replace_invoice(old_invoice, new_invoice):
+    """Move an active invoice's contribution from its old record state to the new one"""
+    return apply_invoice_change(old_invoice, new_invoice)
+
+
+def apply_invoice_change(old_invoice=None, new_invoice=None):
+    """
+    Apply an invoice change to its day, week and month rollups in one transaction
+
+    The affected periods are read with the rebuild marker and written together, each
+    guarded by its record version and the marker version, retrying with backoff when
+    another writer updated them first. While a rebuild is running the change is not
+    applied; the marker version is incremented instead so the rebuild starts over and
+    reads the invoice. A change that still fails marks the rollups stale.
+
+    Args:
+        old_invoice: Active invoice state being removed (None if newly active)
+        new_invoice: Active invoice state being added (None if no longer active)
+
+    Returns:
+        bool: True if the rollups reflect the change (or are not trusted anyway)
+    """
+    if not db.ANALYTICS_ROLLUPS_TABLE:
+        return False
+
+    # Period key -> (invoice delta, sign) pairs, removals first
+    period_deltas = {}
+    for invoice, sign in ((old_invoice, -1), (new_invoice, 1)):
+        if not invoice:
+            continue
+        date_key = db.get_invoice_effective_date_key(invoice.get('analyticsData'), invoice.get('createdAt'))
+        if not date_key:
+            print(f"Invoice {invoice.get('invoiceId')} has no effective date, skipping analytics rollups")
+            continue
+        delta = AnalyticsAggregate().add_invoice(invoice)
+        for period_key in get_period_keys(date_key):
+            period_deltas.setdefault(period_key, []).append((delta, sign))
+
+    if not period_deltas:
+        return True
+
+    invoice_id = (new_invoice or old_invoice).get('invoiceId')
+    for attempt in range(MAX_UPDATE_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+
+        records = db.get_analytics_rollups(list(period_deltas) + [REBUILD_MARKER_KEY], consistent_read=True)
+        if records is None:
+            continue
+
+        marker = records.get(REBUILD_MARKER_KEY)
+        state = get_marker_state(marker)
+        if state in (None, STATE_STALE):
+            # Nothing reads the rollups until a rebuild, which starts after this invoice was written
+            return True
+        if state == STATE_REBUILDING:
+            if db.update_analytics_rollups_marker(REBUILD_MARKER_KEY, expected_version=int(marker['version'])) is not None:
+                return True
+            continue
+
+        rollups = []
+        for period_key, deltas in period_deltas.items():
+            record = records.get(period_key)
+            if record and record.get('overflow'):
+                # Overflowed periods are read from their days until the next rebuild
+                continue
+            aggregate = AnalyticsAggregate.from_json(record['data']) if record else AnalyticsAggregate()
+            for delta, sign in deltas:
+                aggregate.merge(delta, sign)
+            expected_version = int(record['version']) if record else None
+            rollups.append((period_key, get_period_type(period_key), serialize_aggregate(aggregate), expected_version))
+
+        if db.write_analytics_rollups(rollups, REBUILD_MARKER_KEY, int(marker['version'])):
+            return True
+
+    print(f"Failed to update analytics rollups {list(period_deltas)} for invoice {invoice_id}")
+    mark_stale()
+    return False
+
+
+def serialize_aggregate(aggregate):
+    """Serialize a period aggregate, or return None when it is too large to store (overflow)"""
+    data = aggregate.to_json()
+    return data if len(data.encode('utf-8')) <= MAX_ROLLUP_DATA_BYTES else None
+
+
+def mark_stale():
+    """
+    Stop trusting the rollups until the next rebuild (e.g. after a failed update or an invoice restore)
+
+    Returns:
+        bool: True if the rollups were marked stale
+    """
+    if not db.ANALYTICS_ROLLUPS_TABLE:
+        return False
+    if db.update_analytics_rollups_marker(REBUILD_MARKER_KEY, STATE_STALE) is None:
+        return False
+    print("Analytics rollups marked stale; run the rebuild_analytics_rollups operation to restore them")
+    return True
+
+
+def load_aggregate(start_date_str, end_date_str):
+    """
+    Load the analytics aggregate for a date range from the rollups
+
+    Overflowed week and month periods are read from their days instead.
+
+    Args:
+        start_date_str: Start date in YYYY-MM-DD format
+        end_date_str: End date in YYYY-MM-DD format (inclusive)
+
+    Returns:
+        AnalyticsAggregate: Combined aggregate, or None if rollups are unavailable
+    """
+    if not db.ANALYTICS_ROLLUPS_TABLE:
+        return None
+
+    period_keys = plan_periods(start_date_str, end_date_str)
+    records = db.get_analytics_rollups(period_keys + [REBUILD_MARKER_KEY])
+    if records is None or get_marker_state(records.get(REBUILD_MARKER_KEY)) != STATE_READY:
+        return None
+
+    overflowed_keys = [
+        period_key for period_key in period_keys
+        if records.get(period_key, {}).get('overflow') and get_period_type(period_key) != PERIOD_DAY
+    ]
+    if overflowed_keys:
+        day_keys = [day_key for period_key in overflowed_keys for day_key in get_period_day_keys(period_key)]
+        day_records = db.get_analytics_rollups(day_keys)
+        if day_records is None:
+            return None
+        records.update(day_records)
+        period_keys = [key for key in period_keys if key not in overflowed_keys] + day_keys
+
+    aggregate = AnalyticsAggregate()
+    for period_key in period_keys:
+        record = records.get(period_key)
+        if record and record.get('overflow'):
+            print(f"Analytics rollup {period_key} overflowed, reading the invoices instead")
+            return None
+        if record:
+            aggregate.merge(AnalyticsAggregate.from_json(record['data']))
+    return aggregate
+
+
+def rebuild_rollups():
+    """
+    Rebuild every analytics rollup from the active invoices
+
+    The rebuild marker is set to REBUILDING first, so analytics fall back to reading
+    invoices and invoice changes stop updating the rollups. Changes made while the
+    rebuild runs increment the marker version instead, and the rebuild only marks the
+    rollups READY if the version is still the one it started at; otherwise it starts
+    over, and after MAX_REBUILD_ATTEMPTS leaves the rollups stale.
+
+    Returns:
+        dict: Rebuild statistics
+    """
+    for attempt in range(1, MAX_REBUILD_ATTEMPTS + 1):
+        marker_version = db.update_analytics_rollups_marker(REBUILD_MARKER_KEY, STATE_REBUILDING)
+        if marker_version is None:
+            raise Exception("Failed to start the analytics rollups rebuild")
+
+        db.clear_analytics_rollups(keep_keys=[REBUILD_MARKER_KEY])
+
+        aggregates = {}
+        invoices_processed = 0
+        invoices_skipped = 0
+        for invoice in db.get_active_invoices():
+            date_key = db.get_invoice_effective_date_key(invoice.get('analyticsData'), invoice.get('createdAt'))
+            if not date_key:
+                invoices_skipped += 1
+                continue
+
+            for period_key in get_period_keys(date_key):
+                aggregates.setdefault(period_key, AnalyticsAggregate()).add_invoice(invoice)
+            invoices_processed += 1
+
+        items = [
+            db.build_analytics_rollup_item(period_key, get_period_type(period_key), serialize_aggregate(aggregate))
+            for period_key, aggregate in aggregates.items()
+        ]
+        db.batch_put_items(db.ANALYTICS_ROLLUPS_TABLE, items)
+
+        completed = db.update_analytics_rollups_marker(
+            REBUILD_MARKER_KEY, STATE_READY, expected_version=marker_version
+        ) is not None
+        if completed:
+            break
+        print(f"Invoices changed during analytics rollups rebuild attempt {attempt}, starting over")
+    else:
+        mark_stale()
+
+    analytics_cache.invalidate_all()
+
+    overflowed = sum(1 for item in items if 'overflow' in item)
+    print(f"Rebuilt {len(aggregates)} analytics rollups from {invoices_processed} invoices "
+          f"(completed: {completed}, attempts: {attempt}, overflowed: {overflowed})")
+    return {
+        'completed': completed,
+        'attempts': attempt,
+        'periods_written': len(aggregates),
+        'periods_overflowed': overflowed,
+        'invoices_processed': invoices_processed,
+        'invoices_skipped': invoices_skipped
+    }
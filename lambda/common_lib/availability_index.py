@@ -0,0 +1,294 @@
+"""
+Availability Index for appointment slot operations
+
+This module maintains one AvailabilityIndex record per date listing the time
+slots occupied by appointments on that date: the scheduled slots of active
+appointments and the priority 1 selected slots of paid pending appointments.
+Appointment writes update the index records of the affected dates in the same
+transaction as the appointment, so availability reads fetch the index and the
+manually set UnavailableSlots records in one batch request instead of querying
+the appointments. The rebuild marker fences full rebuilds against concurrent
+appointment writes.
+All date/time operations use Australia/Perth timezone.
+"""
+import random
+import time
+
+import db_utils as db
+
+# Rebuild marker: its state says whether the index can be trusted, and every rebuild
+# (or appointment write during a rebuild) increments its version
+REBUILD_MARKER_DATE = 'META#rebuild'
+STATE_READY = 'READY'
+STATE_REBUILDING = 'REBUILDING'
+STATE_STALE = 'STALE'
+
+MAX_UPDATE_ATTEMPTS = 5
+MAX_REBUILD_ATTEMPTS = 3
+
+# Scheduled appointment slots are listed before pending appointment slots
+SLOT_REASON_ORDER = {'scheduled_appointment': 0, 'pending_appointment': 1}
+
+
+def get_scheduled_slots(scheduled_appointments):
+    """Get the time slots of appointments scheduled on a date that are not cancelled or completed"""
+    scheduled_slots = []
+
+    for appointment in scheduled_appointments:
+        try:
+            # Check if appointment is confirmed or pending (not cancelled or completed)
+            status = appointment.get('status', '').upper()
+            appointment_id = appointment.get('appointmentId', 'unknown')
+
+            if status not in ['CANCELLED', 'COMPLETED']:
+                scheduled_time_slot = appointment.get('scheduledTimeSlot')
+                if scheduled_time_slot and isinstance(scheduled_time_slot, dict):
+                    start_time = scheduled_time_slot.get('start')
+                    end_time = scheduled_time_slot.get('end')
+                    if start_time and end_time:
+                        time_slot = f"{start_time}-{end_time}"
+                        scheduled_slots.append({
+                            'timeSlot': time_slot,
+                            'reason': 'scheduled_appointment',
+                            'appointmentId': appointment_id,
+                            'status': status
+                        })
+                    else:
+                        print(f"Warning: Missing start/end time in scheduledTimeSlot for appointment {appointment_id}")
+                else:
+                    print(f"Info: No scheduledTimeSlot for appointment {appointment_id} (status: {status})")
+
+        except Exception as e:
+            print(f"Warning: Error processing scheduled appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
+
+    return scheduled_slots
+
+
+def get_pending_slots_by_date(pending_appointments):
+    """Get the priority 1 slots of paid pending appointments, grouped by slot date"""
+    slots_by_date = {}
+
+    for appointment in pending_appointments:
+        try:
+            appointment_id = appointment.get('appointmentId', 'unknown')
+
+            if appointment.get('paymentStatus') == 'paid':
+                status = appointment.get('status', '').upper()
+                selected_time_slots = appointment.get('selectedSlots')
+
+                if selected_time_slots and isinstance(selected_time_slots, list):
+                    for slot in selected_time_slots:
+                        try:
+                            if isinstance(slot, dict):
+                                slot_date = slot.get('date')
+                                slot_priority = slot.get('priority')
+
+                                if slot_date and slot_priority and int(slot_priority) == 1:
+                                    start_time = slot.get('start')
+                                    end_time = slot.get('end')
+                                    if start_time and end_time:
+                                        time_slot = f"{start_time}-{end_time}"
+                                        slots_by_date.setdefault(slot_date, []).append({
+                                            'timeSlot': time_slot,
+                                            'reason': 'pending_appointment',
+                                            'appointmentId': appointment_id,
+                                            'status': status
+                                        })
+                                    else:
+                                        print(f"Warning: Missing start/end time in selected slot for appointment {appointment_id}")
+                            else:
+                                print(f"Warning: Invalid slot format in selectedSlots for appointment {appointment_id}")
+                        except Exception as e:
+                            print(f"Warning: Error processing slot for appointment {appointment_id}: {str(e)}")
+                else:
+                    print(f"Info: No valid selectedSlots for paid pending appointment {appointment_id}")
+
+        except Exception as e:
+            print(f"Warning: Error processing pending appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
+
+    return slots_by_date
+
+
+def get_appointment_slots_by_date(appointment):
+    """Get the slots an appointment occupies, grouped by date"""
+    slots_by_date = {}
+    if not appointment:
+        return slots_by_date
+
+    scheduled_date = appointment.get('scheduledDate')
+    if scheduled_date:
+        scheduled_slots = get_scheduled_slots([appointment])
+        if scheduled_slots:
+            slots_by_date[scheduled_date] = scheduled_slots
+
+    # Matches the status-index query for 'PENDING' used to find pending appointments
+    if appointment.get('status') == 'PENDING':
+        for slot_date, slots in get_pending_slots_by_date([appointment]).items():
+            slots_by_date.setdefault(slot_date, []).extend(slots)
+
+    return slots_by_date
+
+
+def get_marker_state(marker):
+    """Get the state of a rebuild marker record (None if the index was never rebuilt)"""
+    if not marker:
+        return None
+    # Markers written before the state was recorded only existed once a rebuild completed
+    return marker.get('state', STATE_READY)
+
+
+def write_appointment(read_change):
+    """
+    Write an appointment change and its availability index records in one transaction
+
+    The index records of the dates the appointment occupied or now occupies are read
+    with the rebuild marker and written with the appointment, each guarded by its
+    record version and the marker version, so the appointment is never stored
+    without its slots. While a rebuild is running the index records are left alone
+    and the transaction increments the marker version instead, so the rebuild starts
+    over and reads the appointment. Conflicts are retried with backoff, re-reading
+    the appointment; if the transaction still fails nothing is written.
+
+    Args:
+        read_change: Function returning (old_appointment, new_appointment, appointment_write)
+                     for the current appointment state, where appointment_write is the
+                     TransactWriteItems entry writing the appointment; it is called again
+                     on every retry and may return None to abort
+
+    Returns:
+        bool: True if the appointment was written
+    """
+    appointment_id = None
+    for attempt in range(MAX_UPDATE_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+
+        change = read_change()
+        if change is None:
+            return False
+        old_appointment, new_appointment, appointment_write = change
+        appointment = new_appointment or old_appointment
+        appointment_id = appointment.get('appointmentId', 'unknown') if appointment else None
+
+        old_slots_by_date = get_appointment_slots_by_date(old_appointment)
+        new_slots_by_date = get_appointment_slots_by_date(new_appointment)
+        changed_dates = [
+            date for date in dict.fromkeys(list(old_slots_by_date) + list(new_slots_by_date))
+            if old_slots_by_date.get(date) != new_slots_by_date.get(date)
+        ]
+
+        records = db.get_availability_index_records(changed_dates + [REBUILD_MARKER_DATE], consistent_read=True)
+        if records is None:
+            continue
+
+        marker = records.get(REBUILD_MARKER_DATE)
+        state = get_marker_state(marker)
+        index_records = []
+        if state == STATE_READY:
+            for date in changed_dates:
+                record = records.get(date)
+                scheduled_slots = [
+                    slot for slot in (record.get('scheduledSlots', []) if record else [])
+                    if slot.get('appointmentId') != appointment_id
+                ]
+                scheduled_slots.extend(new_slots_by_date.get(date, []))
+                scheduled_slots.sort(key=lambda slot: SLOT_REASON_ORDER.get(slot.get('reason'), 0))
+                index_records.append((date, scheduled_slots, int(record['version']) if record else None))
+
+        marker_version = int(marker['version']) if marker else None
+        if db.write_appointment_availability(
+            appointment_write, index_records, REBUILD_MARKER_DATE, marker_version,
+            fence_rebuild=state == STATE_REBUILDING
+        ):
+            return True
+
+    print(f"Failed to write appointment {appointment_id} with its availability index records")
+    return False
+
+
+def load_dates(dates):
+    """
+    Load the manually set and appointment slots of several dates from the index
+
+    Args:
+        dates: List of dates in YYYY-MM-DD format
+
+    Returns:
+        tuple: (unavailable slots records keyed by date, scheduled slots lists keyed by date),
+               or None if the index is unavailable
+    """
+    if not db.AVAILABILITY_INDEX_TABLE:
+        return None
+
+    records = db.get_availability_records(dates, REBUILD_MARKER_DATE)
+    if records is None:
+        return None
+
+    unavailable_records, index_records = records
+    if get_marker_state(index_records.get(REBUILD_MARKER_DATE)) != STATE_READY:
+        return None
+
+    scheduled_slots_by_date = {
+        date: index_records[date].get('scheduledSlots', []) if date in index_records else []
+        for date in dates
+    }
+    return unavailable_records, scheduled_slots_by_date
+
+
+def rebuild_index():
+    """
+    Rebuild every availability index record from the appointments
+
+    The rebuild marker is set to REBUILDING first, so availability reads fall back
+    to querying appointments and appointment writes stop updating the index.
+    Appointment writes made while the rebuild runs increment the marker version
+    instead, and the rebuild only marks the index READY if the version is still the
+    one it started at; otherwise it starts over, and after MAX_REBUILD_ATTEMPTS
+    leaves the index stale.
+
+    Returns:
+        dict: Rebuild statistics
+    """
+    for attempt in range(1, MAX_REBUILD_ATTEMPTS + 1):
+        marker_version = db.update_availability_index_marker(REBUILD_MARKER_DATE, STATE_REBUILDING)
+        if marker_version is None:
+            raise Exception("Failed to start the availability index rebuild")
+
+        db.clear_availability_index(keep_dates=[REBUILD_MARKER_DATE])
+
+        slots_by_date = {}
+        appointments_processed = 0
+        appointments = db.iter_items(
+            'scan', db.APPOINTMENTS_TABLE, db.deserialize_item_json_safe,
+            ProjectionExpression='appointmentId, #status, scheduledDate, scheduledTimeSlot, selectedSlots, paymentStatus',
+            ExpressionAttributeNames={'#status': 'status'},
+            ConsistentRead=True
+        )
+        for appointment in appointments:
+            for date, slots in get_appointment_slots_by_date(appointment).items():
+                slots_by_date.setdefault(date, []).extend(slots)
+            appointments_processed += 1
+
+        items = []
+        for date, slots in slots_by_date.items():
+            slots.sort(key=lambda slot: SLOT_REASON_ORDER.get(slot.get('reason'), 0))
+            items.append(db.build_availability_index_item(date, slots))
+        db.batch_put_items(db.AVAILABILITY_INDEX_TABLE, items)
+
+        completed = db.update_availability_index_marker(
+            REBUILD_MARKER_DATE, STATE_READY, expected_version=marker_version
+        ) is not None
+        if completed:
+            break
+        print(f"Appointments changed during availability index rebuild attempt {attempt}, starting over")
+    else:
+        db.update_availability_index_marker(REBUILD_MARKER_DATE, STATE_STALE)
+
+    print(f"Rebuilt availability index for {len(slots_by_date)} dates from {appointments_processed} appointments "
+          f"(completed: {completed}, attempts: {attempt})")
+    return {
+        'completed': completed,
+        'attempts': attempt,
+        'dates_written': len(slots_by_date),
+        'appointments_processed': appointments_processed
+    }
@@ -10,9 +10,17 @@ from zoneinfo import ZoneInfo
 from collections import defaultdict, Counter
 
 import db_utils as db
+import pagination_utils as pg
+import price_catalogue
 import request_utils as req
 from exceptions import BusinessLogicError
 
+# Invoices per page of the admin invoice listing (at most; the previous fixed result limit)
+INVOICE_PAGE_SIZE = 2000
+
+# Messages per page of a customer's message history
+MESSAGE_PAGE_SIZE = 100
+
 
 class DataAccessManager:
     """Base manager for common data access patterns"""
@@ -229,68 +237,43 @@ class InquiryManager(DataAccessManager):
         
         return inquiry
     
-    def get_all_inquiries_with_filters(self, event):
-        """Get all inquiries with optional filters"""
-        inquiries = db.get_all_inquiries()
-        # Filter to last 2 months
-        now = int(datetime.now(ZoneInfo('Australia/Perth')).timestamp())
-        two_months_ago = now - 60 * 24 * 60 * 60  # 60 days in seconds
-        inquiries = [inq for inq in inquiries if int(inq.get('createdAt', 0)) >= two_months_ago]
-        # Apply query parameter filters (implementation would be moved from original function)
-        inquiries = self._apply_inquiry_filters(inquiries, event)
-        # Sort by creation date (newest first)
-        inquiries.sort(key=lambda x: x.get('createdAt', 0), reverse=True)
-        return inquiries
-    
-    def _apply_inquiry_filters(self, inquiries, event):
-        """Apply query parameter filters to inquiries"""
-        if not inquiries:
-            return inquiries
+    def get_inquiries_page(self, event):
+        """
+        Get one page of inquiries, newest first, with optional filters
+        
+        Query parameters:
+            status, userId: Values to match
+            startDate, endDate: Inclusive YYYY-MM-DD createdDate range (default: the last 60 days)
+            limit, cursor: Page size and position (see pagination_utils)
         
-        # Get filter parameters from query string
+        Returns:
+            tuple: (inquiries, nextCursor and hasMore response fields)
+        """
         status = req.get_query_param(event, 'status')
-        start_date = req.get_query_param(event, 'startDate')
-        end_date = req.get_query_param(event, 'endDate')
         user_id = req.get_query_param(event, 'userId')
+        end_date = req.get_query_param(event, 'endDate') or datetime.now(ZoneInfo('Australia/Perth')).strftime('%Y-%m-%d')
+        start_date = req.get_query_param(event, 'startDate')
+        if not start_date:
+            end_datetime = self.validate_date_parameter(end_date, 'endDate')
+            start_date = (end_datetime - timedelta(days=60)).strftime('%Y-%m-%d')
         
-        filtered_inquiries = inquiries
+        filters = {}
+        if user_id:
+            filters['userId'] = {'S': user_id}
         
-        # Filter by status
+        # Statuses are matched ignoring case, which a FilterExpression can't do
+        item_filter = None
         if status:
-            filtered_inquiries = [
-                inquiry for inquiry in filtered_inquiries 
-                if inquiry.get('status', '').upper() == status.upper()
-            ]
-        
-        # Filter by userId
-        if user_id:
-            filtered_inquiries = [
-                inquiry for inquiry in filtered_inquiries 
-                if inquiry.get('userId', '') == user_id
-            ]
-        
-        # Filter by date range
-        if start_date:
-            if end_date:
-                # Filter by date range
-                filtered_inquiries = [
-                    inquiry for inquiry in filtered_inquiries 
-                    if start_date <= inquiry.get('createdDate', '') <= end_date
-                ]
-            else:
-                # Filter from start date onwards
-                filtered_inquiries = [
-                    inquiry for inquiry in filtered_inquiries 
-                    if inquiry.get('createdDate', '') >= start_date
-                ]
-        elif end_date:
-            # Filter up to end date
-            filtered_inquiries = [
-                inquiry for inquiry in filtered_inquiries 
-                if inquiry.get('createdDate', '') <= end_date
-            ]
+            item_filter = lambda inquiry: str(inquiry.get('status', '')).upper() == status.upper()
         
-        return filtered_inquiries
+        criteria = {'date_from': start_date, 'date_to': end_date, 'filters': filters}
+        scope = {'list': 'inquiries', 'status': status.upper() if status else None, **criteria}
+        try:
+            limit, position = pg.get_page_request(event, scope)
+            inquiries, next_position = db.get_inquiries_page(limit, position, item_filter, **criteria)
+        except ValueError as e:
+            raise BusinessLogicError(str(e), 400)
+        return inquiries, pg.get_page_fields(next_position, scope)
 
 
 class InvoiceManager(DataAccessManager):
@@ -381,14 +364,49 @@ class InvoiceManager(DataAccessManager):
         invoices = db.get_all_invoices_by_date_range(start_timestamp, end_timestamp, limit)
         return invoices
 
+    def get_all_invoices_page_formatted(self, event, start_date_str, end_date_str):
+        """
+        Get one page of ALL invoices (including cancelled ones) within a YYYY-MM-DD date range
+        
+        Args:
+            event: Lambda event with the limit and cursor query parameters (see pagination_utils)
+            start_date_str: Start date string in YYYY-MM-DD format
+            end_date_str: End date string in YYYY-MM-DD format
+            
+        Returns:
+            tuple: (invoices sorted by effectiveDate (most recent first), nextCursor and hasMore response fields)
+        """
+        # Validate date range (max 90 days)
+        start_timestamp, end_timestamp = self.validate_date_range(
+            start_date_str, end_date_str, max_days=90
+        )
+        
+        scope = {'list': 'invoices', 'start_date': start_date_str, 'end_date': end_date_str}
+        try:
+            limit, position = pg.get_page_request(
+                event, scope, default_limit=INVOICE_PAGE_SIZE, max_limit=INVOICE_PAGE_SIZE
+            )
+        except ValueError as e:
+            raise BusinessLogicError(str(e), 400)
+        
+        invoices, next_position = db.get_invoices_page(
+            start_timestamp, end_timestamp, limit, position, include_cancelled=True
+        )
+        return invoices, pg.get_page_fields(next_position, scope)
+
 
 class PriceManager(DataAccessManager):
     """Manager for price data operations"""
     
     def get_all_prices(self):
-        """Get all item and service prices"""
-        item_prices = db.get_all_item_prices()
-        service_prices = db.get_all_service_prices()
+        """Get all item and service prices (from the price catalogue when it is loaded)"""
+        catalogue = price_catalogue.get_catalogue()
+        if catalogue:
+            item_prices = catalogue.item_prices
+            service_prices = catalogue.service_prices
+        else:
+            item_prices = db.get_all_item_prices()
+            service_prices = db.get_all_service_prices()
         
         return {
             'item_prices': item_prices,
@@ -464,7 +482,7 @@ class MessageManager(DataAccessManager):
             receiver_id = "ALL"  # Broadcast to all staff
         
         # Build and create message data
-        message_data = db.build_message_data(message_id, message, sender_id, receiver_id)
+        message_data = db.build_message_data(message_id, message, sender_id, receiver_id, conversation_id=client_id)
         create_success = db.create_message(message_data)
         
         if not create_success:
@@ -507,15 +525,16 @@ class MessageManager(DataAccessManager):
             "senderName": sender_name
         }
     
-    def get_user_messages(self, client_id):
+    def get_user_messages_page(self, client_id, event):
         """
-        Get all messages for a user
+        Get one page of a user's messages from the last 2 months, newest first
         
         Args:
             client_id: User ID to get messages for
+            event: Lambda event with the limit and cursor query parameters (see pagination_utils)
             
         Returns:
-            list: Sorted messages for the user
+            tuple: (messages, nextCursor and hasMore response fields)
         """
         if not client_id:
             raise BusinessLogicError("clientId is required", 400)
@@ -528,30 +547,19 @@ class MessageManager(DataAccessManager):
         if not db.get_user_record(client_id):
             raise BusinessLogicError(f"User with userId {client_id} does not exist", 404)
         
-        # Get messages where user is sender or receiver
-        sender_messages = db.get_messages_by_index(
-            index_name='senderId-index', 
-            key_name='senderId', 
-            key_value=client_id
-        )
-        receiver_messages = db.get_messages_by_index(
-            index_name='receiverId-index', 
-            key_name='receiverId', 
-            key_value=client_id
-        )
-        
-        all_messages = sender_messages + receiver_messages
-        # Filter to last 2 months
         now = int(datetime.now(ZoneInfo('Australia/Perth')).timestamp())
         two_months_ago = now - 60 * 24 * 60 * 60  # 60 days in seconds
-        filtered_messages = [msg for msg in all_messages if int(msg.get('createdAt', 0)) >= two_months_ago]
-        # Sort by creation date (newest first)
-        sorted_messages = sorted(
-            filtered_messages,
-            key=lambda x: int(x.get('createdAt', 0)),
-            reverse=True
+        
+        scope = {'list': 'messages', 'clientId': client_id}
+        try:
+            limit, position = pg.get_page_request(event, scope, default_limit=MESSAGE_PAGE_SIZE)
+        except ValueError as e:
+            raise BusinessLogicError(str(e), 400)
+        
+        messages, next_position = db.get_conversation_messages_page(
+            client_id, limit, position, created_after=two_months_ago
         )
-        return sorted_messages
+        return messages, pg.get_page_fields(next_position, scope)
 
 
 class StaffRoleManager(DataAccessManager):
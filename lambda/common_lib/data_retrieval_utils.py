@@ -3,10 +3,20 @@ Data retrieval utilities for common getter patterns across Lambda functions
 Centralizes data fetching logic with proper filtering and access control
 """
 
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
 import db_utils as db
+import pagination_utils as pg
 import permission_utils as perm
 import response_utils as resp
 
+# Listings only include records created within this many days unless a date range is requested
+LISTING_DAYS = 60
+
+# Staff fields attached to records as assignedMechanicDetails
+MECHANIC_DETAIL_FIELDS = ['userName', 'userEmail', 'contactNumber']
+
 
 class DataRetriever:
     """Centralized data retrieval with access control"""
@@ -63,25 +73,22 @@ class DataRetriever:
                 # Get multiple appointments based on role
                 if perm.RoleBasedPermissions.check_permission(staff_roles, 'can_view_all_appointments'):
                     # ADMIN, CUSTOMER_SUPPORT, CLERK - get all appointments
-                    appointments = db.get_all_appointments()
+                    mechanic_id = None
                 elif 'MECHANIC' in staff_roles:
                     # MECHANIC - get appointments assigned to them
-                    appointments = db.get_appointments_by_assigned_mechanic(staff_user_id)
+                    mechanic_id = staff_user_id
                 else:
                     raise perm.PermissionError("Unauthorized: Invalid staff role", 403)
                 
-                # Filter to last 2 months
-                from datetime import datetime, timedelta
-                from zoneinfo import ZoneInfo
-                now = datetime.now(ZoneInfo('Australia/Perth'))
-                two_months_ago = int((now - timedelta(days=60)).timestamp())
-                appointments = [apt for apt in appointments if int(apt.get('createdAt', 0)) >= two_months_ago]
-                # Apply query parameter filters if provided
-                if event:
-                    appointments = DataRetriever._apply_appointment_filters(appointments, event)
+                # Query one page of the appointments matching the filters (default: last 2 months)
+                appointments, page_fields = DataRetriever._get_listing_page(
+                    'appointments', db.get_appointments_page, event, mechanic_id=mechanic_id, filter_service=True
+                )
+                appointments = DataRetriever._prepare_listing(appointments, 'appointmentId', event)
                 return {
                     "appointments": resp.convert_decimal(appointments),
-                    "count": len(appointments)
+                    "count": len(appointments),
+                    **page_fields
                 }
         else:
             # Customer user access
@@ -114,20 +121,16 @@ class DataRetriever:
                 
                 return response_data
             else:
-                # Get all appointments created by this user
-                appointments = db.get_appointments_by_created_user(effective_user_id)
-                # Filter to last 2 months
-                from datetime import datetime, timedelta
-                from zoneinfo import ZoneInfo
-                now = datetime.now(ZoneInfo('Australia/Perth'))
-                two_months_ago = int((now - timedelta(days=60)).timestamp())
-                appointments = [apt for apt in appointments if int(apt.get('createdAt', 0)) >= two_months_ago]
-                # Apply query parameter filters if provided
-                if event:
-                    appointments = DataRetriever._apply_appointment_filters(appointments, event)
+                # Query one page of the appointments created by this user (default: last 2 months)
+                appointments, page_fields = DataRetriever._get_listing_page(
+                    'appointments', db.get_appointments_page, event,
+                    created_user_id=effective_user_id, filter_service=True
+                )
+                appointments = DataRetriever._prepare_listing(appointments, 'appointmentId', event)
                 return {
                     "appointments": resp.convert_decimal(appointments),
-                    "count": len(appointments)
+                    "count": len(appointments),
+                    **page_fields
                 }
 
     @staticmethod
@@ -179,23 +182,16 @@ class DataRetriever:
                 return response_data
             else:
                 # Staff can view all orders
-                if perm.RoleBasedPermissions.check_permission(staff_roles, 'can_view_all_orders'):
-                    orders = db.get_all_orders()
-                else:
+                if not perm.RoleBasedPermissions.check_permission(staff_roles, 'can_view_all_orders'):
                     raise perm.PermissionError("Unauthorized: Insufficient permissions", 403)
                 
-                # Filter to last 2 months
-                from datetime import datetime, timedelta
-                from zoneinfo import ZoneInfo
-                now = datetime.now(ZoneInfo('Australia/Perth'))
-                two_months_ago = int((now - timedelta(days=60)).timestamp())
-                orders = [order for order in orders if int(order.get('createdAt', 0)) >= two_months_ago]
-                # Apply query parameter filters if provided
-                if event:
-                    orders = DataRetriever._apply_order_filters(orders, event)
+                # Query one page of the orders matching the filters (default: last 2 months)
+                orders, page_fields = DataRetriever._get_listing_page('orders', db.get_orders_page, event)
+                orders = DataRetriever._prepare_listing(orders, 'orderId', event)
                 return {
                     "orders": resp.convert_decimal(orders),
-                    "count": len(orders)
+                    "count": len(orders),
+                    **page_fields
                 }
         else:
             # Customer user access
@@ -228,21 +224,146 @@ class DataRetriever:
                 
                 return response_data
             else:
-                # Get all orders created by this user
-                orders = db.get_orders_by_created_user(effective_user_id)
-                # Filter to last 2 months
-                import time
-                now = int(datetime.now(ZoneInfo('Australia/Perth')).timestamp())
-                two_months_ago = now - 60 * 24 * 60 * 60  # 60 days in seconds
-                orders = [order for order in orders if int(order.get('createdAt', 0)) >= two_months_ago]
-                # Apply query parameter filters if provided
-                if event:
-                    orders = DataRetriever._apply_order_filters(orders, event)
+                # Query one page of the orders created by this user (default: last 2 months)
+                orders, page_fields = DataRetriever._get_listing_page(
+                    'orders', db.get_orders_page, event, created_user_id=effective_user_id
+                )
+                orders = DataRetriever._prepare_listing(orders, 'orderId', event)
                 return {
                     "orders": resp.convert_decimal(orders),
-                    "count": len(orders)
+                    "count": len(orders),
+                    **page_fields
                 }
     
+    @staticmethod
+    def _get_listing_page(list_name, get_page, event, mechanic_id=None, created_user_id=None, filter_service=False):
+        """
+        Query one page of an appointment or order listing from its query parameters
+        
+        Query parameters:
+            status, mechanicId: Matched through the index key where possible (mechanicId
+                is ignored when mechanic_id is forced for mechanics)
+            paymentStatus, serviceId: Matched as filters (serviceId when filter_service)
+            dateField: 'createdDate' (default) or 'scheduledDate'
+            dateFrom, dateTo: Inclusive YYYY-MM-DD range of dateField (default: the last
+                LISTING_DAYS days of createdDate; required for scheduledDate)
+            limit, cursor: Page size and position (see pagination_utils)
+        
+        Args:
+            list_name (str): Name of the listing the cursors are bound to
+            get_page (function): db.get_appointments_page or db.get_orders_page
+            event (dict): API Gateway event for query parameters
+            mechanic_id (str): Assigned mechanic every record must match (optional)
+            created_user_id (str): Creating user every record must match (optional)
+            filter_service (bool): Whether the serviceId filter applies
+            
+        Returns:
+            tuple: (records, nextCursor and hasMore response fields)
+            
+        Raises:
+            PermissionError: If the query parameters are invalid
+        """
+        import request_utils as req
+        
+        def param(key):
+            return req.get_query_param(event, key) if event else None
+        
+        date_field = param('dateField') or 'createdDate'
+        date_from = param('dateFrom')
+        date_to = param('dateTo')
+        if date_field == 'createdDate' and not (date_from and date_to):
+            today = datetime.now(ZoneInfo('Australia/Perth')).date()
+            date_to = date_to or today.isoformat()
+            if not date_from:
+                try:
+                    end_date = datetime.strptime(date_to, '%Y-%m-%d').date()
+                except ValueError:
+                    raise perm.PermissionError("dateTo must be a date in YYYY-MM-DD format", 400)
+                date_from = (end_date - timedelta(days=LISTING_DAYS)).isoformat()
+        elif date_field == 'scheduledDate' and not (date_from and date_to):
+            raise perm.PermissionError("dateFrom and dateTo are required when dateField is scheduledDate", 400)
+        
+        filters = {}
+        if param('paymentStatus'):
+            filters['paymentStatus'] = {'S': param('paymentStatus')}
+        if filter_service and param('serviceId'):
+            try:
+                filters['serviceId'] = {'N': str(int(param('serviceId')))}
+            except ValueError:
+                pass  # Ignore invalid service ID
+        
+        criteria = {
+            'date_from': date_from,
+            'date_to': date_to,
+            'date_field': date_field,
+            'status': param('status'),
+            'mechanic_id': mechanic_id or param('mechanicId'),
+            'created_user_id': created_user_id,
+            'filters': filters
+        }
+        scope = {'list': list_name, **criteria}
+        try:
+            limit, position = pg.get_page_request(event, scope)
+            records, next_position = get_page(limit, position, **criteria)
+        except ValueError as e:
+            raise perm.PermissionError(str(e), 400)
+        return records, pg.get_page_fields(next_position, scope)
+    
+    @staticmethod
+    def _prepare_listing(records, id_field, event):
+        """
+        Apply the optional listing query parameters to appointment or order records
+        
+        Query parameters:
+            includeMechanic: 'true' to attach assignedMechanicDetails to each record,
+                resolving the distinct assigned mechanics in one bulk lookup
+            fields: Comma-separated record fields to return (the ID field is always kept)
+        
+        Args:
+            records (list): Filtered appointment or order records
+            id_field (str): Record ID field ('appointmentId' or 'orderId')
+            event (dict): API Gateway event for query parameters
+            
+        Returns:
+            list: Records ready to be returned
+        """
+        if not event:
+            return records
+        import request_utils as req
+        
+        include_mechanic = str(req.get_query_param(event, 'includeMechanic', '')).lower() == 'true'
+        fields_param = req.get_query_param(event, 'fields')
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()] if fields_param else None
+        
+        if include_mechanic:
+            DataRetriever._attach_assigned_mechanics(records)
+            if fields is not None:
+                fields.append('assignedMechanicDetails')
+        if fields is not None:
+            records = DataRetriever._project_fields(records, [id_field] + fields)
+        return records
+    
+    @staticmethod
+    def _attach_assigned_mechanics(records):
+        """Attach assignedMechanicDetails to records, looking up each distinct mechanic once"""
+        mechanic_ids = [record.get('assignedMechanicId') for record in records if record.get('assignedMechanicId')]
+        if not mechanic_ids:
+            return
+        
+        mechanics = db.get_staff_by_user_ids(mechanic_ids)
+        for record in records:
+            mechanic_record = mechanics.get(record.get('assignedMechanicId'))
+            if mechanic_record:
+                record['assignedMechanicDetails'] = {
+                    field: mechanic_record.get(field, '') for field in MECHANIC_DETAIL_FIELDS
+                }
+    
+    @staticmethod
+    def _project_fields(records, fields):
+        """Keep only the requested fields of each record"""
+        fields = list(dict.fromkeys(fields))
+        return [{field: record[field] for field in fields if field in record} for record in records]
+    
     @staticmethod
     def _apply_appointment_filters(appointments, event):
         """Apply query parameter filters to appointments"""
@@ -275,8 +396,13 @@ class DataRetriever:
         if mechanic_id_filter:
             filtered_appointments = [apt for apt in filtered_appointments if apt.get('assignedMechanicId') == mechanic_id_filter]
         
-        # Date filtering would require parsing appointment dates
-        # Implementation depends on date format in the database
+        # Dates are stored as YYYY-MM-DD strings, so they compare in date order
+        date_field = req.get_query_param(event, 'dateField') or 'createdDate'
+        if date_from:
+            filtered_appointments = [apt for apt in filtered_appointments if (apt.get(date_field) or '') >= date_from]
+        
+        if date_to:
+            filtered_appointments = [apt for apt in filtered_appointments if (apt.get(date_field) or '9999') <= date_to]
         
         return filtered_appointments
     
@@ -300,8 +426,13 @@ class DataRetriever:
         if payment_status_filter:
             filtered_orders = [order for order in filtered_orders if order.get('paymentStatus') == payment_status_filter]
         
-        # Date filtering would require parsing order dates
-        # Implementation depends on date format in the database
+        # Dates are stored as YYYY-MM-DD strings, so they compare in date order
+        date_field = req.get_query_param(event, 'dateField') or 'createdDate'
+        if date_from:
+            filtered_orders = [order for order in filtered_orders if (order.get(date_field) or '') >= date_from]
+        
+        if date_to:
+            filtered_orders = [order for order in filtered_orders if (order.get(date_field) or '9999') <= date_to]
         
         return filtered_orders
 
@@ -368,7 +499,18 @@ class StaffDataRetriever:
     
     @staticmethod
     def _get_latest_messages_by_user(user_id):
-        """Get latest messages by user for all conversations"""
+        """
+        Get the latest message of every conversation
+        
+        Conversation summaries cover all customer conversations, not only those the
+        staff user took part in; the per-user message indexes are read only while no
+        summaries exist yet.
+        """
+        summaries = db.get_conversation_summaries()
+        if summaries:
+            return [summary['lastMessage'] for summary in summaries if 'lastMessage' in summary]
+        
+        # No conversation summaries yet, so collect the latest messages from the staff user's messages
         sender_messages = db.get_messages_by_index(
             index_name='senderId-index', 
             key_name='senderId', 
@@ -1,14 +1,14 @@
-import boto3, os, time
+import boto3, os, queue, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from botocore.exceptions import ClientError
-from boto3.dynamodb.types import TypeDeserializer
+import dynamodb_codec as codec
 import validation_utils as valid
 
-# Dynamodb client and deserializer
+# Dynamodb client
 dynamodb = boto3.client('dynamodb')
-deserializer = TypeDeserializer()
 
 # Environment variables
 STAFF_TABLE = os.environ.get('STAFF_TABLE')
@@ -23,10 +23,495 @@ ITEM_PRICES_TABLE = os.environ.get('ITEM_PRICES_TABLE')
 INQUIRIES_TABLE = os.environ.get('INQUIRIES_TABLE')
 PAYMENTS_TABLE = os.environ.get('PAYMENTS_TABLE')
 INVOICES_TABLE = os.environ.get('INVOICES_TABLE')
+ANALYTICS_ROLLUPS_TABLE = os.environ.get('ANALYTICS_ROLLUPS_TABLE')
+ANALYTICS_CACHE_TABLE = os.environ.get('ANALYTICS_CACHE_TABLE')
+AVAILABILITY_INDEX_TABLE = os.environ.get('AVAILABILITY_INDEX_TABLE')
+CACHE_VERSIONS_TABLE = os.environ.get('CACHE_VERSIONS_TABLE')
+CONVERSATION_SUMMARIES_TABLE = os.environ.get('CONVERSATION_SUMMARIES_TABLE')
+
+# DynamoDB batch API limits
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_MAX_RETRIES = 8
+
+# Concurrent queries issued when one index lookup is needed per key
+MAX_PARALLEL_QUERIES = 8
+
+# Parallel segmented scans (PARALLEL_SCAN_SEGMENTS overrides the default segment count)
+PARALLEL_SCAN_SEGMENTS = int(os.environ.get('PARALLEL_SCAN_SEGMENTS', '4'))
+SCAN_SEGMENT_MAX_RETRIES = 3
+RETRYABLE_SCAN_ERRORS = (
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError'
+)
+
+# Appointments, Orders and Inquiries listing indexes (the *-createdAt indexes are sorted by createdAt)
+CREATED_DATE_INDEX = 'createdDate-createdAt-index'
+SCHEDULED_DATE_INDEX = 'scheduledDate-index'
+STATUS_CREATED_INDEX = 'status-createdAt-index'
+MECHANIC_CREATED_INDEX = 'assignedMechanicId-createdAt-index'
+CREATED_USER_INDEX = 'createdUserId-index'
+
+# Key attributes of the listing indexes; with the table key they form a resume key
+LISTING_INDEX_KEYS = {
+    CREATED_DATE_INDEX: ('createdDate', 'createdAt'),
+    SCHEDULED_DATE_INDEX: ('scheduledDate',),
+    STATUS_CREATED_INDEX: ('status', 'createdAt'),
+    MECHANIC_CREATED_INDEX: ('assignedMechanicId', 'createdAt'),
+    CREATED_USER_INDEX: ('createdUserId',)
+}
+
+# Listings query one date partition per day, so their date ranges are capped
+LISTING_MAX_DAYS = 366
+
+# Invoices of a payment reference, sorted by createdAt
+INVOICE_REFERENCE_INDEX = 'referenceNumber-createdAt-index'
+
+# Appointment attributes that determine the slots an appointment occupies
+APPOINTMENT_AVAILABILITY_FIELDS = ('status', 'scheduledDate', 'scheduledTimeSlot', 'selectedSlots', 'paymentStatus')
+
+# ------------------  Pagination Functions ------------------
+
+def paginate(operation, page_size=None, max_items=None, **request):
+    """
+    Yield the items of a scan or query, following LastEvaluatedKey across every page
+    
+    Args:
+        operation: 'scan' or 'query'
+        page_size: Items evaluated per request, sent as Limit (a hint: filtered pages may be smaller)
+        max_items: Stop after yielding this many items (None for no limit)
+        **request: Scan/query parameters (TableName, IndexName, KeyConditionExpression,
+                   FilterExpression, ProjectionExpression, ...)
+        
+    Yields:
+        dict: Items in DynamoDB format
+    """
+    if max_items is not None and max_items <= 0:
+        return
+    if page_size:
+        request['Limit'] = page_size
+    
+    yielded = 0
+    while True:
+        response = getattr(dynamodb, operation)(**request)
+        for item in response.get('Items', []):
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        
+        if 'LastEvaluatedKey' not in response:
+            return
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def iter_items(operation, table_name, deserialize=None, page_size=None, max_items=None, **request):
+    """
+    Stream the items of a scan or query of a table (see paginate)
+    
+    Args:
+        operation: 'scan' or 'query'
+        table_name: Table to read
+        deserialize: Function applied to each item (e.g. deserialize_item); None yields raw items
+        page_size: Items evaluated per request
+        max_items: Stop after yielding this many items
+        **request: Remaining scan/query parameters
+        
+    Yields:
+        dict: Items, deserialized when a deserialize function is given
+    """
+    for item in paginate(operation, page_size, max_items, TableName=table_name, **request):
+        yield deserialize(item) if deserialize else item
+
+def get_first_item(operation, table_name, deserialize=None, **request):
+    """Get the first item of a scan or query, or None if nothing matches"""
+    return next(iter_items(operation, table_name, deserialize, max_items=1, **request), None)
+
+def count_items(operation, table_name, **request):
+    """Count the items matching a scan or query across every page"""
+    request['Select'] = 'COUNT'
+    request['TableName'] = table_name
+    count = 0
+    while True:
+        response = getattr(dynamodb, operation)(**request)
+        count += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            return count
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def parallel_scan(table_name, deserialize=None, total_segments=None, max_workers=None, metrics=None, **request):
+    """
+    Stream the items of a table scanned as parallel segments
+    
+    The table is split into DynamoDB scan segments (Segment/TotalSegments), each paged
+    through LastEvaluatedKey by a bounded thread pool. A throttled page is retried from
+    its segment's last key, so no item is yielded twice. Items are yielded as pages
+    arrive, in no particular order; only a few pages per worker are buffered, and
+    closing the generator early stops the remaining segment scans.
+    
+    Args:
+        table_name: Table to scan
+        deserialize: Function applied to each item (e.g. deserialize_item); None yields raw items
+        total_segments: Number of scan segments (defaults to PARALLEL_SCAN_SEGMENTS)
+        max_workers: Segments scanned concurrently (defaults to total_segments)
+        metrics: Optional dict filled with throughput metrics (items, scanned_count, pages,
+                 retries, consumed_capacity, elapsed_seconds, items_per_second)
+        **request: Remaining scan parameters (FilterExpression, ProjectionExpression, Limit, ...)
+        
+    Yields:
+        dict: Items, deserialized when a deserialize function is given
+    """
+    total_segments = max(1, total_segments or PARALLEL_SCAN_SEGMENTS)
+    max_workers = max(1, min(max_workers or total_segments, total_segments))
+    metrics = metrics if metrics is not None else {}
+    metrics.update({
+        'segments': total_segments,
+        'items': 0,
+        'scanned_count': 0,
+        'pages': 0,
+        'retries': 0,
+        'consumed_capacity': 0.0
+    })
+    
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stopped = threading.Event()
+    metrics_lock = threading.Lock()
+    started = time.time()
+    
+    def put_page(entry):
+        # Block while the consumer is behind, but give up once the scan is stopped
+        while not stopped.is_set():
+            try:
+                pages.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def scan_segment(segment):
+        segment_request = dict(
+            request,
+            TableName=table_name,
+            Segment=segment,
+            TotalSegments=total_segments,
+            ReturnConsumedCapacity='TOTAL'
+        )
+        attempt = 0
+        try:
+            while not stopped.is_set():
+                try:
+                    response = dynamodb.scan(**segment_request)
+                except ClientError as e:
+                    if e.response['Error']['Code'] not in RETRYABLE_SCAN_ERRORS or attempt >= SCAN_SEGMENT_MAX_RETRIES:
+                        raise
+                    attempt += 1
+                    with metrics_lock:
+                        metrics['retries'] += 1
+                    time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+                    continue
+                
+                attempt = 0
+                with metrics_lock:
+                    metrics['pages'] += 1
+                    metrics['scanned_count'] += response.get('ScannedCount', 0)
+                    metrics['consumed_capacity'] += response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                if not put_page(response.get('Items', [])) or 'LastEvaluatedKey' not in response:
+                    break
+                segment_request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            put_page(None)
+        except Exception as e:
+            put_page(e)
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+        
+        finished_segments = 0
+        while finished_segments < total_segments:
+            entry = pages.get()
+            if entry is None:
+                finished_segments += 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                for item in entry:
+                    metrics['items'] += 1
+                    yield deserialize(item) if deserialize else item
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        elapsed = time.time() - started
+        metrics['elapsed_seconds'] = round(elapsed, 3)
+        metrics['items_per_second'] = round(metrics['items'] / elapsed, 1) if elapsed > 0 else 0.0
+        print(f"Parallel scan of {table_name}: {metrics}")
+
+def query_page(table_name, queries, key_attributes, limit, position=None, deserialize=None, item_filter=None):
+    """
+    Read one page of items from a sequence of queries, resumable from a position
+    
+    The queries are read one after another (e.g. one per date partition). Limit caps
+    the items evaluated before any filter, so it is only sent to unfiltered queries
+    (as the page size); filtered queries read full response pages. A page filled
+    partway through a response resumes after its last item, so the next page neither
+    skips nor repeats items. Once a query comes back short, the first pages of the
+    following queries are requested concurrently, MAX_PARALLEL_QUERIES at a time.
+    
+    Args:
+        table_name: Table to query
+        queries: List of query parameter dicts (IndexName, KeyConditionExpression, ...) on one index
+        key_attributes: Table key and index key attribute names of the queried index
+        limit: Maximum number of items in the page
+        position: Position returned with the previous page ([query index, start key]), None for the first page
+        deserialize: Function applied to each item; None returns raw items
+        item_filter: Optional predicate on the (deserialized) items, for matches a
+                     FilterExpression can't express; rejected items don't count towards the limit
+        
+    Returns:
+        tuple: (items, position of the next page or None once every query is exhausted)
+    """
+    index, start_key = position if position else (0, None)
+    items = []
+    prefetched = {}
+    responses_read = 0
+    
+    def build_request(query_index):
+        request = dict(queries[query_index], TableName=table_name)
+        if item_filter is None and 'FilterExpression' not in request:
+            request['Limit'] = limit
+        return request
+    
+    def first_page(query_index):
+        return dynamodb.query(**build_request(query_index))
+    
+    while index < len(queries) and len(items) < limit:
+        if index in prefetched:
+            response = prefetched.pop(index)
+        elif start_key is None and responses_read and index + 1 < len(queries):
+            batch = range(index, min(index + MAX_PARALLEL_QUERIES, len(queries)))
+            with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+                prefetched.update(zip(batch, executor.map(first_page, batch)))
+            response = prefetched.pop(index)
+        else:
+            request = build_request(index)
+            if start_key:
+                request['ExclusiveStartKey'] = start_key
+            response = dynamodb.query(**request)
+        
+        responses_read += 1
+        raw_items = response.get('Items', [])
+        start_key = response.get('LastEvaluatedKey')
+        for offset, raw_item in enumerate(raw_items):
+            item = deserialize(raw_item) if deserialize else raw_item
+            if item_filter is None or item_filter(item):
+                items.append(item)
+            if len(items) == limit:
+                if offset + 1 < len(raw_items):
+                    start_key = {name: raw_item[name] for name in key_attributes}
+                break
+        if not start_key:
+            index += 1
+    
+    if index >= len(queries):
+        return items, None
+    return items, [index, start_key]
+
+def plan_listing_queries(date_from, date_to, date_field='createdDate', status=None, mechanic_id=None,
+                         created_user_id=None, filters=None):
+    """
+    Plan the index queries listing Appointments, Orders or Inquiries records in a stable order
+    
+    The creating user's records are read from the createdUserId-index. Otherwise the
+    assigned mechanic or else the status becomes the key condition on an index sorted
+    by createdAt (newest first, with the created date range as a createdAt range),
+    and without either the records are read one date partition at a time, latest
+    date first. The remaining criteria become the FilterExpression.
+    
+    Args:
+        date_from: Range start date in YYYY-MM-DD format
+        date_to: Range end date in YYYY-MM-DD format (inclusive)
+        date_field: Date the range applies to ('createdDate' or 'scheduledDate')
+        status: Optional status to match
+        mechanic_id: Optional assigned mechanic user ID to match
+        created_user_id: Optional user ID of the records' creator to match
+        filters: Optional dict of further attribute values to match, in DynamoDB format
+        
+    Returns:
+        list: Query parameter dicts for query_page
+        
+    Raises:
+        ValueError: If the date range is invalid
+    """
+    if date_field not in ('createdDate', 'scheduledDate'):
+        raise ValueError("dateField must be createdDate or scheduledDate")
+    try:
+        start_date = datetime.strptime(date_from, '%Y-%m-%d')
+        end_date = datetime.strptime(date_to, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError("Date range must be given as YYYY-MM-DD dates")
+    day_count = (end_date - start_date).days + 1
+    if day_count < 1:
+        raise ValueError("Date range start must not be after its end")
+    if day_count > LISTING_MAX_DAYS:
+        raise ValueError(f"Date range cannot exceed {LISTING_MAX_DAYS} days")
+    
+    filters = dict(filters or {})
+    if created_user_id:
+        key_field, key_value, index_name = 'createdUserId', created_user_id, CREATED_USER_INDEX
+    elif mechanic_id:
+        key_field, key_value, index_name = 'assignedMechanicId', mechanic_id, MECHANIC_CREATED_INDEX
+    elif status:
+        key_field, key_value, index_name = 'status', status, STATUS_CREATED_INDEX
+    else:
+        key_field = None
+    if mechanic_id and key_field != 'assignedMechanicId':
+        filters['assignedMechanicId'] = {'S': mechanic_id}
+    if status and key_field != 'status':
+        filters['status'] = {'S': status}
+    
+    names = {}
+    values = {}
+    conditions = []
+    for position, (field, value) in enumerate(filters.items()):
+        names[f'#f{position}'] = field
+        values[f':f{position}'] = value
+        conditions.append(f'#f{position} = :f{position}')
+    
+    if key_field:
+        names['#key'] = key_field
+        values[':key'] = {'S': key_value}
+        key_condition = '#key = :key'
+        
+        if date_field == 'createdDate' and index_name != CREATED_USER_INDEX:
+            perth = ZoneInfo('Australia/Perth')
+            values[':from'] = {'N': str(int(start_date.replace(tzinfo=perth).timestamp()))}
+            values[':to'] = {'N': str(int((end_date + timedelta(days=1)).replace(tzinfo=perth).timestamp()) - 1)}
+            key_condition += ' AND createdAt BETWEEN :from AND :to'
+        else:
+            names['#date'] = date_field
+            values[':from'] = {'S': date_from}
+            values[':to'] = {'S': date_to}
+            conditions.append('#date BETWEEN :from AND :to')
+        
+        query = {
+            'IndexName': index_name,
+            'KeyConditionExpression': key_condition,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values,
+            'ScanIndexForward': False
+        }
+        if conditions:
+            query['FilterExpression'] = ' AND '.join(conditions)
+        return [query]
+    
+    names['#date'] = date_field
+    queries = []
+    for offset in range(day_count):
+        date = (end_date - timedelta(days=offset)).strftime('%Y-%m-%d')
+        query = {
+            'IndexName': CREATED_DATE_INDEX if date_field == 'createdDate' else SCHEDULED_DATE_INDEX,
+            'KeyConditionExpression': '#date = :date',
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': dict(values, **{':date': {'S': date}}),
+            'ScanIndexForward': False
+        }
+        if conditions:
+            query['FilterExpression'] = ' AND '.join(conditions)
+        queries.append(query)
+    return queries
+
+def get_listing_page(table_name, table_key, deserialize, limit, position=None, item_filter=None, **criteria):
+    """
+    Get one page of Appointments, Orders or Inquiries records matching listing criteria
+    
+    Args:
+        table_name: APPOINTMENTS_TABLE, ORDERS_TABLE or INQUIRIES_TABLE
+        table_key: Partition key attribute name of the table
+        deserialize: Function converting each item from DynamoDB format
+        limit: Maximum number of records in the page
+        position: Position returned with the previous page (None for the first page)
+        item_filter: Optional predicate on the deserialized records (see query_page)
+        **criteria: Listing criteria (see plan_listing_queries)
+        
+    Returns:
+        tuple: (records, position of the next page or None). While a listing index is
+               missing or backfilling every matching record is returned as one page.
+        
+    Raises:
+        ValueError: If the criteria are invalid
+        ClientError: If the records can't be read
+    """
+    queries = plan_listing_queries(**criteria)
+    key_attributes = (table_key,) + LISTING_INDEX_KEYS[queries[0]['IndexName']]
+    try:
+        return query_page(table_name, queries, key_attributes, limit, position, deserialize, item_filter)
+    except ClientError as e:
+        if not is_index_unavailable_error(e):
+            print(f"Error listing records of {table_name}: {e}")
+            raise
+        print(f"Listing index {queries[0].get('IndexName')} unavailable, scanning {table_name}: {e}")
+    
+    if position:
+        # Pages of an index listing can't be resumed from a scan
+        return [], None
+    try:
+        records = scan_listing_records(table_name, deserialize, **criteria)
+    except ClientError as e:
+        print(f"Error scanning records of {table_name}: {e}")
+        raise
+    return [record for record in records if item_filter is None or item_filter(record)], None
+
+def scan_listing_records(table_name, deserialize, date_from, date_to, date_field='createdDate', status=None,
+                         mechanic_id=None, created_user_id=None, filters=None):
+    """
+    Scan every Appointments, Orders or Inquiries record matching listing criteria, newest first
+    
+    Used while the listing indexes are missing or backfilling; the criteria are the
+    same as for plan_listing_queries (which validates them).
+    
+    Returns:
+        list: Matching records sorted by createdAt (most recent first)
+    """
+    filters = dict(filters or {})
+    for field, value in (('createdUserId', created_user_id), ('assignedMechanicId', mechanic_id), ('status', status)):
+        if value:
+            filters[field] = {'S': value}
+    
+    names = {}
+    values = {}
+    conditions = []
+    for position, (field, value) in enumerate(filters.items()):
+        names[f'#f{position}'] = field
+        values[f':f{position}'] = value
+        conditions.append(f'#f{position} = :f{position}')
+    
+    names['#date'] = date_field
+    values[':from'] = {'S': date_from}
+    values[':to'] = {'S': date_to}
+    conditions.append('#date BETWEEN :from AND :to')
+    
+    items = list(iter_items(
+        'scan', table_name,
+        FilterExpression=' AND '.join(conditions),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    ))
+    items.sort(key=lambda x: int(x.get('createdAt', {}).get('N', '0')), reverse=True)
+    return [deserialize(item) if deserialize else item for item in items]
 
 # ------------------  Staff Table Functions ------------------
 
 def get_staff_record(email, raise_on_error=False):
+    """
+    Get staff record by email, served from the staff record cache when it is fresh
+    
+    See _query_staff_record for the error handling of cache misses.
+    """
+    import staff_cache
+    return staff_cache.get_by_email(email, lambda: _query_staff_record(email, raise_on_error))
+
+def _query_staff_record(email, raise_on_error=False):
     """
     Get staff record by email with comprehensive error handling
     
@@ -96,40 +581,64 @@ def get_staff_record(email, raise_on_error=False):
 
 def get_all_mechanic_records():
     try:
-        result = dynamodb.scan(
-            TableName=STAFF_TABLE,
+        return list(iter_items(
+            'scan', STAFF_TABLE, deserialize_item,
             FilterExpression='contains(roles, :role)',
             ExpressionAttributeValues={':role': {'S': 'MECHANIC'}}
-        )
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error scanning mechanic records: {e.response['Error']['Message']}")
         return []
 
 def get_all_staff_records():
     try:
-        result = dynamodb.scan(TableName=STAFF_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', STAFF_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning staff records: {e.response['Error']['Message']}")
         return []
 
 def get_staff_record_by_user_id(user_id):
+    """Get staff record by user ID, served from the staff record cache when it is fresh"""
+    import staff_cache
+    return staff_cache.get_by_user_id(user_id, lambda: _query_staff_record_by_user_id(user_id))
+
+def _query_staff_record_by_user_id(user_id):
     """Get staff record by user ID"""
     try:
-        result = dynamodb.query(
-            TableName=STAFF_TABLE,
+        return get_first_item(
+            'query', STAFF_TABLE, deserialize_item,
             IndexName='userId-index',
             KeyConditionExpression='userId = :uid',
             ExpressionAttributeValues={':uid': {'S': user_id}}
         )
-        if result.get('Count', 0) > 0:
-            return deserialize_item(result['Items'][0])
-        return None
     except ClientError as e:
         print(f"Error querying staff record by user ID: {e.response['Error']['Message']}")
         return None
 
+def get_staff_by_user_ids(user_ids):
+    """
+    Get staff records for several user IDs
+    
+    Records are served from the staff record cache when fresh; the rest are looked
+    up on the userId-index GSI (which can't be batched) with concurrent queries.
+    
+    Args:
+        user_ids: List of staff user IDs
+        
+    Returns:
+        dict: Staff records keyed by user ID (IDs without a staff record are omitted)
+    """
+    import staff_cache
+    return staff_cache.get_many_by_user_id(user_ids, _query_staff_records_by_user_ids)
+
+def _query_staff_records_by_user_ids(user_ids):
+    """Query the staff records of several user IDs concurrently"""
+    if not user_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(user_ids))) as executor:
+        records = dict(zip(user_ids, executor.map(_query_staff_record_by_user_id, user_ids)))
+    return {user_id: record for user_id, record in records.items() if record}
+
 def update_staff_roles(user_email, new_roles):
     """Update staff member roles"""
     try:
@@ -148,11 +657,19 @@ def update_staff_roles(user_email, new_roles):
             }
         )
         print(f"Staff roles updated successfully for {user_email}: {new_roles}")
+        invalidate_staff_cache(user_email)
         return True
     except ClientError as e:
         print(f"Error updating staff roles for {user_email}: {e}")
         return False
 
+def invalidate_staff_cache(user_email=None, user_id=None):
+    """Invalidate a cached staff record in this container and in every other container"""
+    import staff_cache
+    staff_cache.invalidate(email=user_email, user_id=user_id)
+    if CACHE_VERSIONS_TABLE:
+        increment_cache_version(staff_cache.CACHE_NAME)
+
 # ------------------  User Table Functions ------------------
 
 def get_user_record(user_id):
@@ -274,12 +791,20 @@ def assign_client_to_staff_user(client_id, staff_user_id):
 
 def get_all_users():
     try:
-        result = dynamodb.scan(TableName=USERS_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', USERS_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning user records: {e.response['Error']['Message']}")
         return []
 
+def get_users_by_ids(user_ids):
+    """
+    Get user records for several user IDs using BatchGetItem
+    
+    Returns:
+        dict: User records keyed by user ID (unknown IDs are omitted)
+    """
+    return get_items_by_ids(USERS_TABLE, 'userId', user_ids, deserialize_item)
+
 def get_user_by_id(user_id):
     """Get user by ID - alias for get_user_record for consistency"""
     return get_user_record(user_id)
@@ -290,102 +815,133 @@ def get_user(user_id):
 
 # ------------------  Connection Table Functions ------------------
 
+# Sparse index over initialized connections, partitioned into staff and user connections
+CONNECTION_PARTITION_INDEX = 'connectionPartition-index'
+CONNECTION_PARTITION_STAFF = 'STAFF'
+CONNECTION_PARTITION_USER = 'USER'
+CONNECTION_PARTITION_SCAN_FILTERS = {
+    CONNECTION_PARTITION_STAFF: 'staff = :staff',
+    CONNECTION_PARTITION_USER: 'attribute_exists(userId) AND NOT staff = :staff'
+}
+
+STAFF_CONNECTIONS_CACHE_SECONDS = 5
+
+# API Gateway closes WebSocket connections after at most 2 hours
+CONNECTION_TTL_SECONDS = 3 * 60 * 60
+UNINITIALIZED_CONNECTION_GRACE_SECONDS = 10 * 60
+
+# Staff connection list of this container; kept across warm invocations
+_staff_connections_cache = {'connections': None, 'expires_at': 0.0}
+
 def get_connection(connection_id):
     try:
-        result = dynamodb.query(
-            TableName=CONNECTIONS_TABLE,
+        return get_first_item(
+            'query', CONNECTIONS_TABLE, deserialize_item,
             KeyConditionExpression='connectionId = :connectionId',
             ExpressionAttributeValues={':connectionId': {'S': connection_id}}
         )
-        if result.get('Count', 0) > 0:
-            return deserialize_item(result['Items'][0])
-        return None
     except ClientError as e:
         print(f"Error querying connectionId {connection_id}: {e}")
         return None
 
 def get_connection_by_user_id(user_id):
     try:
-        result = dynamodb.query(
-            TableName=CONNECTIONS_TABLE,
+        return get_first_item(
+            'query', CONNECTIONS_TABLE, deserialize_item,
             IndexName='userId-index',
             KeyConditionExpression='userId = :uid',
             ExpressionAttributeValues={':uid': {'S': user_id}}
         )
-        if result.get('Count', 0) > 0:
-            return deserialize_item(result['Items'][0])
-        return None
     except ClientError as e:
         print(f"Error querying userId {user_id}: {e}")
         return None
 
 def get_all_staff_connections():
-    try:
-        result = dynamodb.scan(
-            TableName=CONNECTIONS_TABLE,
-            FilterExpression='staff = :staff',
-            ExpressionAttributeValues={':staff': {'BOOL': True}}
-        )
-        return [deserialize_item(item) for item in result.get('Items', [])]
-    except ClientError as e:
-        print(f"Error querying all staff connections: {e}")
-        return []
+    return get_staff_connections()
 
 def get_assigned_or_all_staff_connections(assigned_to=None):
     try:
         if assigned_to:
-            result = dynamodb.query(
-                TableName=CONNECTIONS_TABLE,
+            return list(iter_items(
+                'query', CONNECTIONS_TABLE, deserialize_item,
                 IndexName='userId-index',
                 KeyConditionExpression='userId = :uid',
                 ExpressionAttributeValues={':uid': {'S': assigned_to}}
-            )
-        else:
-            result = dynamodb.scan(
-                TableName=CONNECTIONS_TABLE,
-                FilterExpression='staff = :staff',
-                ExpressionAttributeValues={':staff': {'BOOL': True}}
-            )
-        return [deserialize_item(item) for item in result.get('Items', [])]
+            ))
+        return get_staff_connections()
     except ClientError as e:
         print(f"Error querying assigned or all staff connections: {e}")
         return []
 
 def get_all_staff_connections_except_user(user_id):
+    return [connection for connection in get_staff_connections() if connection.get('userId') != user_id]
+
+def get_all_active_connections():
     try:
-        result = dynamodb.scan(
-            TableName=CONNECTIONS_TABLE,
-            FilterExpression='staff = :staff AND userId <> :userId',
-            ExpressionAttributeValues={
-                ':staff': {'BOOL': True},
-                ':userId': {'S': user_id}
-            }
-        )
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        connections = []
+        for partition in (CONNECTION_PARTITION_STAFF, CONNECTION_PARTITION_USER):
+            connections.extend(_query_connection_partition(partition))
+        return connections
     except ClientError as e:
-        print(f"Error querying all staff connections except user {user_id}: {e}")
+        print(f"Error retrieving active connections: {e}")
         return []
 
-def get_all_active_connections():
+def get_staff_connections():
+    """
+    Get the connections of staff members online
+    
+    The list is read from the connectionPartition-index STAFF partition, so it costs
+    one query over the staff connections only, and is reused for
+    STAFF_CONNECTIONS_CACHE_SECONDS within the container. Connection changes made
+    by this container drop the cached list; other containers see them once it expires.
+    
+    Returns:
+        list: Staff connection records (empty on error)
+    """
+    now = time.time()
+    if _staff_connections_cache['connections'] is not None and _staff_connections_cache['expires_at'] > now:
+        return list(_staff_connections_cache['connections'])
     try:
-        response = dynamodb.scan(
-            TableName=CONNECTIONS_TABLE,
-            FilterExpression='attribute_exists(userId)'
-        )
-        connections = response.get('Items', [])
-        return [deserialize_item(item) for item in connections]
+        connections = _query_connection_partition(CONNECTION_PARTITION_STAFF)
     except ClientError as e:
-        print(f"Error retrieving active connections: {e}")
+        print(f"Error querying all staff connections: {e}")
         return []
+    _staff_connections_cache.update(connections=connections, expires_at=now + STAFF_CONNECTIONS_CACHE_SECONDS)
+    return list(connections)
+
+def invalidate_staff_connections_cache():
+    """Drop the staff connection list cached in this container"""
+    _staff_connections_cache['connections'] = None
+
+def _query_connection_partition(partition):
+    """Query a connectionPartition-index partition, scanning while the index is unavailable"""
+    try:
+        return list(iter_items(
+            'query', CONNECTIONS_TABLE, deserialize_item,
+            IndexName=CONNECTION_PARTITION_INDEX,
+            KeyConditionExpression='connectionPartition = :partition',
+            ExpressionAttributeValues={':partition': {'S': partition}}
+        ))
+    except ClientError as e:
+        if not is_index_unavailable_error(e):
+            raise
+        print(f"Connection partition index unavailable, scanning {partition} connections: {e}")
+        return list(iter_items(
+            'scan', CONNECTIONS_TABLE, deserialize_item,
+            FilterExpression=CONNECTION_PARTITION_SCAN_FILTERS[partition],
+            ExpressionAttributeValues={':staff': {'BOOL': True}}
+        ))
 
 
 def create_connection(connection_id):
     try:
+        created_at = int(datetime.now(ZoneInfo('Australia/Perth')).timestamp())
         dynamodb.put_item(
             TableName=CONNECTIONS_TABLE,
             Item={
                 'connectionId': {'S': connection_id},
-                'createdAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
+                'createdAt': {'N': str(created_at)},
+                'ttl': {'N': str(created_at + CONNECTION_TTL_SECONDS)}
             }
         )
         print(f"Connection {connection_id} created successfully.")
@@ -400,42 +956,136 @@ def delete_connection(connection_id):
             Key={'connectionId': {'S': connection_id}}
         )
         print(f"Connection {connection_id} deleted successfully.")
+        invalidate_staff_connections_cache()
     except ClientError as e:
         print(f"Error deleting connection {connection_id}: {e}")
 
+def delete_connections(connection_ids):
+    """Delete several connections with BatchWriteItem"""
+    try:
+        batch_delete_items(CONNECTIONS_TABLE, [
+            {'connectionId': {'S': connection_id}} for connection_id in dict.fromkeys(connection_ids)
+        ])
+        print(f"Deleted {len(connection_ids)} connections.")
+        invalidate_staff_connections_cache()
+        return True
+    except Exception as e:
+        print(f"Error deleting connections {connection_ids}: {e}")
+        return False
+
 def delete_old_connections(user_id):
     try:
-        result = dynamodb.query(
-            TableName=CONNECTIONS_TABLE,
-            IndexName='userId-index',
-            KeyConditionExpression='userId = :uid',
-            ExpressionAttributeValues={':uid': {'S': user_id}}
-        )
-        for item in result.get('Items', []):
-            conn_id = item['connectionId']['S']
-            dynamodb.delete_item(
-                TableName=CONNECTIONS_TABLE,
-                Key={'connectionId': {'S': conn_id}}
+        keys = [
+            {'connectionId': item['connectionId']} for item in iter_items(
+                'query', CONNECTIONS_TABLE,
+                IndexName='userId-index',
+                KeyConditionExpression='userId = :uid',
+                ProjectionExpression='connectionId',
+                ExpressionAttributeValues={':uid': {'S': user_id}}
             )
-            print(f"Deleted old connection: {conn_id} for userId: {user_id}")
-    except ClientError as e:
+        ]
+        if keys:
+            batch_delete_items(CONNECTIONS_TABLE, keys)
+            print(f"Deleted {len(keys)} old connections for userId: {user_id}")
+            invalidate_staff_connections_cache()
+    except Exception as e:
         print(f"Error deleting old connections: {e}")
 
-def delete_all_uninitialized_connections():
-    try:
-        result = dynamodb.scan(
-            TableName=CONNECTIONS_TABLE,
-            FilterExpression='attribute_not_exists(userId)'
-        )
-        for item in result.get('Items', []):
-            conn_id = item['connectionId']['S']
-            dynamodb.delete_item(
+def sweep_stale_connections():
+    """
+    Delete connections that were never initialized or have outlived their ttl
+    
+    Connections without a userId are removed once they are older than
+    UNINITIALIZED_CONNECTION_GRACE_SECONDS, so clients still initializing keep
+    theirs. Expired connections are removed without waiting for DynamoDB TTL,
+    which may delete items up to a few days late; connections created before
+    ttl was written are matched by their age instead. The scan reads only the
+    connection IDs and the matches are deleted 25 at a time as pages arrive.
+    
+    Returns:
+        dict: Sweep statistics
+    """
+    now = int(time.time())
+    result = {'deleted': 0, 'failed': 0}
+    items = iter_items(
+        'scan', CONNECTIONS_TABLE,
+        FilterExpression=(
+            '(attribute_not_exists(userId) AND createdAt < :uninitialized_before) '
+            'OR #ttl < :now OR createdAt < :expired_before'
+        ),
+        ProjectionExpression='connectionId',
+        ExpressionAttributeNames={'#ttl': 'ttl'},
+        ExpressionAttributeValues={
+            ':uninitialized_before': {'N': str(now - UNINITIALIZED_CONNECTION_GRACE_SECONDS)},
+            ':now': {'N': str(now)},
+            ':expired_before': {'N': str(now - CONNECTION_TTL_SECONDS)}
+        }
+    )
+    
+    def delete_chunk(keys):
+        try:
+            unprocessed = _send_batch_write(CONNECTIONS_TABLE, [{'DeleteRequest': {'Key': key}} for key in keys])
+        except ClientError as e:
+            print(f"Error deleting batch of {len(keys)} stale connections: {e}")
+            unprocessed = keys
+        result['failed'] += len(unprocessed)
+        result['deleted'] += len(keys) - len(unprocessed)
+    
+    keys = []
+    for item in items:
+        keys.append({'connectionId': item['connectionId']})
+        if len(keys) == BATCH_WRITE_MAX_ITEMS:
+            delete_chunk(keys)
+            keys = []
+    if keys:
+        delete_chunk(keys)
+    
+    if result['deleted']:
+        invalidate_staff_connections_cache()
+    print(f"Stale connection sweep complete: {result}")
+    return result
+
+def backfill_connection_partitions():
+    """
+    Write connectionPartition on initialized connections opened before it existed
+
+    Without it these connections are missing from the connectionPartition-index,
+    so staff broadcasts skip them until they reconnect. The update is conditional,
+    so a connection deleted meanwhile is not recreated and running it again only
+    fills in connections that are still missing a partition.
+
+    Returns:
+        dict: Backfill statistics
+    """
+    result = {'scanned': 0, 'updated': 0, 'errors': 0}
+    items = iter_items(
+        'scan', CONNECTIONS_TABLE,
+        FilterExpression='attribute_not_exists(connectionPartition) AND attribute_exists(userId)',
+        ProjectionExpression='connectionId, staff'
+    )
+    for item in items:
+        result['scanned'] += 1
+        is_staff = item.get('staff', {}).get('BOOL', False)
+        try:
+            dynamodb.update_item(
                 TableName=CONNECTIONS_TABLE,
-                Key={'connectionId': {'S': conn_id}}
+                Key={'connectionId': item['connectionId']},
+                UpdateExpression='SET connectionPartition = :partition',
+                ConditionExpression='attribute_exists(connectionId) AND attribute_not_exists(connectionPartition)',
+                ExpressionAttributeValues={
+                    ':partition': {'S': CONNECTION_PARTITION_STAFF if is_staff else CONNECTION_PARTITION_USER}
+                }
             )
-            print(f"Deleted uninitialized connection: {conn_id}")
-    except ClientError as e:
-        print(f"Error deleting uninitialized connections: {e}")
+            result['updated'] += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error backfilling connectionPartition for connection {item['connectionId']['S']}: {e}")
+                result['errors'] += 1
+
+    if result['updated']:
+        invalidate_staff_connections_cache()
+    print(f"Connection partition backfill complete: {result}")
+    return result
 
 def build_update_expression_for_connection(data):
     update_parts = []
@@ -445,6 +1095,11 @@ def build_update_expression_for_connection(data):
             update_parts.append(f"{key} = :{key}")
             if key == 'staff':
                 expression_values[f":{key}"] = {"BOOL": value == 'true'}
+                # Initialized connections are listed in the connectionPartition-index
+                update_parts.append("connectionPartition = :connectionPartition")
+                expression_values[":connectionPartition"] = {
+                    "S": CONNECTION_PARTITION_STAFF if value == 'true' else CONNECTION_PARTITION_USER
+                }
             else:
                 expression_values[f":{key}"] = {"S": value}
     if update_parts:
@@ -462,6 +1117,7 @@ def update_connection(connection_id, user_data):
                 ExpressionAttributeValues=expression_values
             )
             print(f"Connection {connection_id} updated successfully.")
+            invalidate_staff_connections_cache()
             return True
         except ClientError as e:
             print(f"Error updating connection {connection_id}: {e}")
@@ -472,35 +1128,38 @@ def update_connection(connection_id, user_data):
 
 # ------------------  Message Table Functions ------------------
 
+# Messages of a conversation (keyed by the customer's user ID) sorted by creation time
+CONVERSATION_INDEX = 'conversationId-createdAt-index'
+
+# Every conversation summary shares one partition of this index, sorted by last message time
+CONVERSATION_SUMMARIES_INDEX = 'summaryPartition-lastMessageAt-index'
+CONVERSATION_SUMMARY_PARTITION = 'ALL'
+
 def get_message(message_id):
     try:
-        result = dynamodb.query(
-            TableName=os.environ['MESSAGES_TABLE'],
+        return get_first_item(
+            'query', os.environ['MESSAGES_TABLE'], deserialize_item,
             KeyConditionExpression='messageId = :messageId',
             ExpressionAttributeValues={':messageId': {'S': message_id}}
         )
-        if result.get('Count', 0) > 0:
-            return deserialize_item(result['Items'][0])
-        return None
     except ClientError as e:
         print(f"Error getting message with ID {message_id}: {e}")
         return None
 
 def get_messages_by_index(index_name, key_name, key_value):
     try:
-        response = dynamodb.query(
-            TableName=MESSAGES_TABLE,
+        return list(iter_items(
+            'query', MESSAGES_TABLE, deserialize_item,
             IndexName=index_name,
             KeyConditionExpression=f'{key_name} = :value',
             ExpressionAttributeValues={':value': {'S': key_value}}
-        )
-        return [deserialize_item(item) for item in response.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error querying messages by {key_name}: {e}")
         return []
 
-def build_message_data(message_id, message, sender_id, receiver_id):
-    return {
+def build_message_data(message_id, message, sender_id, receiver_id, conversation_id=None):
+    message_data = {
         'messageId': {'S': message_id},
         'message': {'S': message},
         'senderId': {'S': sender_id},
@@ -510,6 +1169,9 @@ def build_message_data(message_id, message, sender_id, receiver_id):
         'viewed': {'BOOL': False},
         'createdAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
     }
+    if conversation_id:
+        message_data['conversationId'] = {'S': conversation_id}
+    return message_data
 
 def create_message(message_data):
     try:
@@ -518,6 +1180,7 @@ def create_message(message_data):
             Item=message_data
         )
         print(f"Message stored with ID: {message_data['messageId']['S']}")
+        put_conversation_summary(message_data)
         return True
     except ClientError as e:
         print(f"Error storing message: {e}")
@@ -526,17 +1189,19 @@ def create_message(message_data):
 def update_message_status(message_id, status):
     try:
         update_expr = {
-            'MESSAGE_RECEIVED': ('SET received = :val', {':val': {'BOOL': True}}),
-            'MESSAGE_VIEWED': ('SET viewed = :val', {':val': {'BOOL': True}})
+            'MESSAGE_RECEIVED': ('received', 'SET received = :val', {':val': {'BOOL': True}}),
+            'MESSAGE_VIEWED': ('viewed', 'SET viewed = :val', {':val': {'BOOL': True}})
         }
-        expr, values = update_expr[status]
-        dynamodb.update_item(
+        flag, expr, values = update_expr[status]
+        response = dynamodb.update_item(
             TableName=MESSAGES_TABLE,
             Key={'messageId': {'S': message_id}},
             UpdateExpression=expr,
-            ExpressionAttributeValues=values
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
         )
         print(f"Message {message_id} marked as {status}.")
+        _update_summary_last_message(response.get('Attributes', {}), f'SET lastMessage.{flag} = :val', values)
         return True
     except ClientError as e:
         print(f"Error updating message {message_id}: {str(e)}")
@@ -544,202 +1209,383 @@ def update_message_status(message_id, status):
 
 def update_message_content(message_id, new_message):
     try:
-        dynamodb.update_item(
+        response = dynamodb.update_item(
             TableName=MESSAGES_TABLE,
             Key={'messageId': {'S': message_id}},
             UpdateExpression='SET message = :newMessage',
-            ExpressionAttributeValues={':newMessage': {'S': new_message}}
+            ExpressionAttributeValues={':newMessage': {'S': new_message}},
+            ReturnValues='ALL_NEW'
         )
         print(f"Message {message_id} updated successfully.")
+        _update_summary_last_message(
+            response.get('Attributes', {}), 'SET lastMessage.message = :newMessage',
+            {':newMessage': {'S': new_message}}
+        )
         return True
     except ClientError as e:
         print(f"Error updating message {message_id}: {e}")
 
 def delete_message(message_id):
     try:
-        dynamodb.delete_item(
+        response = dynamodb.delete_item(
             TableName=MESSAGES_TABLE,
-            Key={'messageId': {'S': message_id}}
+            Key={'messageId': {'S': message_id}},
+            ReturnValues='ALL_OLD'
         )
         print(f"Message {message_id} deleted successfully.")
+        _replace_summary_last_message(response.get('Attributes', {}))
         return True
     except ClientError as e:
         print(f"Error deleting message {message_id}: {e}")
         return False
 
-# ------------------  Unavailable Slots Table Functions ------------------
+def get_conversation_messages_page(conversation_id, limit, position=None, created_after=None):
+    """
+    Get one page of a conversation's messages, newest first
+    
+    Args:
+        conversation_id: Customer user ID of the conversation
+        limit: Maximum number of messages in the page
+        position: Position returned with the previous page (see query_page)
+        created_after: Optional earliest createdAt timestamp to include
+        
+    Returns:
+        tuple: (messages, position of the next page or None). While the conversation
+               index is unavailable every matching message is returned as one page.
+        
+    Raises:
+        ClientError: If the messages can't be read
+    """
+    key_condition = 'conversationId = :conversation_id'
+    expression_values = {':conversation_id': {'S': conversation_id}}
+    if created_after is not None:
+        key_condition += ' AND createdAt >= :created_after'
+        expression_values[':created_after'] = {'N': str(int(created_after))}
+    try:
+        return query_page(MESSAGES_TABLE, [{
+            'IndexName': CONVERSATION_INDEX,
+            'KeyConditionExpression': key_condition,
+            'ExpressionAttributeValues': expression_values,
+            'ScanIndexForward': False
+        }], ('messageId', 'conversationId', 'createdAt'), limit, position, deserialize_item)
+    except ClientError as e:
+        if not is_index_unavailable_error(e):
+            raise
+        print(f"Conversation index unavailable, reading messages of {conversation_id} by sender and receiver: {e}")
+    
+    messages = (
+        get_messages_by_index('senderId-index', 'senderId', conversation_id)
+        + get_messages_by_index('receiverId-index', 'receiverId', conversation_id)
+    )
+    if created_after is not None:
+        messages = [msg for msg in messages if int(msg.get('createdAt', 0)) >= created_after]
+    messages.sort(key=lambda x: int(x.get('createdAt', 0)), reverse=True)
+    return messages, None
+
+# ------------------  Conversation Summaries Table Functions ------------------
+
+def get_conversation_summaries():
+    """
+    Get the summary of every conversation, latest activity first
+    
+    Returns:
+        list: Summary records with the conversation's lastMessage, or None if the
+              summaries table or its index is unavailable
+    """
+    if not CONVERSATION_SUMMARIES_TABLE:
+        return None
+    try:
+        return list(iter_items(
+            'query', CONVERSATION_SUMMARIES_TABLE, deserialize_item,
+            IndexName=CONVERSATION_SUMMARIES_INDEX,
+            KeyConditionExpression='summaryPartition = :partition',
+            ExpressionAttributeValues={':partition': {'S': CONVERSATION_SUMMARY_PARTITION}},
+            ScanIndexForward=False
+        ))
+    except ClientError as e:
+        print(f"Error querying conversation summaries: {e}")
+        return None
 
-def get_unavailable_slots(date):
-    """Get unavailable slots for a specific date"""
+def put_conversation_summary(message_item):
+    """
+    Make a message the last message of its conversation's summary unless a newer one is already there
+    
+    Args:
+        message_item: Message item in DynamoDB format (ignored without a conversationId)
+        
+    Returns:
+        bool: True if the summary was written or already had a newer message
+    """
+    conversation_id = message_item.get('conversationId', {}).get('S')
+    if not CONVERSATION_SUMMARIES_TABLE or not conversation_id:
+        return False
     try:
-        result = dynamodb.get_item(
-            TableName=UNAVAILABLE_SLOTS_TABLE,
-            Key={'date': {'S': date}}
+        dynamodb.update_item(
+            TableName=CONVERSATION_SUMMARIES_TABLE,
+            Key={'conversationId': {'S': conversation_id}},
+            UpdateExpression='SET lastMessage = :message, lastMessageAt = :created_at, summaryPartition = :partition',
+            ConditionExpression='attribute_not_exists(lastMessageAt) OR lastMessageAt <= :created_at',
+            ExpressionAttributeValues={
+                ':message': {'M': message_item},
+                ':created_at': message_item['createdAt'],
+                ':partition': {'S': CONVERSATION_SUMMARY_PARTITION}
+            }
         )
-        if 'Item' in result:
-            return deserialize_item_json_safe(result['Item'])
-        return None
+        return True
     except ClientError as e:
-        print(f"Error getting unavailable slots for date {date}: {e}")
-        return None
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return True
+        print(f"Error updating conversation summary {conversation_id}: {e}")
+        return False
 
-def update_unavailable_slots(date, time_slots, staff_user_id=None):
-    """Update unavailable slots for a specific date"""
+def _update_summary_last_message(message_item, update_expression, expression_values):
+    """Apply a message change to its conversation summary if it is still the last message there"""
+    conversation_id = message_item.get('conversationId', {}).get('S')
+    if not CONVERSATION_SUMMARIES_TABLE or not conversation_id:
+        return
     try:
-        # Build time slots list for DynamoDB
-        time_slots_list = []
-        for slot in time_slots:
-            if isinstance(slot, str) and '-' in slot:
-                # Handle "HH:MM-HH:MM" format
-                start_time, end_time = slot.split('-')
-                time_slots_list.append({
-                    'M': {
-                        'startTime': {'S': start_time},
-                        'endTime': {'S': end_time}
-                    }
-                })
-            elif isinstance(slot, dict) and 'startTime' in slot and 'endTime' in slot:
-                # Handle object format
-                time_slots_list.append({
-                    'M': {
-                        'startTime': {'S': slot['startTime']},
-                        'endTime': {'S': slot['endTime']}
-                    }
-                })
+        dynamodb.update_item(
+            TableName=CONVERSATION_SUMMARIES_TABLE,
+            Key={'conversationId': {'S': conversation_id}},
+            UpdateExpression=update_expression,
+            ConditionExpression='lastMessage.messageId = :message_id',
+            ExpressionAttributeValues=dict(expression_values, **{':message_id': message_item['messageId']})
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Error updating conversation summary {conversation_id}: {e}")
+
+def _replace_summary_last_message(deleted_message):
+    """Point a conversation summary whose last message was deleted at the latest remaining message"""
+    conversation_id = deleted_message.get('conversationId', {}).get('S')
+    if not CONVERSATION_SUMMARIES_TABLE or not conversation_id:
+        return
+    condition_values = {':message_id': deleted_message['messageId']}
+    try:
+        # The index is eventually consistent and may still hold the deleted message
+        latest = next((
+            item for item in iter_items(
+                'query', MESSAGES_TABLE, page_size=2, max_items=2,
+                IndexName=CONVERSATION_INDEX,
+                KeyConditionExpression='conversationId = :conversation_id',
+                ExpressionAttributeValues={':conversation_id': {'S': conversation_id}},
+                ScanIndexForward=False
+            )
+            if item.get('messageId') != deleted_message['messageId']
+        ), None)
+        if latest:
+            dynamodb.update_item(
+                TableName=CONVERSATION_SUMMARIES_TABLE,
+                Key={'conversationId': {'S': conversation_id}},
+                UpdateExpression='SET lastMessage = :message, lastMessageAt = :created_at',
+                ConditionExpression='lastMessage.messageId = :message_id',
+                ExpressionAttributeValues=dict(
+                    condition_values, **{':message': {'M': latest}, ':created_at': latest['createdAt']}
+                )
+            )
+        else:
+            dynamodb.delete_item(
+                TableName=CONVERSATION_SUMMARIES_TABLE,
+                Key={'conversationId': {'S': conversation_id}},
+                ConditionExpression='lastMessage.messageId = :message_id',
+                ExpressionAttributeValues=condition_values
+            )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Error replacing last message of conversation summary {conversation_id}: {e}")
+
+def backfill_message_conversations():
+    """
+    Write conversationId on messages without one and build the conversation summaries
+    
+    A conversation is keyed by its customer: the sender of messages to 'ALL' and
+    of messages to staff, otherwise the receiver. Running it again only fills in
+    messages that are still missing a conversationId.
+    
+    Returns:
+        dict: Backfill statistics
+    """
+    result = {'scanned': 0, 'updated': 0, 'skipped': 0, 'errors': 0, 'summaries': 0}
+    staff_user_ids = {
+        item['userId']['S'] for item in iter_items('scan', STAFF_TABLE, ProjectionExpression='userId')
+        if 'userId' in item
+    }
+    
+    latest_by_conversation = {}
+    for item in iter_items('scan', MESSAGES_TABLE):
+        result['scanned'] += 1
+        conversation_id = item.get('conversationId', {}).get('S')
+        if not conversation_id:
+            sender_id = item.get('senderId', {}).get('S')
+            receiver_id = item.get('receiverId', {}).get('S')
+            if receiver_id == 'ALL' or (sender_id and sender_id not in staff_user_ids):
+                conversation_id = sender_id
             else:
-                print(f"Warning: Invalid time slot format: {slot}")
-        
-        # Build the item to store
-        item = {
-            'date': {'S': date},
-            'timeSlots': {'L': time_slots_list},
-            'updatedAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
-        }
-        
-        # Add staff user ID if provided
-        if staff_user_id:
-            item['updatedBy'] = {'S': staff_user_id}
+                conversation_id = receiver_id
+            if not conversation_id or 'createdAt' not in item:
+                print(f"Message {item['messageId']['S']} has no usable participants or createdAt, skipping")
+                result['skipped'] += 1
+                continue
+            try:
+                dynamodb.update_item(
+                    TableName=MESSAGES_TABLE,
+                    Key={'messageId': item['messageId']},
+                    UpdateExpression='SET conversationId = :conversation_id',
+                    ExpressionAttributeValues={':conversation_id': {'S': conversation_id}}
+                )
+                item['conversationId'] = {'S': conversation_id}
+                result['updated'] += 1
+            except ClientError as e:
+                print(f"Error backfilling conversationId for message {item['messageId']['S']}: {e}")
+                result['errors'] += 1
+                continue
         
-        dynamodb.put_item(
+        latest = latest_by_conversation.get(conversation_id)
+        if 'createdAt' in item and (
+                latest is None or int(item['createdAt']['N']) > int(latest['createdAt']['N'])):
+            latest_by_conversation[conversation_id] = item
+    
+    for item in latest_by_conversation.values():
+        if put_conversation_summary(item):
+            result['summaries'] += 1
+        else:
+            result['errors'] += 1
+    
+    print(f"Message conversation backfill complete: {result}")
+    return result
+
+# ------------------  Unavailable Slots Table Functions ------------------
+
+def get_unavailable_slots(date):
+    """Get unavailable slots for a specific date"""
+    try:
+        result = dynamodb.get_item(
             TableName=UNAVAILABLE_SLOTS_TABLE,
-            Item=item
+            Key={'date': {'S': date}}
         )
-        print(f"Unavailable slots updated for date {date}")
-        return True
+        if 'Item' in result:
+            return deserialize_item_json_safe(result['Item'])
+        return None
     except ClientError as e:
-        print(f"Error updating unavailable slots for date {date}: {e}")
-        return False
+        print(f"Error getting unavailable slots for date {date}: {e}")
+        return None
 
-def update_unavailable_slots_range(start_date, end_date, time_slots):
-    """Update unavailable slots for a date range"""
-    from datetime import datetime, timedelta
-    
-    try:
-        # Parse dates
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=ZoneInfo("Australia/Perth"))
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=ZoneInfo("Australia/Perth"))
-        
-        if end_dt < start_dt:
-            print(f"Error: End date {end_date} is before start date {start_date}")
-            return False
-        
-        # Build time slots list for DynamoDB
-        time_slots_list = []
-        for slot in time_slots:
+def build_unavailable_slots_item(date, time_slots, staff_user_id=None):
+    """Build an unavailable slots record in DynamoDB format"""
+    # Build time slots list for DynamoDB
+    time_slots_list = []
+    for slot in time_slots:
+        if isinstance(slot, str) and '-' in slot:
+            # Handle "HH:MM-HH:MM" format
+            start_time, end_time = slot.split('-')
+            time_slots_list.append({
+                'M': {
+                    'startTime': {'S': start_time},
+                    'endTime': {'S': end_time}
+                }
+            })
+        elif isinstance(slot, dict) and 'startTime' in slot and 'endTime' in slot:
+            # Handle object format
             time_slots_list.append({
                 'M': {
                     'startTime': {'S': slot['startTime']},
                     'endTime': {'S': slot['endTime']}
                 }
             })
-        
-        # Update slots for each date in the range
-        current_date = start_dt
-        success_count = 0
-        total_dates = (end_dt - start_dt).days + 1
-        
-        while current_date <= end_dt:
-            date_str = current_date.strftime('%Y-%m-%d')
-            try:
-                dynamodb.put_item(
-                    TableName=UNAVAILABLE_SLOTS_TABLE,
-                    Item={
-                        'date': {'S': date_str},
-                        'timeSlots': {'L': time_slots_list},
-                        'updatedAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
-                    }
-                )
-                success_count += 1
-                print(f"Unavailable slots updated for date {date_str}")
-            except ClientError as e:
-                print(f"Error updating unavailable slots for date {date_str}: {e}")
-            
-            current_date += timedelta(days=1)
-        
-        print(f"Updated unavailable slots for {success_count}/{total_dates} dates in range {start_date} to {end_date}")
-        return success_count == total_dates
-        
-    except ValueError as e:
-        print(f"Error parsing dates: {e}")
-        return False
+        else:
+            print(f"Warning: Invalid time slot format: {slot}")
+    
+    # Build the item to store
+    item = {
+        'date': {'S': date},
+        'timeSlots': {'L': time_slots_list},
+        'updatedAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
+    }
+    
+    # Add staff user ID if provided
+    if staff_user_id:
+        item['updatedBy'] = {'S': staff_user_id}
+    
+    return item
+
+def update_unavailable_slots(date, time_slots, staff_user_id=None):
+    """Update unavailable slots for a specific date"""
+    try:
+        dynamodb.put_item(
+            TableName=UNAVAILABLE_SLOTS_TABLE,
+            Item=build_unavailable_slots_item(date, time_slots, staff_user_id)
+        )
+        print(f"Unavailable slots updated for date {date}")
+        return True
     except ClientError as e:
-        print(f"Error updating unavailable slots for date range: {e}")
+        print(f"Error updating unavailable slots for date {date}: {e}")
         return False
 
-def get_unavailable_slots_range(start_date, end_date):
-    """Get unavailable slots for a date range"""
-    from datetime import datetime, timedelta
+def update_unavailable_slots_by_dates(slots_by_date, staff_user_id=None):
+    """
+    Update the unavailable slots of several dates with chunked BatchWriteItem requests
     
-    try:
-        # Parse dates
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=ZoneInfo("Australia/Perth"))
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=ZoneInfo("Australia/Perth"))
-        
-        if end_dt < start_dt:
-            print(f"Error: End date {end_date} is before start date {start_date}")
-            return {}
-        
-        result = {}
-        current_date = start_dt
-        
-        while current_date <= end_dt:
-            date_str = current_date.strftime('%Y-%m-%d')
-            try:
-                unavailable_slots = get_unavailable_slots(date_str)
-                result[date_str] = unavailable_slots.get('timeSlots', []) if unavailable_slots else []
-            except Exception as e:
-                print(f"Error getting unavailable slots for date {date_str}: {e}")
-                result[date_str] = []
-            
-            current_date += timedelta(days=1)
+    Args:
+        slots_by_date: Dict of date (YYYY-MM-DD) to its new list of time slots
+        staff_user_id: Staff user making the update (optional)
         
-        return result
+    Returns:
+        list: Dates that could not be written (empty if every date was updated)
+    """
+    items = [build_unavailable_slots_item(date, time_slots, staff_user_id) for date, time_slots in slots_by_date.items()]
+    failed_items = batch_put_items_with_failures(UNAVAILABLE_SLOTS_TABLE, items)
+    failed_dates = [item['date']['S'] for item in failed_items]
+    
+    print(f"Unavailable slots updated for {len(items) - len(failed_dates)}/{len(items)} dates")
+    return failed_dates
+
+def get_unavailable_slots_by_dates(dates):
+    """
+    Get the unavailable slots records for several dates with BatchGetItem
+    
+    Args:
+        dates: List of dates in YYYY-MM-DD format
         
-    except ValueError as e:
-        print(f"Error parsing dates: {e}")
-        return {}
+    Returns:
+        dict: Records keyed by date (dates without a record are omitted), or None on error
+    """
+    try:
+        items = batch_get_items(UNAVAILABLE_SLOTS_TABLE, [{'date': {'S': date}} for date in dict.fromkeys(dates)])
+        records = [deserialize_item_json_safe(item) for item in items]
+        return {record['date']: record for record in records}
+    except Exception as e:
+        print(f"Error getting unavailable slots for {len(dates)} dates: {e}")
+        return None
 
 # ------------------  Appointments Table Functions ------------------
 
 def create_appointment(appointment_data):
-    """Create a new appointment"""
-    try:
-        dynamodb.put_item(
-            TableName=APPOINTMENTS_TABLE,
-            Item=appointment_data
-        )
+    """Create a new appointment (with its availability index records in the same transaction)"""
+    try:
+        if AVAILABILITY_INDEX_TABLE:
+            import availability_index
+            appointment = deserialize_item_json_safe(appointment_data)
+            appointment_write = {'Put': {'TableName': APPOINTMENTS_TABLE, 'Item': appointment_data}}
+            if not availability_index.write_appointment(lambda: (None, appointment, appointment_write)):
+                return False
+        else:
+            dynamodb.put_item(
+                TableName=APPOINTMENTS_TABLE,
+                Item=appointment_data
+            )
         print(f"Appointment {appointment_data['appointmentId']['S']} created successfully")
         return True
     except ClientError as e:
         print(f"Error creating appointment: {e}")
         return False
 
-def get_appointment(appointment_id):
+def get_appointment(appointment_id, consistent_read=False):
     """Get an appointment by ID"""
     try:
         result = dynamodb.get_item(
             TableName=APPOINTMENTS_TABLE,
-            Key={'appointmentId': {'S': appointment_id}}
+            Key={'appointmentId': {'S': appointment_id}},
+            ConsistentRead=consistent_read
         )
         if 'Item' in result:
             return deserialize_item_json_safe(result['Item'])
@@ -748,6 +1594,15 @@ def get_appointment(appointment_id):
         print(f"Error getting appointment {appointment_id}: {e}")
         return None
 
+def get_appointments_by_ids(appointment_ids):
+    """
+    Get appointments for several appointment IDs using BatchGetItem
+    
+    Returns:
+        dict: Appointments keyed by appointment ID (unknown IDs are omitted)
+    """
+    return get_items_by_ids(APPOINTMENTS_TABLE, 'appointmentId', appointment_ids, deserialize_item_json_safe)
+
 def update_appointment(appointment_id, update_data):
     """Update an existing appointment"""
     try:
@@ -764,7 +1619,18 @@ def update_appointment(appointment_id, update_data):
             if expression_names:
                 update_params['ExpressionAttributeNames'] = expression_names
             
-            dynamodb.update_item(**update_params)
+            # Only changes to the booked slots, status or payment affect slot availability
+            sync_availability = AVAILABILITY_INDEX_TABLE and any(
+                update_data.get(field) is not None for field in APPOINTMENT_AVAILABILITY_FIELDS
+            )
+            if sync_availability:
+                import availability_index
+                if not availability_index.write_appointment(
+                    lambda: read_appointment_update(appointment_id, update_data, update_params)
+                ):
+                    return False
+            else:
+                dynamodb.update_item(**update_params)
             print(f"Appointment {appointment_id} updated successfully")
             return True
         else:
@@ -774,25 +1640,86 @@ def update_appointment(appointment_id, update_data):
         print(f"Error updating appointment {appointment_id}: {e}")
         return False
 
+def read_appointment_update(appointment_id, update_data, update_params):
+    """
+    Read an appointment and prepare an update of it for a transaction
+    
+    The update is conditioned on the availability fields still holding the values read,
+    so a concurrent change to the booked slots fails the transaction instead of
+    being overwritten with stale index records.
+    
+    Args:
+        appointment_id: Appointment ID
+        update_data: Fields being updated (see build_update_expression_for_appointment)
+        update_params: update_item parameters built from update_data
+        
+    Returns:
+        tuple: (appointment before the update, appointment after the update, TransactWriteItems entry),
+               or None if the appointment could not be read
+    """
+    try:
+        result = dynamodb.get_item(
+            TableName=APPOINTMENTS_TABLE,
+            Key={'appointmentId': {'S': appointment_id}},
+            ConsistentRead=True
+        )
+    except ClientError as e:
+        print(f"Error getting appointment {appointment_id}: {e}")
+        return None
+    
+    old_item = result.get('Item')
+    old_appointment = deserialize_item_json_safe(old_item) if old_item else None
+    
+    # Apply the update to the read state: set fields have a value, the other given fields are removed
+    new_appointment = dict(old_appointment or {'appointmentId': appointment_id})
+    for key, value in update_data.items():
+        if value is None:
+            continue
+        if f':{key}' in update_params['ExpressionAttributeValues']:
+            new_appointment[key] = codec.deserialize_value(update_params['ExpressionAttributeValues'][f':{key}'])
+        else:
+            new_appointment.pop(key, None)
+    
+    conditions = []
+    names = dict(update_params.get('ExpressionAttributeNames', {}))
+    values = dict(update_params['ExpressionAttributeValues'])
+    for field in APPOINTMENT_AVAILABILITY_FIELDS:
+        names[f'#read_{field}'] = field
+        if old_item and field in old_item:
+            conditions.append(f'#read_{field} = :read_{field}')
+            values[f':read_{field}'] = old_item[field]
+        else:
+            conditions.append(f'attribute_not_exists(#read_{field})')
+    
+    appointment_write = {'Update': dict(
+        update_params,
+        ConditionExpression=' AND '.join(conditions),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )}
+    return old_appointment, new_appointment, appointment_write
+
 def get_all_appointments():
     """Get all appointments"""
     try:
-        result = dynamodb.scan(TableName=APPOINTMENTS_TABLE)
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', APPOINTMENTS_TABLE, deserialize_item_json_safe))
     except ClientError as e:
         print(f"Error scanning all appointments: {e}")
         return []
 
+def get_appointments_page(limit, position=None, **criteria):
+    """Get one page of appointments matching listing criteria (see get_listing_page)"""
+    return get_listing_page(APPOINTMENTS_TABLE, 'appointmentId', deserialize_item_json_safe, limit, position, **criteria)
+
 def get_appointments_by_created_user(user_id):
     """Get appointments created by a specific user"""
     try:
-        result = dynamodb.query(
-            TableName=APPOINTMENTS_TABLE,
+        return list(iter_items(
+            'query', APPOINTMENTS_TABLE, deserialize_item_json_safe,
             IndexName='createdUserId-index',
             KeyConditionExpression='createdUserId = :userId',
             ExpressionAttributeValues={':userId': {'S': user_id}}
-        )
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting appointments for created user {user_id}: {e}")
         return []
@@ -800,13 +1727,12 @@ def get_appointments_by_created_user(user_id):
 def get_appointments_by_assigned_mechanic(mechanic_id):
     """Get appointments assigned to a specific mechanic"""
     try:
-        result = dynamodb.query(
-            TableName=APPOINTMENTS_TABLE,
+        return list(iter_items(
+            'query', APPOINTMENTS_TABLE, deserialize_item_json_safe,
             IndexName='assignedMechanicId-index',
             KeyConditionExpression='assignedMechanicId = :mechanicId',
             ExpressionAttributeValues={':mechanicId': {'S': mechanic_id}}
-        )
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting appointments for assigned mechanic {mechanic_id}: {e}")
         return []
@@ -814,13 +1740,12 @@ def get_appointments_by_assigned_mechanic(mechanic_id):
 def get_appointments_by_scheduled_date(scheduled_date):
     """Get appointments scheduled for a specific date"""
     try:
-        result = dynamodb.query(
-            TableName=APPOINTMENTS_TABLE,
+        return list(iter_items(
+            'query', APPOINTMENTS_TABLE, deserialize_item_json_safe,
             IndexName='scheduledDate-index',
             KeyConditionExpression='scheduledDate = :date',
             ExpressionAttributeValues={':date': {'S': scheduled_date}}
-        )
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting appointments for scheduled date {scheduled_date}: {e}")
         return []
@@ -828,18 +1753,69 @@ def get_appointments_by_scheduled_date(scheduled_date):
 def get_appointments_by_status(status):
     """Get appointments by status"""
     try:
-        result = dynamodb.query(
-            TableName=APPOINTMENTS_TABLE,
+        return list(iter_items(
+            'query', APPOINTMENTS_TABLE, deserialize_item_json_safe,
             IndexName='status-index',
             KeyConditionExpression='#status = :status',
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={':status': {'S': status}}
-        )
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting appointments for status {status}: {e}")
         return []
 
+def get_paid_pending_appointments():
+    """
+    Get the paid PENDING appointments with only the attributes that determine their slots
+    
+    The paymentStatus filter and projection are applied by DynamoDB, so unpaid
+    appointments and unrelated attributes aren't transferred.
+    """
+    query_kwargs = {
+        'IndexName': 'status-index',
+        'KeyConditionExpression': '#status = :status',
+        'FilterExpression': 'paymentStatus = :paid',
+        'ProjectionExpression': 'appointmentId, #status, paymentStatus, selectedSlots',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':status': {'S': 'PENDING'}, ':paid': {'S': 'paid'}}
+    }
+    try:
+        return list(iter_items('query', APPOINTMENTS_TABLE, deserialize_item_json_safe, **query_kwargs))
+    except ClientError as e:
+        print(f"Error getting paid pending appointments: {e}")
+        return []
+
+def get_appointments_by_scheduled_dates(scheduled_dates):
+    """
+    Get appointments scheduled for several dates
+    
+    The scheduledDate-index has no sort key, so one query is needed per date;
+    the queries run concurrently.
+    
+    Args:
+        scheduled_dates: List of dates in YYYY-MM-DD format
+        
+    Returns:
+        dict: Lists of appointments keyed by date
+    """
+    def query_date(scheduled_date):
+        try:
+            return list(iter_items(
+                'query', APPOINTMENTS_TABLE, deserialize_item_json_safe,
+                IndexName='scheduledDate-index',
+                KeyConditionExpression='scheduledDate = :date',
+                ExpressionAttributeValues={':date': {'S': scheduled_date}}
+            ))
+        except ClientError as e:
+            print(f"Error getting appointments for scheduled date {scheduled_date}: {e}")
+            return []
+
+    unique_dates = list(dict.fromkeys(scheduled_dates))
+    if not unique_dates:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(unique_dates))) as executor:
+        return dict(zip(unique_dates, executor.map(query_date, unique_dates)))
+
 def build_update_expression_for_appointment(data):
     """Build update expression for appointment updates"""
     update_parts = []
@@ -957,8 +1933,8 @@ def get_daily_unpaid_appointments_count(user_id, today):
     """Get count of unpaid appointments for a user on a specific day"""
     try:
         today_str = today.strftime('%Y-%m-%d') if hasattr(today, 'strftime') else str(today)
-        result = dynamodb.query(
-            TableName=APPOINTMENTS_TABLE,
+        return count_items(
+            'query', APPOINTMENTS_TABLE,
             IndexName='createdUserId-index',
             KeyConditionExpression='createdUserId = :uid',
             FilterExpression='createdDate = :date AND paymentStatus <> :paid',
@@ -968,7 +1944,6 @@ def get_daily_unpaid_appointments_count(user_id, today):
                 ':paid': {'S': 'paid'}
             }
         )
-        return result.get('Count', 0)
     except ClientError as e:
         print(f"Error getting daily unpaid appointments count for user {user_id}: {e}")
         return 0
@@ -976,8 +1951,19 @@ def get_daily_unpaid_appointments_count(user_id, today):
 
 # ------------------  Service Pricing Table Functions ------------------
 
-def get_service_plan_names(service_id, plan_id):
-    """Get service plan names by service_id and plan_id"""
+def get_service_price_record(service_id, plan_id):
+    """
+    Get the service pricing record of a service plan
+    
+    Served from the price catalogue; plans missing from it (e.g. added since it
+    was loaded) are read from the table.
+    """
+    import price_catalogue
+    catalogue = price_catalogue.get_catalogue()
+    record = catalogue.get_service(service_id, plan_id) if catalogue else None
+    if record is not None:
+        return record
+    
     try:
         result = dynamodb.get_item(
             TableName=SERVICE_PRICES_TABLE,
@@ -987,38 +1973,34 @@ def get_service_plan_names(service_id, plan_id):
             }
         )
         if 'Item' in result:
-            item = deserialize_item(result['Item'])
-            return item.get('serviceName'), item.get('planName')
+            return deserialize_item(result['Item'])
         return None
     except ClientError as e:
-        print(f"Error getting service plan name for service {service_id} and plan {plan_id}: {e}")
+        print(f"Error getting service pricing record for service {service_id} and plan {plan_id}: {e}")
         return None
 
+def get_service_plan_names(service_id, plan_id):
+    """Get service plan names by service_id and plan_id"""
+    item = get_service_price_record(service_id, plan_id)
+    if item:
+        return item.get('serviceName'), item.get('planName')
+    return None
+
 def get_service_pricing(service_id, plan_id):
     """Get service pricing by service_id and plan_id, return only the price field"""
-    try:
-        result = dynamodb.get_item(
-            TableName=SERVICE_PRICES_TABLE,
-            Key={
-                'serviceId': {'N': str(service_id)},
-                'planId': {'N': str(plan_id)}
-            }
-        )
-        if 'Item' in result:
-            item = deserialize_item(result['Item'])
-            return item.get('price')
-        return None
-    except ClientError as e:
-        print(f"Error getting service pricing for service {service_id} and plan {plan_id}: {e}")
-        return None
+    item = get_service_price_record(service_id, plan_id)
+    if item:
+        return item.get('price')
+    return None
 
-def get_all_service_prices():
+def get_all_service_prices(raise_on_error=False):
     """Get all service pricing records"""
     try:
-        result = dynamodb.scan(TableName=SERVICE_PRICES_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', SERVICE_PRICES_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning service pricing records: {e}")
+        if raise_on_error:
+            raise
         return []
 
 # ------------------  Orders Table Functions ------------------
@@ -1050,6 +2032,15 @@ def get_order(order_id):
         print(f"Error getting order {order_id}: {e}")
         return None
 
+def get_orders_by_ids(order_ids):
+    """
+    Get orders for several order IDs using BatchGetItem
+    
+    Returns:
+        dict: Orders keyed by order ID (unknown IDs are omitted)
+    """
+    return get_items_by_ids(ORDERS_TABLE, 'orderId', order_ids, deserialize_item)
+
 def update_order(order_id, update_data):
     """Update an existing order"""
     try:
@@ -1079,22 +2070,24 @@ def update_order(order_id, update_data):
 def get_all_orders():
     """Get all orders"""
     try:
-        result = dynamodb.scan(TableName=ORDERS_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', ORDERS_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning all orders: {e}")
         return []
 
+def get_orders_page(limit, position=None, **criteria):
+    """Get one page of orders matching listing criteria (see get_listing_page)"""
+    return get_listing_page(ORDERS_TABLE, 'orderId', deserialize_item, limit, position, **criteria)
+
 def get_orders_by_created_user(user_id):
     """Get orders created by a specific user"""
     try:
-        result = dynamodb.query(
-            TableName=ORDERS_TABLE,
+        return list(iter_items(
+            'query', ORDERS_TABLE, deserialize_item,
             IndexName='createdUserId-index',
             KeyConditionExpression='createdUserId = :userId',
             ExpressionAttributeValues={':userId': {'S': user_id}}
-        )
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting orders for created user {user_id}: {e}")
         return []
@@ -1102,13 +2095,12 @@ def get_orders_by_created_user(user_id):
 def get_orders_by_assigned_mechanic(mechanic_id):
     """Get orders assigned to a specific mechanic"""
     try:
-        result = dynamodb.query(
-            TableName=ORDERS_TABLE,
+        return list(iter_items(
+            'query', ORDERS_TABLE, deserialize_item,
             IndexName='assignedMechanicId-index',
             KeyConditionExpression='assignedMechanicId = :mechanicId',
             ExpressionAttributeValues={':mechanicId': {'S': mechanic_id}}
-        )
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting orders for assigned mechanic {mechanic_id}: {e}")
         return []
@@ -1117,8 +2109,8 @@ def get_daily_unpaid_orders_count(user_id, today):
     """Get count of unpaid orders for a user on a specific day"""
     try:
         today_str = today.strftime('%Y-%m-%d') if hasattr(today, 'strftime') else str(today)
-        result = dynamodb.query(
-            TableName=ORDERS_TABLE,
+        return count_items(
+            'query', ORDERS_TABLE,
             IndexName='createdUserId-index',
             KeyConditionExpression='createdUserId = :uid',
             FilterExpression='createdDate = :date AND paymentStatus <> :paid',
@@ -1128,7 +2120,6 @@ def get_daily_unpaid_orders_count(user_id, today):
                 ':paid': {'S': 'paid'}
             }
         )
-        return result.get('Count', 0)
     except ClientError as e:
         print(f"Error getting daily unpaid orders count for user {user_id}: {e}")
         return 0
@@ -1241,8 +2232,19 @@ def build_order_data(order_id, items, customer_data, car_data, notes, delivery_l
 
 # ------------------  Item Prices Table Functions ------------------
 
-def get_category_item_names(category_id, item_id):
-    """Get category item names by category_id and item_id"""
+def get_item_price_record(category_id, item_id):
+    """
+    Get the item pricing record of a category item
+    
+    Served from the price catalogue; items missing from it (e.g. added since it
+    was loaded) are read from the table.
+    """
+    import price_catalogue
+    catalogue = price_catalogue.get_catalogue()
+    record = catalogue.get_item(category_id, item_id) if catalogue else None
+    if record is not None:
+        return record
+    
     try:
         result = dynamodb.get_item(
             TableName=ITEM_PRICES_TABLE,
@@ -1252,38 +2254,34 @@ def get_category_item_names(category_id, item_id):
             }
         )
         if 'Item' in result:
-            item = deserialize_item(result['Item'])
-            return item.get('categoryName'), item.get('itemName')
+            return deserialize_item(result['Item'])
         return None
     except ClientError as e:
-        print(f"Error getting item name for category {category_id} and item {item_id}: {e}")
+        print(f"Error getting item pricing record for category {category_id} and item {item_id}: {e}")
         return None
 
+def get_category_item_names(category_id, item_id):
+    """Get category item names by category_id and item_id"""
+    item = get_item_price_record(category_id, item_id)
+    if item:
+        return item.get('categoryName'), item.get('itemName')
+    return None
+
 def get_item_pricing(category_id, item_id):
     """Get item pricing by category_id and item_id, return only the price field"""
-    try:
-        result = dynamodb.get_item(
-            TableName=ITEM_PRICES_TABLE,
-            Key={
-                'categoryId': {'N': str(category_id)},
-                'itemId': {'N': str(item_id)}
-            }
-        )
-        if 'Item' in result:
-            item = deserialize_item(result['Item'])
-            return item.get('price')
-        return None
-    except ClientError as e:
-        print(f"Error getting item pricing for category {category_id} and item {item_id}: {e}")
-        return None
+    item = get_item_price_record(category_id, item_id)
+    if item:
+        return item.get('price')
+    return None
 
-def get_all_item_prices():
+def get_all_item_prices(raise_on_error=False):
     """Get all item pricing records"""
     try:
-        result = dynamodb.scan(TableName=ITEM_PRICES_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', ITEM_PRICES_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning item pricing records: {e}")
+        if raise_on_error:
+            raise
         return []
 
 # ------------------  Inquiries Table Functions ------------------
@@ -1318,12 +2316,15 @@ def get_inquiry(inquiry_id):
 def get_all_inquiries():
     """Get all inquiries"""
     try:
-        result = dynamodb.scan(TableName=INQUIRIES_TABLE)
-        return [deserialize_item(item) for item in result.get('Items', [])]
+        return list(iter_items('scan', INQUIRIES_TABLE, deserialize_item))
     except ClientError as e:
         print(f"Error scanning all inquiries: {e}")
         return []
 
+def get_inquiries_page(limit, position=None, item_filter=None, **criteria):
+    """Get one page of inquiries matching listing criteria (see get_listing_page)"""
+    return get_listing_page(INQUIRIES_TABLE, 'inquiryId', deserialize_item, limit, position, item_filter, **criteria)
+
 def build_inquiry_data(inquiry_id, first_name, last_name, email, message, user_id):
     """Build inquiry data in DynamoDB format"""
     current_time = int(datetime.now(ZoneInfo('Australia/Perth')).timestamp())
@@ -1421,13 +2422,12 @@ def update_payment_by_intent_id(payment_intent_id, update_data):
 def get_payments_by_user(user_id):
     """Get all payments for a specific user"""
     try:
-        result = dynamodb.query(
-            TableName=PAYMENTS_TABLE,
+        return list(iter_items(
+            'query', PAYMENTS_TABLE, deserialize_item_json_safe,
             IndexName='userId-index',
             KeyConditionExpression='userId = :uid',
             ExpressionAttributeValues={':uid': {'S': user_id}}
-        )
-        return [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+        ))
     except ClientError as e:
         print(f"Error getting payments by user {user_id}: {e}")
         return []
@@ -1467,23 +2467,7 @@ def build_update_expression_for_payment(update_data):
 def get_all_invoices():
     """Get all invoices from the database"""
     try:
-        invoices = []
-        
-        # Start with an initial scan
-        scan_kwargs = {
-            'TableName': INVOICES_TABLE
-        }
-        
-        response = dynamodb.scan(**scan_kwargs)
-        invoices.extend([deserialize_item_json_safe(item) for item in response.get('Items', [])])
-        
-        # Continue scanning if there are more items
-        while 'LastEvaluatedKey' in response:
-            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-            response = dynamodb.scan(**scan_kwargs)
-            invoices.extend([deserialize_item_json_safe(item) for item in response.get('Items', [])])
-        
-        return invoices
+        return list(parallel_scan(INVOICES_TABLE, deserialize_item_json_safe))
     except ClientError as e:
         print(f"Error getting all invoices: {e}")
         return []
@@ -1491,30 +2475,12 @@ def get_all_invoices():
 def get_active_invoices():
     """Get all active invoices (excluding cancelled ones) from the database"""
     try:
-        invoices = []
-        
-        # Start with an initial scan with filter expression
-        scan_kwargs = {
-            'TableName': INVOICES_TABLE,
-            'FilterExpression': 'attribute_not_exists(#status) OR #status <> :cancelled_status',
-            'ExpressionAttributeNames': {
-                '#status': 'status'
-            },
-            'ExpressionAttributeValues': {
-                ':cancelled_status': {'S': 'cancelled'}
-            }
-        }
-        
-        response = dynamodb.scan(**scan_kwargs)
-        invoices.extend([deserialize_item_json_safe(item) for item in response.get('Items', [])])
-        
-        # Continue scanning if there are more items
-        while 'LastEvaluatedKey' in response:
-            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-            response = dynamodb.scan(**scan_kwargs)
-            invoices.extend([deserialize_item_json_safe(item) for item in response.get('Items', [])])
-        
-        return invoices
+        return list(parallel_scan(
+            INVOICES_TABLE, deserialize_item_json_safe,
+            FilterExpression='attribute_not_exists(#status) OR #status <> :cancelled_status',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':cancelled_status': {'S': 'cancelled'}}
+        ))
     except ClientError as e:
         print(f"Error getting active invoices: {e}")
         return []
@@ -1523,8 +2489,9 @@ def get_invoices_by_date_range(start_date, end_date, limit=100):
     """
     Get active invoices within a date range using effectiveDate for analytics processing
     
-    This function filters invoices based on the effectiveDate field from analyticsData.operation_data
-    instead of createdAt, ensuring all date-related analytics operations use consistent date logic.
+    This function queries the effectiveDateKey GSI, which holds the effectiveDate from
+    analyticsData.operation_data as a sortable YYYY-MM-DD key (falling back to the createdAt
+    date when no effectiveDate is set), so only invoices inside the window are read.
     
     IMPORTANT: This function EXCLUDES cancelled invoices. For admin purposes where all invoices 
     (including cancelled ones) are needed, use get_all_invoices_by_date_range() instead.
@@ -1532,170 +2499,224 @@ def get_invoices_by_date_range(start_date, end_date, limit=100):
     Args:
         start_date: Start timestamp
         end_date: End timestamp  
-        limit: Maximum number of results to return
+        limit: Maximum number of results to return (None returns every invoice in the range)
         
     Returns:
-        list: Filtered active invoices sorted by effectiveDate (most recent first)
+        list: Filtered active invoices sorted by effectiveDate (most recent first), or an empty
+              list on error (use query_invoices_by_effective_date to detect incomplete reads)
     """
     try:
-        # Get all invoices first, then filter by effectiveDate from analyticsData
-        # This is necessary because effectiveDate is stored in a nested JSON field
-        result = dynamodb.scan(
-            TableName=INVOICES_TABLE,
-            Limit=limit * 2  # Get more to account for filtering
-        )
-        
-        all_invoices = [deserialize_item_json_safe(item) for item in result.get('Items', [])]
-        
-        # Convert start_date and end_date timestamps to DD/MM/YYYY format for comparison
-        start_date_formatted = datetime.fromtimestamp(start_date, ZoneInfo('Australia/Perth')).strftime('%d/%m/%Y')
-        end_date_formatted = datetime.fromtimestamp(end_date, ZoneInfo('Australia/Perth')).strftime('%d/%m/%Y')
-        
-        # Filter invoices by effectiveDate from analyticsData and exclude cancelled ones
-        filtered_invoices = []
-        for invoice in all_invoices:
-            # Skip cancelled invoices
-            if invoice.get('status') == 'cancelled':
-                continue
-                
-            analytics_data = invoice.get('analyticsData', {})
-            operation_data = analytics_data.get('operation_data', {})
-            effective_date = operation_data.get('effectiveDate', '')
-            
-            if effective_date:
-                try:
-                    # Validate and normalize effectiveDate to DD/MM/YYYY format
-                    normalized_effective_date = valid.DataValidator.validate_and_convert_date_to_analytics_format(
-                        effective_date, 'effectiveDate'
-                    )
-                    
-                    # Convert dates to comparable datetime objects
-                    effective_date_obj = datetime.strptime(normalized_effective_date, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    start_date_obj = datetime.strptime(start_date_formatted, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    end_date_obj = datetime.strptime(end_date_formatted, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    
-                    if start_date_obj <= effective_date_obj <= end_date_obj:
-                        filtered_invoices.append(invoice)
-                except (ValueError, valid.ValidationError) as e:
-                    # If effectiveDate format is invalid, log warning and skip this invoice
-                    print(f"Warning: Invalid effectiveDate format '{effective_date}' in invoice {invoice.get('invoiceId', 'unknown')}: {e}")
-                    continue
-            else:
-                # If no effectiveDate, fall back to createdAt for backward compatibility
-                created_at = invoice.get('createdAt', 0)
-                if start_date <= created_at <= end_date:
-                    filtered_invoices.append(invoice)
-        
-        # Sort by effectiveDate (most recent first) and limit results
-        def get_sort_key(invoice):
-            analytics_data = invoice.get('analyticsData', {})
-            operation_data = analytics_data.get('operation_data', {})
-            effective_date = operation_data.get('effectiveDate', '')
-            
-            if effective_date:
-                try:
-                    return datetime.strptime(effective_date, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                except ValueError:
-                    # Fall back to createdAt if effectiveDate is invalid
-                    return datetime.fromtimestamp(invoice.get('createdAt', 0), ZoneInfo('Australia/Perth'))
-            else:
-                # Fall back to createdAt if no effectiveDate
-                return datetime.fromtimestamp(invoice.get('createdAt', 0), ZoneInfo('Australia/Perth'))
-        
-        filtered_invoices.sort(key=get_sort_key, reverse=True)
-        
-        return filtered_invoices[:limit]
-        
-    except ClientError as e:
-        print(f"Error querying invoices by date range: {e}")
+        return list(query_invoices_by_effective_date(start_date, end_date, include_cancelled=False, limit=limit))
+    except ClientError:
         return []
 
 def get_all_invoices_by_date_range(start_date, end_date, limit=100):
     """
     Get ALL invoices (including cancelled ones) within a date range for admin purposes
     
-    This function filters invoices based on the effectiveDate field from analyticsData.operation_data
-    instead of createdAt, ensuring all date-related operations use consistent date logic.
-    Unlike get_invoices_by_date_range, this function includes cancelled invoices.
+    Uses the same effectiveDateKey GSI as get_invoices_by_date_range, but does not
+    filter out cancelled invoices.
     
     Args:
         start_date: Start timestamp
         end_date: End timestamp  
-        limit: Maximum number of results to return
+        limit: Maximum number of results to return (None returns every invoice in the range)
         
     Returns:
-        list: Filtered invoices including cancelled ones sorted by effectiveDate (most recent first)
+        list: Filtered invoices including cancelled ones sorted by effectiveDate (most recent first),
+              or an empty list on error
     """
     try:
-        # Get all invoices first, then filter by effectiveDate from analyticsData
-        # This is necessary because effectiveDate is stored in a nested JSON field
-        result = dynamodb.scan(
-            TableName=INVOICES_TABLE,
-            Limit=limit * 2  # Get more to account for filtering
-        )
+        return list(query_invoices_by_effective_date(start_date, end_date, include_cancelled=True, limit=limit))
+    except ClientError:
+        return []
+
+def query_invoices_by_effective_date(start_date, end_date, include_cancelled=False, limit=None):
+    """
+    Stream invoices whose effective date falls within a date range, most recent first
+    
+    The effectiveDateMonth-index GSI is partitioned by effectiveDateMonth (YYYY-MM) and sorted
+    by effectiveDateKey (YYYY-MM-DD). Each month in the window is queried in descending order
+    and every page is followed through LastEvaluatedKey, so the cost depends on the number of
+    invoices in the window rather than the size of the table.
+    
+    Args:
+        start_date: Start timestamp
+        end_date: End timestamp
+        include_cancelled: Include cancelled invoices when True
+        limit: Stop after yielding this many invoices (None for no limit)
         
-        all_invoices = [deserialize_item_json_safe(item) for item in result.get('Items', [])]
+    Yields:
+        dict: JSON-safe invoice records
         
-        # Convert start_date and end_date timestamps to DD/MM/YYYY format for comparison
-        start_date_formatted = datetime.fromtimestamp(start_date, ZoneInfo('Australia/Perth')).strftime('%d/%m/%Y')
-        end_date_formatted = datetime.fromtimestamp(end_date, ZoneInfo('Australia/Perth')).strftime('%d/%m/%Y')
+    Raises:
+        ClientError: If a page cannot be read, so callers never mistake a partial read for the full range
+    """
+    if limit is not None and limit <= 0:
+        return
+    
+    yielded = 0
+    try:
+        for query in plan_invoice_effective_date_queries(start_date, end_date, include_cancelled):
+            remaining = None if limit is None else limit - yielded
+            for invoice in iter_items('query', INVOICES_TABLE, deserialize_item_json_safe, max_items=remaining, **query):
+                yield invoice
+                yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+    except ClientError as e:
+        print(f"Error querying invoices by effective date range {start_date} to {end_date}: {e}")
+        raise
+
+def get_invoices_page(start_date, end_date, limit, position=None, include_cancelled=False):
+    """
+    Get one page of the invoices whose effective date falls within a date range, most recent first
+    
+    Args:
+        start_date: Start timestamp
+        end_date: End timestamp
+        limit: Maximum number of invoices in the page
+        position: Position returned with the previous page (None for the first page)
+        include_cancelled: Include cancelled invoices when True
         
-        # Filter invoices by effectiveDate from analyticsData (including cancelled ones)
-        filtered_invoices = []
-        for invoice in all_invoices:
-            # NOTE: Unlike get_invoices_by_date_range, we DO NOT skip cancelled invoices here
-            
-            analytics_data = invoice.get('analyticsData', {})
-            operation_data = analytics_data.get('operation_data', {})
-            effective_date = operation_data.get('effectiveDate', '')
-            
-            if effective_date:
-                try:
-                    # Validate and normalize effectiveDate to DD/MM/YYYY format
-                    normalized_effective_date = valid.DataValidator.validate_and_convert_date_to_analytics_format(
-                        effective_date, 'effectiveDate'
-                    )
-                    
-                    # Convert dates to comparable datetime objects
-                    effective_date_obj = datetime.strptime(normalized_effective_date, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    start_date_obj = datetime.strptime(start_date_formatted, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    end_date_obj = datetime.strptime(end_date_formatted, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                    
-                    if start_date_obj <= effective_date_obj <= end_date_obj:
-                        filtered_invoices.append(invoice)
-                except (ValueError, valid.ValidationError) as e:
-                    # If effectiveDate format is invalid, log warning and skip this invoice
-                    print(f"Warning: Invalid effectiveDate format '{effective_date}' in invoice {invoice.get('invoiceId', 'unknown')}: {e}")
-                    continue
-            else:
-                # If no effectiveDate, fall back to createdAt for backward compatibility
-                created_at = invoice.get('createdAt', 0)
-                if start_date <= created_at <= end_date:
-                    filtered_invoices.append(invoice)
-        
-        # Sort by effectiveDate (most recent first) and limit results
-        def get_sort_key(invoice):
-            analytics_data = invoice.get('analyticsData', {})
-            operation_data = analytics_data.get('operation_data', {})
-            effective_date = operation_data.get('effectiveDate', '')
-            
-            if effective_date:
-                try:
-                    return datetime.strptime(effective_date, '%d/%m/%Y').replace(tzinfo=ZoneInfo("Australia/Perth"))
-                except ValueError:
-                    # Fall back to createdAt if effectiveDate is invalid
-                    return datetime.fromtimestamp(invoice.get('createdAt', 0), ZoneInfo('Australia/Perth'))
-            else:
-                # Fall back to createdAt if no effectiveDate
-                return datetime.fromtimestamp(invoice.get('createdAt', 0), ZoneInfo('Australia/Perth'))
+    Returns:
+        tuple: (JSON-safe invoice records, position of the next page or None)
         
-        filtered_invoices.sort(key=get_sort_key, reverse=True)
+    Raises:
+        ClientError: If the invoices can't be read
+    """
+    queries = plan_invoice_effective_date_queries(start_date, end_date, include_cancelled)
+    try:
+        return query_page(
+            INVOICES_TABLE, queries, ('invoiceId', 'effectiveDateMonth', 'effectiveDateKey'),
+            limit, position, deserialize_item_json_safe
+        )
+    except ClientError as e:
+        print(f"Error getting invoices page for effective date range {start_date} to {end_date}: {e}")
+        raise
+
+def plan_invoice_effective_date_queries(start_date, end_date, include_cancelled=False):
+    """Plan the effectiveDateMonth-index queries covering a date range, latest month first"""
+    start_key = datetime.fromtimestamp(start_date, ZoneInfo('Australia/Perth')).strftime('%Y-%m-%d')
+    end_key = datetime.fromtimestamp(end_date, ZoneInfo('Australia/Perth')).strftime('%Y-%m-%d')
+    
+    queries = []
+    for month in reversed(_get_months_in_range(start_key, end_key)):
+        query = {
+            'IndexName': 'effectiveDateMonth-index',
+            'KeyConditionExpression': 'effectiveDateMonth = :month AND effectiveDateKey BETWEEN :start AND :end',
+            'ExpressionAttributeValues': {
+                ':month': {'S': month},
+                ':start': {'S': start_key},
+                ':end': {'S': end_key}
+            },
+            'ScanIndexForward': False
+        }
+        if not include_cancelled:
+            query['FilterExpression'] = 'attribute_not_exists(#status) OR #status <> :cancelled_status'
+            query['ExpressionAttributeNames'] = {'#status': 'status'}
+            query['ExpressionAttributeValues'][':cancelled_status'] = {'S': 'cancelled'}
+        queries.append(query)
+    return queries
+
+def _get_months_in_range(start_key, end_key):
+    """Get the YYYY-MM month keys covered by two YYYY-MM-DD date keys (inclusive)"""
+    year, month = int(start_key[:4]), int(start_key[5:7])
+    end_year, end_month = int(end_key[:4]), int(end_key[5:7])
+    
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+def get_invoice_effective_date_key(analytics_data, created_at=None):
+    """
+    Get the sortable YYYY-MM-DD effective date key for an invoice
+    
+    Uses analyticsData.operation_data.effectiveDate (DD/MM/YYYY) and falls back to the
+    createdAt timestamp when the effectiveDate is missing or invalid.
+    
+    Args:
+        analytics_data: Invoice analyticsData dict (may be empty)
+        created_at: Invoice createdAt timestamp (optional)
         
-        return filtered_invoices[:limit]
+    Returns:
+        str: Date key in YYYY-MM-DD format, or None if neither date is usable
+    """
+    operation_data = (analytics_data or {}).get('operation_data', {}) or {}
+    effective_date = operation_data.get('effectiveDate', '')
+    
+    if effective_date:
+        try:
+            normalized_effective_date = valid.DataValidator.validate_and_convert_date_to_analytics_format(
+                effective_date, 'effectiveDate'
+            )
+            return datetime.strptime(normalized_effective_date, '%d/%m/%Y').strftime('%Y-%m-%d')
+        except (ValueError, valid.ValidationError) as e:
+            print(f"Warning: Invalid effectiveDate format '{effective_date}', falling back to createdAt: {e}")
+    
+    if created_at:
+        try:
+            return datetime.fromtimestamp(int(created_at), ZoneInfo('Australia/Perth')).strftime('%Y-%m-%d')
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return None
+
+def build_invoice_effective_date_attributes(analytics_data, created_at=None):
+    """Build the effectiveDateKey/effectiveDateMonth attributes in DynamoDB format"""
+    date_key = get_invoice_effective_date_key(analytics_data, created_at)
+    if not date_key:
+        return {}
+    return {
+        'effectiveDateKey': {'S': date_key},
+        'effectiveDateMonth': {'S': date_key[:7]}
+    }
+
+def backfill_invoice_effective_date_keys():
+    """
+    Backfill effectiveDateKey/effectiveDateMonth on invoices created before the
+    effectiveDateMonth-index GSI existed
+    
+    Returns:
+        dict: Counts of scanned, updated and skipped invoices
+    """
+    result = {'scanned': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+    items = iter_items(
+        'scan', INVOICES_TABLE,
+        FilterExpression='attribute_not_exists(effectiveDateKey)',
+        ProjectionExpression='invoiceId, createdAt, analyticsData'
+    )
+    
+    for item in items:
+        result['scanned'] += 1
+        invoice = deserialize_item_json_safe(item)
+        attributes = build_invoice_effective_date_attributes(
+            invoice.get('analyticsData'), invoice.get('createdAt')
+        )
+        if not attributes:
+            result['skipped'] += 1
+            continue
         
-    except ClientError as e:
-        print(f"Error querying all invoices by date range: {e}")
-        return []
+        try:
+            dynamodb.update_item(
+                TableName=INVOICES_TABLE,
+                Key={'invoiceId': item['invoiceId']},
+                UpdateExpression='SET effectiveDateKey = :date_key, effectiveDateMonth = :date_month',
+                ExpressionAttributeValues={
+                    ':date_key': attributes['effectiveDateKey'],
+                    ':date_month': attributes['effectiveDateMonth']
+                }
+            )
+            result['updated'] += 1
+        except ClientError as e:
+            print(f"Error backfilling effective date key for invoice {invoice.get('invoiceId')}: {e}")
+            result['errors'] += 1
+    
+    print(f"Invoice effective date backfill complete: {result}")
+    return result
 
 def create_invoice_record(invoice_data):
     """Create a new invoice record in the database"""
@@ -1726,11 +2747,19 @@ def create_invoice_record(invoice_data):
         if 'analyticsData' in invoice_data and invoice_data['analyticsData']:
             item['analyticsData'] = convert_to_dynamodb_format(invoice_data['analyticsData'])
         
+        # Add the sortable effective date keys used by the effectiveDateMonth-index GSI
+        item.update(build_invoice_effective_date_attributes(
+            invoice_data.get('analyticsData'), invoice_data['createdAt']
+        ))
+        
         dynamodb.put_item(
             TableName=INVOICES_TABLE,
             Item=item
         )
         print(f"Invoice {invoice_data['invoiceId']} created successfully")
+        
+        if invoice_data.get('status') != 'cancelled':
+            sync_invoice_analytics(new_invoice=invoice_data)
         return True
     except ClientError as e:
         print(f"Error creating invoice: {e}")
@@ -1739,106 +2768,125 @@ def create_invoice_record(invoice_data):
 def get_invoice_by_reference(reference_number, reference_type):
     """Get invoice by reference number and type - returns the latest one if multiple exist"""
     try:
-        # Use a scan to find invoice by reference number and type
-        response = dynamodb.scan(
-            TableName=INVOICES_TABLE,
-            FilterExpression='referenceNumber = :ref AND referenceType = :type',
-            ExpressionAttributeValues={
-                ':ref': {'S': reference_number},
-                ':type': {'S': reference_type}
-            }
-        )
-        items = response.get('Items', [])
-        if items:
-            # If multiple invoices exist, return the latest one (highest createdAt)
-            if len(items) > 1:
-                # Sort by createdAt in descending order and take the first (latest)
-                items.sort(key=lambda x: int(x.get('createdAt', {}).get('N', '0')), reverse=True)
-                print(f"Found {len(items)} invoices for {reference_type} {reference_number}, returning the latest one")
-            return deserialize_item_json_safe(items[0])
-        return None
+        return next(iter_invoices_by_reference(reference_number, reference_type), None)
     except ClientError as e:
         print(f"Error getting invoice by reference {reference_number}: {e}")
         return None
 
 def has_active_invoices(reference_number, reference_type):
     """Check if there are any active (non-cancelled) invoices for a reference"""
-    try:
-        invoices = get_invoices_by_reference(reference_number, reference_type)
-        if not invoices:
-            return False
-        
-        # Check if any invoice is not cancelled
-        for invoice in invoices:
-            if invoice.get('status') != 'cancelled':
-                return True
-        
-        return False
-    except Exception as e:
-        print(f"Error checking for active invoices for {reference_type} {reference_number}: {e}")
-        return False
+    return get_active_invoice_by_reference(reference_number, reference_type) is not None
 
 def get_active_invoice_by_reference(reference_number, reference_type):
     """Get the latest active (non-cancelled) invoice by reference number and type"""
     try:
-        invoices = get_invoices_by_reference(reference_number, reference_type)
-        if not invoices:
-            return None
-        
-        # Filter out cancelled invoices and get the latest active one
-        active_invoices = [inv for inv in invoices if inv.get('status') != 'cancelled']
-        if not active_invoices:
-            return None
-            
-        # If multiple active invoices exist, return the latest one (highest createdAt)
-        if len(active_invoices) > 1:
-            active_invoices.sort(key=lambda x: x.get('createdAt', 0), reverse=True)
-            print(f"Found {len(active_invoices)} active invoices for {reference_type} {reference_number}, returning the latest one")
-        
-        return active_invoices[0]
+        for invoice in iter_invoices_by_reference(reference_number, reference_type):
+            if invoice.get('status') != 'cancelled':
+                return invoice
+        return None
     except Exception as e:
         print(f"Error getting active invoice by reference {reference_number} ({reference_type}): {e}")
         return None
 
-def update_invoice_analytics_data(invoice_id, analytics_data):
-    """Update analytics data for an existing invoice"""
+def update_invoice_analytics_data(invoice_id, analytics_data, created_at=None):
+    """Update analytics data for an existing invoice and keep its effective date keys in sync"""
     try:
-        dynamodb.update_item(
+        update_expression = 'SET analyticsData = :analytics_data'
+        expression_values = {
+            ':analytics_data': convert_to_dynamodb_format(analytics_data)
+        }
+        
+        date_attributes = build_invoice_effective_date_attributes(analytics_data, created_at)
+        if date_attributes:
+            update_expression += ', effectiveDateKey = :date_key, effectiveDateMonth = :date_month'
+            expression_values[':date_key'] = date_attributes['effectiveDateKey']
+            expression_values[':date_month'] = date_attributes['effectiveDateMonth']
+        
+        response = dynamodb.update_item(
             TableName=INVOICES_TABLE,
             Key={'invoiceId': {'S': invoice_id}},
-            UpdateExpression='SET analyticsData = :analytics_data',
-            ExpressionAttributeValues={
-                ':analytics_data': convert_to_dynamodb_format(analytics_data)
-            }
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues=expression_values,
+            ReturnValues='ALL_OLD'
         )
         print(f"Invoice {invoice_id} analytics data updated successfully")
+        
+        old_invoice = deserialize_item_json_safe(response.get('Attributes', {}))
+        if old_invoice and old_invoice.get('status') != 'cancelled':
+            new_invoice = dict(old_invoice, analyticsData=analytics_data)
+            sync_invoice_analytics(old_invoice=old_invoice, new_invoice=new_invoice)
         return True
     except ClientError as e:
         print(f"Error updating invoice analytics data for {invoice_id}: {e}")
         return False
 
 def get_invoices_by_reference(reference_number, reference_type):
-    """Get all invoices by reference number and type"""
+    """Get all invoices by reference number and type (latest first)"""
     try:
-        # Use a scan to find all invoices by reference number and type
-        response = dynamodb.scan(
-            TableName=INVOICES_TABLE,
-            FilterExpression='referenceNumber = :ref AND referenceType = :type',
-            ExpressionAttributeValues={
-                ':ref': {'S': reference_number},
-                ':type': {'S': reference_type}
-            }
-        )
-        items = response.get('Items', [])
-        if items:
-            # Sort by createdAt in descending order (latest first)
-            items.sort(key=lambda x: int(x.get('createdAt', {}).get('N', '0')), reverse=True)
-            return [deserialize_item_json_safe(item) for item in items]
-        return []
+        return list(iter_invoices_by_reference(reference_number, reference_type))
     except ClientError as e:
         print(f"Error getting invoices by reference {reference_number}: {e}")
         return []
 
+def iter_invoices_by_reference(reference_number, reference_type, page_size=None):
+    """
+    Stream the invoices of a reference number and type, latest first
+    
+    Pages through the referenceNumber-createdAt-index GSI newest first, so the cost
+    depends on the number of invoices of the reference rather than the size of the
+    table. While the index doesn't exist or is still being built (right after it is
+    added), the invoices are found with a filtered table scan instead.
+    
+    Args:
+        reference_number: Appointment or order ID the invoices were issued for
+        reference_type: 'appointment' or 'order'
+        page_size: Items evaluated per request
+        
+    Yields:
+        dict: JSON-safe invoice records
+        
+    Raises:
+        ClientError: If the invoices can't be read
+    """
+    expression_values = {
+        ':ref': {'S': reference_number},
+        ':type': {'S': reference_type}
+    }
+    invoices = iter_items(
+        'query', INVOICES_TABLE, deserialize_item_json_safe, page_size=page_size,
+        IndexName=INVOICE_REFERENCE_INDEX,
+        KeyConditionExpression='referenceNumber = :ref',
+        FilterExpression='referenceType = :type',
+        ExpressionAttributeValues=expression_values,
+        ScanIndexForward=False
+    )
+    try:
+        first_invoice = next(invoices, None)
+    except ClientError as e:
+        if not is_index_unavailable_error(e):
+            raise
+        print(f"Invoice reference index unavailable, scanning invoices for {reference_type} {reference_number}: {e}")
+        items = list(iter_items(
+            'scan', INVOICES_TABLE,
+            FilterExpression='referenceNumber = :ref AND referenceType = :type',
+            ExpressionAttributeValues=expression_values
+        ))
+        items.sort(key=lambda x: int(x.get('createdAt', {}).get('N', '0')), reverse=True)
+        for item in items:
+            yield deserialize_item_json_safe(item)
+        return
+    
+    if first_invoice is not None:
+        yield first_invoice
+        yield from invoices
+
+def is_index_unavailable_error(error):
+    """Check whether a query failed because its GSI doesn't exist yet or is still backfilling"""
+    return (
+        error.response.get('Error', {}).get('Code') == 'ValidationException'
+        and 'index' in error.response.get('Error', {}).get('Message', '').lower()
+    )
+
 def get_invoice_by_id(invoice_id):
     """Get an invoice by invoice ID"""
     try:
@@ -1858,7 +2906,7 @@ def cancel_invoice(invoice_id):
     """Cancel an invoice by updating its status to 'cancelled' instead of deleting"""
     try:
         # Update invoice status to 'cancelled' and sync metadata paymentStatus
-        dynamodb.update_item(
+        response = dynamodb.update_item(
             TableName=INVOICES_TABLE,
             Key={'invoiceId': {'S': invoice_id}},
             UpdateExpression='SET #status = :status, cancelledAt = :cancelled_at, #metadata.#paymentStatus = :payment_status',
@@ -1871,9 +2919,14 @@ def cancel_invoice(invoice_id):
                 ':status': {'S': 'cancelled'},
                 ':cancelled_at': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))},
                 ':payment_status': {'S': 'cancelled'}
-            }
+            },
+            ReturnValues='ALL_OLD'
         )
         print(f"Invoice {invoice_id} status updated to cancelled successfully")
+        
+        old_invoice = deserialize_item_json_safe(response.get('Attributes', {}))
+        if old_invoice and old_invoice.get('status') != 'cancelled':
+            sync_invoice_analytics(old_invoice=old_invoice)
         return True
     except ClientError as e:
         print(f"Error cancelling invoice {invoice_id}: {e}")
@@ -1892,7 +2945,7 @@ def reactivate_invoice(invoice_id):
     """Reactivate a cancelled invoice by updating its status back to 'generated'"""
     try:
         # Update invoice status back to 'generated' and sync metadata paymentStatus
-        dynamodb.update_item(
+        response = dynamodb.update_item(
             TableName=INVOICES_TABLE,
             Key={'invoiceId': {'S': invoice_id}},
             UpdateExpression='SET #status = :status, #metadata.#paymentStatus = :payment_status REMOVE cancelledAt',
@@ -1904,31 +2957,493 @@ def reactivate_invoice(invoice_id):
             ExpressionAttributeValues={
                 ':status': {'S': 'generated'},
                 ':payment_status': {'S': 'completed'}
-            }
+            },
+            ReturnValues='ALL_OLD'
         )
         print(f"Invoice {invoice_id} reactivated successfully")
+        
+        old_invoice = deserialize_item_json_safe(response.get('Attributes', {}))
+        if old_invoice and old_invoice.get('status') == 'cancelled':
+            sync_invoice_analytics(new_invoice=dict(old_invoice, status='generated'))
         return True
     except ClientError as e:
         print(f"Error reactivating invoice {invoice_id}: {e}")
         return False
 
+def sync_invoice_analytics(old_invoice=None, new_invoice=None):
+    """
+    Apply an invoice change to the analytics rollups and invalidate cached analytics results
+    
+    Args:
+        old_invoice: Active invoice state being removed from analytics (None if newly active)
+        new_invoice: Active invoice state being added to analytics (None if no longer active)
+    """
+    if ANALYTICS_ROLLUPS_TABLE:
+        import analytics_rollups
+        try:
+            analytics_rollups.apply_invoice_change(old_invoice, new_invoice)
+        except Exception as e:
+            # Never fail the invoice write: stop trusting the rollups until they are rebuilt
+            print(f"Error updating analytics rollups: {e}")
+            analytics_rollups.mark_stale()
+    
+    if ANALYTICS_CACHE_TABLE:
+        try:
+            import analytics_cache
+            for invoice in (old_invoice, new_invoice):
+                if invoice and not analytics_cache.invalidate_invoice(invoice):
+                    print(f"Failed to invalidate cached analytics for invoice {invoice.get('invoiceId')}, "
+                          f"stale results expire with their TTL")
+        except Exception as e:
+            print(f"Error invalidating analytics cache: {e}")
 
-# ------------------  Backup/Restore Utility Functions ------------------
 
-def scan_all_items(table_name):
-    """Scan all items from a DynamoDB table"""
+# ------------------  Analytics Rollups Table Functions ------------------
+
+def get_analytics_rollups(period_keys, consistent_read=False):
+    """
+    Get analytics rollup records by period key
+    
+    Args:
+        period_keys: List of period keys (e.g. 'DAY#2025-01-31', 'WEEK#2025-W05', 'MONTH#2025-01')
+        consistent_read: Use strongly consistent reads (needed for read-modify-write updates)
+        
+    Returns:
+        dict: Rollup records keyed by periodKey (missing periods are omitted), or None on error
+    """
     try:
-        items = []
-        response = dynamodb.scan(TableName=table_name)
-        items.extend(response.get('Items', []))
+        keys = [{'periodKey': {'S': period_key}} for period_key in period_keys]
+        items = batch_get_items(ANALYTICS_ROLLUPS_TABLE, keys, consistent_read=consistent_read)
+        records = {}
+        for item in items:
+            record = deserialize_item_json_safe(item)
+            records[record['periodKey']] = record
+        return records
+    except Exception as e:
+        print(f"Error getting analytics rollups: {e}")
+        return None
+
+def build_analytics_rollup_item(period_key, period_type, data, version=1):
+    """
+    Build an analytics rollup record in DynamoDB format
+    
+    A period whose data is None is stored as an overflow record: its counters were too
+    large for a single item, so analytics read the period from its days instead.
+    """
+    item = {
+        'periodKey': {'S': period_key},
+        'periodType': {'S': period_type},
+        'version': {'N': str(version)},
+        'updatedAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
+    }
+    if data is None:
+        item['overflow'] = {'BOOL': True}
+    else:
+        item['data'] = {'S': data}
+    return item
+
+def write_analytics_rollups(rollups, marker_key, marker_version):
+    """
+    Write the analytics rollup records of one invoice change in a single transaction
+    
+    Every record is written with an optimistic version check, and the transaction also
+    checks that the rebuild marker is still at the version read before the update, so
+    either every period of the change is updated or none is, and a change never lands
+    across a rebuild.
+    
+    Args:
+        rollups: List of (period_key, period_type, data, expected_version) tuples, where
+                 expected_version is None if the record did not exist
+        marker_key: Rebuild marker period key
+        marker_version: Rebuild marker version read before the update
         
-        while 'LastEvaluatedKey' in response:
-            response = dynamodb.scan(
-                TableName=table_name,
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
+    Returns:
+        bool: True if written, False if a record or the marker changed concurrently or the write failed
+    """
+    transact_items = [{
+        'ConditionCheck': {
+            'TableName': ANALYTICS_ROLLUPS_TABLE,
+            'Key': {'periodKey': {'S': marker_key}},
+            'ConditionExpression': '#version = :expected_version',
+            'ExpressionAttributeNames': {'#version': 'version'},
+            'ExpressionAttributeValues': {':expected_version': {'N': str(marker_version)}}
+        }
+    }]
+    for period_key, period_type, data, expected_version in rollups:
+        put = {
+            'TableName': ANALYTICS_ROLLUPS_TABLE,
+            'Item': build_analytics_rollup_item(period_key, period_type, data, (expected_version or 0) + 1)
+        }
+        if expected_version is None:
+            put['ConditionExpression'] = 'attribute_not_exists(periodKey)'
+        else:
+            put['ConditionExpression'] = '#version = :expected_version'
+            put['ExpressionAttributeNames'] = {'#version': 'version'}
+            put['ExpressionAttributeValues'] = {':expected_version': {'N': str(expected_version)}}
+        transact_items.append({'Put': put})
+    
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TransactionCanceledException':
+            print(f"Analytics rollups {[rollup[0] for rollup in rollups]} changed concurrently, retrying")
+        else:
+            print(f"Error writing analytics rollups: {e}")
+        return False
+
+def update_analytics_rollups_marker(marker_key, state=None, expected_version=None):
+    """
+    Increment the version of the analytics rollups rebuild marker, optionally setting its state
+    
+    Every marker change increments its version, which fails the transaction of any
+    rollup update that read the marker before the change.
+    
+    Args:
+        marker_key: Rebuild marker period key
+        state: New marker state (None keeps the current state)
+        expected_version: Only update if the marker is still at this version (None for any)
         
+    Returns:
+        int: New marker version, or None if the marker changed concurrently or the update failed
+    """
+    update_expression = 'SET periodType = :period_type, updatedAt = :updated_at'
+    names = {'#version': 'version'}
+    values = {
+        ':one': {'N': '1'},
+        ':period_type': {'S': 'META'},
+        ':updated_at': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
+    }
+    if state:
+        update_expression += ', #state = :state'
+        names['#state'] = 'state'
+        values[':state'] = {'S': state}
+    
+    update_params = {
+        'TableName': ANALYTICS_ROLLUPS_TABLE,
+        'Key': {'periodKey': {'S': marker_key}},
+        'UpdateExpression': update_expression + ' ADD #version :one',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'UPDATED_NEW'
+    }
+    if expected_version is not None:
+        update_params['ConditionExpression'] = '#version = :expected_version'
+        values[':expected_version'] = {'N': str(expected_version)}
+    
+    try:
+        response = dynamodb.update_item(**update_params)
+        return int(response['Attributes']['version']['N'])
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Analytics rollups marker {marker_key} changed concurrently")
+        else:
+            print(f"Error updating analytics rollups marker {marker_key}: {e}")
+        return None
+
+def clear_analytics_rollups(keep_keys=()):
+    """
+    Delete every analytics rollup record (used before a full rebuild)
+    
+    Args:
+        keep_keys: Period keys to keep (e.g. the rebuild marker)
+    """
+    keys = [
+        key for key in scan_table_keys_only(ANALYTICS_ROLLUPS_TABLE, ['periodKey'])
+        if key['periodKey']['S'] not in keep_keys
+    ]
+    batch_delete_items(ANALYTICS_ROLLUPS_TABLE, keys)
+    print(f"Deleted {len(keys)} analytics rollup records")
+    return len(keys)
+
+# ------------------  Analytics Cache Table Functions ------------------
+
+def get_analytics_cache_records(cache_keys):
+    """
+    Get analytics cache records (cached results and generation counters) by cache key
+    
+    Returns:
+        dict: Records keyed by cacheKey (missing keys are omitted), or None on error
+    """
+    try:
+        keys = [{'cacheKey': {'S': cache_key}} for cache_key in cache_keys]
+        records = {}
+        for item in batch_get_items(ANALYTICS_CACHE_TABLE, keys):
+            record = deserialize_item_json_safe(item)
+            records[record['cacheKey']] = record
+        return records
+    except Exception as e:
+        print(f"Error getting analytics cache records: {e}")
+        return None
+
+def put_analytics_cache_result(cache_key, result_data, generations, expires_at=None):
+    """
+    Store a cached analytics result
+    
+    Args:
+        cache_key: Result cache key
+        result_data: Compressed serialized result (bytes)
+        generations: Generation counters the result was computed at (JSON string)
+        expires_at: Unix timestamp after which DynamoDB TTL removes the entry (None keeps it)
+    """
+    item = {
+        'cacheKey': {'S': cache_key},
+        'result': {'B': result_data},
+        'generations': {'S': generations},
+        'createdAt': {'N': str(int(time.time()))}
+    }
+    if expires_at:
+        item['ttl'] = {'N': str(int(expires_at))}
+    
+    try:
+        dynamodb.put_item(TableName=ANALYTICS_CACHE_TABLE, Item=item)
+        return True
+    except ClientError as e:
+        print(f"Error storing analytics cache result {cache_key}: {e}")
+        return False
+
+def increment_analytics_cache_generation(generation_key):
+    """Increment a cache generation counter, invalidating every cached result that depends on it"""
+    try:
+        dynamodb.update_item(
+            TableName=ANALYTICS_CACHE_TABLE,
+            Key={'cacheKey': {'S': generation_key}},
+            UpdateExpression='ADD #generation :one',
+            ExpressionAttributeNames={'#generation': 'generation'},
+            ExpressionAttributeValues={':one': {'N': '1'}}
+        )
+        return True
+    except ClientError as e:
+        print(f"Error incrementing analytics cache generation {generation_key}: {e}")
+        return False
+
+# ------------------  Availability Index Table Functions ------------------
+
+def write_appointment_availability(appointment_write, index_records, marker_date, marker_version, fence_rebuild=False):
+    """
+    Write an appointment together with its availability index records in one transaction
+    
+    Args:
+        appointment_write: TransactWriteItems entry writing the appointment ({'Put': ...} or {'Update': ...})
+        index_records: List of (date, scheduled_slots, expected_version) tuples, where
+                       expected_version is None if the record did not exist
+        marker_date: Rebuild marker key of the index
+        marker_version: Rebuild marker version read before the write (None if there is no marker)
+        fence_rebuild: Increment the marker version instead of only checking it (a rebuild is running)
+        
+    Returns:
+        bool: True if written, False if the appointment, a record or the marker changed
+              concurrently or the write failed (nothing is written)
+    """
+    marker_key = {'date': {'S': marker_date}}
+    if marker_version is None:
+        marker_entry = {'ConditionCheck': {
+            'TableName': AVAILABILITY_INDEX_TABLE,
+            'Key': marker_key,
+            'ConditionExpression': 'attribute_not_exists(#date)',
+            'ExpressionAttributeNames': {'#date': 'date'}
+        }}
+    else:
+        marker_entry = {'ConditionCheck': {
+            'TableName': AVAILABILITY_INDEX_TABLE,
+            'Key': marker_key,
+            'ConditionExpression': '#version = :expected_version',
+            'ExpressionAttributeNames': {'#version': 'version'},
+            'ExpressionAttributeValues': {':expected_version': {'N': str(marker_version)}}
+        }}
+        if fence_rebuild:
+            marker_entry = {'Update': dict(
+                marker_entry['ConditionCheck'],
+                UpdateExpression='ADD #version :one',
+                ExpressionAttributeValues={':expected_version': {'N': str(marker_version)}, ':one': {'N': '1'}}
+            )}
+    
+    transact_items = [appointment_write, marker_entry]
+    for date, scheduled_slots, expected_version in index_records:
+        put = {
+            'TableName': AVAILABILITY_INDEX_TABLE,
+            'Item': build_availability_index_item(date, scheduled_slots, (expected_version or 0) + 1)
+        }
+        if expected_version is None:
+            put['ConditionExpression'] = 'attribute_not_exists(#date)'
+            put['ExpressionAttributeNames'] = {'#date': 'date'}
+        else:
+            put['ConditionExpression'] = '#version = :expected_version'
+            put['ExpressionAttributeNames'] = {'#version': 'version'}
+            put['ExpressionAttributeValues'] = {':expected_version': {'N': str(expected_version)}}
+        transact_items.append({'Put': put})
+    
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TransactionCanceledException':
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            print(f"Appointment availability transaction cancelled ({reasons}), retrying")
+        else:
+            print(f"Error writing appointment with its availability index records: {e}")
+        return False
+
+def get_availability_records(dates, marker_date=None):
+    """
+    Get the unavailable slots and availability index records of several dates in one BatchGetItem
+    
+    Args:
+        dates: List of dates in YYYY-MM-DD format
+        marker_date: Optional extra availability index key to read (e.g. the rebuild marker)
+        
+    Returns:
+        tuple: (unavailable slots records, availability index records), each keyed by date,
+               or None on error
+    """
+    try:
+        date_keys = [{'date': {'S': date}} for date in dict.fromkeys(dates)]
+        index_keys = date_keys + ([{'date': {'S': marker_date}}] if marker_date else [])
+        results = batch_get_table_items({UNAVAILABLE_SLOTS_TABLE: date_keys, AVAILABILITY_INDEX_TABLE: index_keys})
+        
+        unavailable_records = [deserialize_item_json_safe(item) for item in results[UNAVAILABLE_SLOTS_TABLE]]
+        index_records = [deserialize_item_json_safe(item) for item in results[AVAILABILITY_INDEX_TABLE]]
+        return (
+            {record['date']: record for record in unavailable_records},
+            {record['date']: record for record in index_records}
+        )
+    except Exception as e:
+        print(f"Error getting availability records for {len(dates)} dates: {e}")
+        return None
+
+def get_availability_index_records(dates, consistent_read=False):
+    """
+    Get availability index records by date
+    
+    Args:
+        dates: List of dates in YYYY-MM-DD format
+        consistent_read: Use strongly consistent reads (needed for read-modify-write updates)
+        
+    Returns:
+        dict: Index records keyed by date (missing dates are omitted), or None on error
+    """
+    try:
+        keys = [{'date': {'S': date}} for date in dict.fromkeys(dates)]
+        items = batch_get_items(AVAILABILITY_INDEX_TABLE, keys, consistent_read=consistent_read)
+        records = [deserialize_item_json_safe(item) for item in items]
+        return {record['date']: record for record in records}
+    except Exception as e:
+        print(f"Error getting availability index records: {e}")
+        return None
+
+def build_availability_index_item(date, scheduled_slots, version=1):
+    """Build an availability index record in DynamoDB format"""
+    return {
+        'date': {'S': date},
+        'scheduledSlots': convert_to_dynamodb_format(scheduled_slots),
+        'version': {'N': str(version)},
+        'updatedAt': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))}
+    }
+
+def update_availability_index_marker(marker_date, state, expected_version=None):
+    """
+    Set the state of the availability index rebuild marker, incrementing its version
+    
+    Every marker change increments its version, which fails the transaction of any
+    appointment write that read the marker before the change.
+    
+    Args:
+        marker_date: Rebuild marker key
+        state: New marker state
+        expected_version: Only update if the marker is still at this version (None for any)
+        
+    Returns:
+        int: New marker version, or None if the marker changed concurrently or the update failed
+    """
+    update_params = {
+        'TableName': AVAILABILITY_INDEX_TABLE,
+        'Key': {'date': {'S': marker_date}},
+        'UpdateExpression': 'SET #state = :state, scheduledSlots = :no_slots, updatedAt = :updated_at ADD #version :one',
+        'ExpressionAttributeNames': {'#state': 'state', '#version': 'version'},
+        'ExpressionAttributeValues': {
+            ':state': {'S': state},
+            ':no_slots': {'L': []},
+            ':updated_at': {'N': str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))},
+            ':one': {'N': '1'}
+        },
+        'ReturnValues': 'UPDATED_NEW'
+    }
+    if expected_version is not None:
+        update_params['ConditionExpression'] = '#version = :expected_version'
+        update_params['ExpressionAttributeValues'][':expected_version'] = {'N': str(expected_version)}
+    
+    try:
+        response = dynamodb.update_item(**update_params)
+        return int(response['Attributes']['version']['N'])
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Availability index marker {marker_date} changed concurrently")
+        else:
+            print(f"Error updating availability index marker {marker_date}: {e}")
+        return None
+
+def clear_availability_index(keep_dates=()):
+    """
+    Delete every availability index record (used before a full rebuild)
+    
+    Args:
+        keep_dates: Record keys to keep (e.g. the rebuild marker)
+    """
+    keys = [
+        key for key in scan_table_keys_only(AVAILABILITY_INDEX_TABLE, ['date'])
+        if key['date']['S'] not in keep_dates
+    ]
+    batch_delete_items(AVAILABILITY_INDEX_TABLE, keys)
+    print(f"Deleted {len(keys)} availability index records")
+    return len(keys)
+
+# ------------------  Cache Versions Table Functions ------------------
+
+def get_cache_versions(cache_names):
+    """
+    Get the version counters of in-memory caches
+    
+    Args:
+        cache_names: List of cache names
+        
+    Returns:
+        dict: Versions keyed by cache name (0 if never incremented), or None on error
+    """
+    try:
+        keys = [{'cacheName': {'S': cache_name}} for cache_name in cache_names]
+        versions = {cache_name: 0 for cache_name in cache_names}
+        for item in batch_get_items(CACHE_VERSIONS_TABLE, keys):
+            record = deserialize_item_json_safe(item)
+            versions[record['cacheName']] = int(record.get('version', 0))
+        return versions
+    except Exception as e:
+        print(f"Error getting cache versions: {e}")
+        return None
+
+def increment_cache_version(cache_name):
+    """Increment a cache version counter, invalidating the cache in every container"""
+    try:
+        dynamodb.update_item(
+            TableName=CACHE_VERSIONS_TABLE,
+            Key={'cacheName': {'S': cache_name}},
+            UpdateExpression='ADD #version :one SET updatedAt = :now',
+            ExpressionAttributeNames={'#version': 'version'},
+            ExpressionAttributeValues={
+                ':one': {'N': '1'},
+                ':now': {'N': str(int(time.time()))}
+            }
+        )
+        return True
+    except ClientError as e:
+        print(f"Error incrementing cache version {cache_name}: {e}")
+        return False
+
+# ------------------  Backup/Restore Utility Functions ------------------
+
+def scan_all_items(table_name, total_segments=None):
+    """Scan all items from a DynamoDB table (as parallel segments, see parallel_scan)"""
+    try:
+        items = list(parallel_scan(table_name, total_segments=total_segments))
         print(f"Scanned {len(items)} items from {table_name}")
         return items
     except ClientError as e:
@@ -1944,31 +3459,22 @@ def get_table_key_schema(table_name):
         print(f"Error getting key schema for {table_name}: {e}")
         raise
 
-def scan_table_keys_only(table_name, key_names):
+def scan_table_keys_only(table_name, key_names, total_segments=None):
     """Scan table and return only the key attributes"""
     try:
-        items = []
-        projection_expression = ', '.join(key_names)
-        
-        response = dynamodb.scan(
-            TableName=table_name,
-            ProjectionExpression=projection_expression
-        )
-        items.extend(response.get('Items', []))
-        
-        while 'LastEvaluatedKey' in response:
-            response = dynamodb.scan(
-                TableName=table_name,
-                ProjectionExpression=projection_expression,
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
-        
-        return items
+        return list(parallel_scan(table_name, **build_key_projection(key_names), total_segments=total_segments))
     except ClientError as e:
         print(f"Error scanning keys from {table_name}: {e}")
         raise
 
+def build_key_projection(key_names):
+    """Build scan parameters projecting only the given key attributes (names may be reserved words)"""
+    names = {f'#k{index}': key_name for index, key_name in enumerate(key_names)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+
 def delete_item(table_name, key):
     """Delete an item from DynamoDB table"""
     try:
@@ -1979,72 +3485,185 @@ def delete_item(table_name, key):
         raise
 
 def batch_write_items(table_name, items):
-    """Write items to DynamoDB table in batch"""
+    """
+    Write items to DynamoDB table in batch
+    
+    Items are put in chunks of 25 and unprocessed items are retried with
+    exponential backoff (see batch_put_items).
+    
+    Raises:
+        Exception: If a chunk fails or still has unprocessed items after the retries
+    """
     try:
-        request_items = {
-            table_name: [
-                {'PutRequest': {'Item': item}} for item in items
-            ]
-        }
+        return batch_put_items(table_name, items)
+    except Exception as e:
+        print(f"Error batch writing items to {table_name}: {e}")
+        raise
+
+def batch_get_items(table_name, keys, projection_expression=None, expression_names=None, consistent_read=False):
+    """
+    Get items by primary key using BatchGetItem
+    
+    Keys are requested in chunks of 100 and unprocessed keys are retried with
+    exponential backoff. Items are returned in DynamoDB format, in no particular order.
+    
+    Args:
+        table_name: DynamoDB table name
+        keys: List of primary keys in DynamoDB format
+        projection_expression: Optional projection expression
+        expression_names: Optional expression attribute names for the projection
+        consistent_read: Use strongly consistent reads
         
-        response = dynamodb.batch_write_item(RequestItems=request_items)
+    Returns:
+        list: Items found (missing keys are omitted)
+    """
+    table_options = {'ConsistentRead': consistent_read}
+    if projection_expression:
+        table_options['ProjectionExpression'] = projection_expression
+    if expression_names:
+        table_options['ExpressionAttributeNames'] = expression_names
+    return batch_get_table_items({table_name: keys}, {table_name: table_options})[table_name]
+
+def get_items_by_ids(table_name, key_name, ids, deserialize=None,
+                     projection_expression=None, expression_names=None):
+    """
+    Get items keyed by a single string attribute using BatchGetItem
+    
+    Args:
+        table_name: DynamoDB table name
+        key_name: Name of the table's (string) partition key
+        ids: List of key values (duplicates and empty values are ignored)
+        deserialize: Function converting each item from DynamoDB format (default: deserialize_item_json_safe)
+        projection_expression: Optional projection expression (must include the key)
+        expression_names: Optional expression attribute names for the projection
         
-        # Handle unprocessed items
-        unprocessed = response.get('UnprocessedItems', {})
-        while unprocessed:
-            response = dynamodb.batch_write_item(RequestItems=unprocessed)
-            unprocessed = response.get('UnprocessedItems', {})
+    Returns:
+        dict: Deserialized items keyed by key value (unknown keys are omitted), or {} on error
+    """
+    unique_ids = [value for value in dict.fromkeys(ids) if value]
+    if not unique_ids:
+        return {}
+    deserialize = deserialize or deserialize_item_json_safe
+    try:
+        items = batch_get_items(
+            table_name,
+            [{key_name: {'S': value}} for value in unique_ids],
+            projection_expression=projection_expression,
+            expression_names=expression_names
+        )
+        return {item[key_name]['S']: deserialize(item) for item in items}
+    except Exception as e:
+        print(f"Error batch getting items from {table_name}: {e}")
+        return {}
+
+def batch_get_table_items(table_keys, table_options=None):
+    """
+    Get items from several tables in the same BatchGetItem requests
+    
+    Args:
+        table_keys: Dict of table name to a list of primary keys in DynamoDB format
+        table_options: Optional dict of table name to extra request options
+                      (ConsistentRead, ProjectionExpression, ExpressionAttributeNames)
         
-        return True
-    except ClientError as e:
-        print(f"Error batch writing items to {table_name}: {e}")
-        raise
+    Returns:
+        dict: Table name to the list of items found, in DynamoDB format
+    """
+    table_options = table_options or {}
+    results = {table_name: [] for table_name in table_keys}
+    pending = [(table_name, key) for table_name, keys in table_keys.items() for key in keys]
+    
+    for start in range(0, len(pending), BATCH_GET_MAX_KEYS):
+        request_items = {}
+        for table_name, key in pending[start:start + BATCH_GET_MAX_KEYS]:
+            table_request = request_items.setdefault(table_name, dict(table_options.get(table_name, {}), Keys=[]))
+            table_request['Keys'].append(key)
+        
+        attempt = 0
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for table_name, items in response.get('Responses', {}).items():
+                results[table_name].extend(items)
+            request_items = response.get('UnprocessedKeys', {})
+            if request_items:
+                attempt += 1
+                if attempt > BATCH_MAX_RETRIES:
+                    raise Exception(f"BatchGetItem left unprocessed keys after {BATCH_MAX_RETRIES} retries")
+                time.sleep(min(0.05 * (2 ** attempt), 2))
+    return results
+
+def batch_delete_items(table_name, keys):
+    """Delete items by primary key using BatchWriteItem in chunks of 25"""
+    for start in range(0, len(keys), BATCH_WRITE_MAX_ITEMS):
+        batch_write_requests(table_name, [
+            {'DeleteRequest': {'Key': key}} for key in keys[start:start + BATCH_WRITE_MAX_ITEMS]
+        ])
+    return True
+
+def batch_put_items(table_name, items):
+    """Put items using BatchWriteItem in chunks of 25"""
+    for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+        batch_write_requests(table_name, [
+            {'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_MAX_ITEMS]
+        ])
+    return True
+
+def batch_write_requests(table_name, write_requests):
+    """
+    Send up to 25 write requests with BatchWriteItem, retrying unprocessed items
+    with exponential backoff
+    """
+    if _send_batch_write(table_name, write_requests):
+        raise Exception(f"BatchWriteItem on {table_name} left unprocessed items after {BATCH_MAX_RETRIES} retries")
+    return True
+
+def batch_put_items_with_failures(table_name, items):
+    """
+    Put items using BatchWriteItem in chunks of 25, reporting the items that were not written
+    
+    Unlike batch_put_items, a chunk that fails or keeps unprocessed items after
+    the retries doesn't stop the remaining chunks.
+    
+    Returns:
+        list: Items that could not be written (empty if all were written)
+    """
+    failed_items = []
+    for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+        chunk = items[start:start + BATCH_WRITE_MAX_ITEMS]
+        try:
+            unprocessed = _send_batch_write(table_name, [{'PutRequest': {'Item': item}} for item in chunk])
+            failed_items.extend(request['PutRequest']['Item'] for request in unprocessed)
+        except ClientError as e:
+            print(f"Error writing batch of {len(chunk)} items to {table_name}: {e}")
+            failed_items.extend(chunk)
+    return failed_items
+
+def _send_batch_write(table_name, write_requests):
+    """Send write requests with BatchWriteItem and return those still unprocessed after the retries"""
+    request_items = {table_name: write_requests}
+    attempt = 0
+    while request_items:
+        response = dynamodb.batch_write_item(RequestItems=request_items)
+        request_items = response.get('UnprocessedItems', {})
+        if request_items:
+            attempt += 1
+            if attempt > BATCH_MAX_RETRIES:
+                return request_items[table_name]
+            time.sleep(min(0.05 * (2 ** attempt), 2))
+    return []
 
 # -------------------------------------------------------------
 
 def deserialize_item(item):
-    return {k: deserializer.deserialize(v) for k, v in item.items()} if item else None
+    """Deserialize DynamoDB item keeping numbers as Decimal objects"""
+    return codec.deserialize_item(item, keep_decimals=True)
 
 def deserialize_item_json_safe(item):
-    """Deserialize DynamoDB item and convert Decimal objects to JSON-safe types"""
-    if not item:
-        return None
-    
-    deserialized = {k: deserializer.deserialize(v) for k, v in item.items()}
-    
-    # Convert Decimal objects to int or float for JSON serialization
-    def convert_decimals(obj):
-        if isinstance(obj, Decimal):
-            # Convert to int if it's a whole number, otherwise float
-            if obj % 1 == 0:
-                return int(obj)
-            else:
-                return float(obj)
-        elif isinstance(obj, dict):
-            return {k: convert_decimals(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_decimals(item) for item in obj]
-        else:
-            return obj
-    
-    return convert_decimals(deserialized)
+    """Deserialize DynamoDB item with numbers converted to JSON-safe int or float values"""
+    return codec.deserialize_item(item)
 
 def convert_to_dynamodb_format(obj):
     """Convert Python objects to DynamoDB format"""
-    if isinstance(obj, str):
-        return {'S': obj}
-    elif isinstance(obj, bool):  # Check bool before int/float since bool is a subclass of int
-        return {'BOOL': obj}
-    elif isinstance(obj, int):
-        return {'N': str(obj)}
-    elif isinstance(obj, float):
-        return {'N': str(obj)}
-    elif isinstance(obj, dict):
-        return {'M': {k: convert_to_dynamodb_format(v) for k, v in obj.items()}}
-    elif isinstance(obj, list):
-        return {'L': [convert_to_dynamodb_format(item) for item in obj]}
-    else:
-        return {'S': str(obj)}
+    return codec.serialize_value(obj)
 
 def is_dynamodb_format(obj):
     """Check if an object is already in DynamoDB format"""
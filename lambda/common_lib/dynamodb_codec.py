@@ -0,0 +1,149 @@
+"""
+DynamoDB Item Codec
+
+This module converts between the DynamoDB wire format ({'S': ...}, {'N': ...},
+{'M': {...}}, ...) and Python values in a single iterative pass, without
+recursion, so deeply nested records such as invoice analyticsData are
+converted once instead of being walked by boto3's TypeDeserializer and then
+again by a Decimal conversion pass.
+
+Numbers become int when they are whole and float otherwise, matching what the
+API responses serialize, unless Decimals are explicitly kept. Sets and binary
+values are returned as boto3 does (set / Binary).
+"""
+from decimal import Decimal
+
+from boto3.dynamodb.types import Binary, DYNAMODB_CONTEXT
+
+
+def deserialize_item(item, keep_decimals=False):
+    """
+    Convert a DynamoDB wire-format item to Python values
+
+    Args:
+        item: Item attributes in DynamoDB format
+        keep_decimals: Return numbers as Decimal instead of int/float
+
+    Returns:
+        dict: Deserialized item, or None for an empty item
+    """
+    if not item:
+        return None
+    result = {}
+    _decode(result, item.items(), _to_decimal if keep_decimals else _to_json_number)
+    return result
+
+
+def deserialize_value(value, keep_decimals=False):
+    """Convert a single DynamoDB wire-format value to a Python value (see deserialize_item)"""
+    holder = [None]
+    _decode(holder, ((0, value),), _to_decimal if keep_decimals else _to_json_number)
+    return holder[0]
+
+
+def serialize_value(value):
+    """
+    Convert a Python value to DynamoDB wire format
+
+    Strings, booleans, ints, floats, dicts and lists map to S, BOOL, N, M and L;
+    any other value is stored as its string form.
+
+    Args:
+        value: Python value
+
+    Returns:
+        dict: Value in DynamoDB format
+    """
+    holder = [None]
+    pending = [(holder, ((0, value),))]
+    while pending:
+        target, entries = pending.pop()
+        for key, entry in entries:
+            entry_type = type(entry)
+            if entry_type is str:
+                encoded = {'S': entry}
+            elif entry_type is int or entry_type is float:
+                encoded = {'N': str(entry)}
+            elif entry_type is dict:
+                children = {}
+                encoded = {'M': children}
+                pending.append((children, entry.items()))
+            elif entry_type is list:
+                children = [None] * len(entry)
+                encoded = {'L': children}
+                pending.append((children, enumerate(entry)))
+            else:
+                encoded = _serialize_other(entry, pending)
+            target[key] = encoded
+    return holder[0]
+
+
+def _serialize_other(entry, pending):
+    """Serialize values that aren't exactly one of the common types, including subclasses"""
+    # bool is checked before int since it is an int subclass
+    if isinstance(entry, bool):
+        return {'BOOL': entry}
+    if isinstance(entry, str):
+        return {'S': entry}
+    if isinstance(entry, (int, float)):
+        return {'N': str(entry)}
+    if isinstance(entry, dict):
+        children = {}
+        pending.append((children, entry.items()))
+        return {'M': children}
+    if isinstance(entry, list):
+        children = [None] * len(entry)
+        pending.append((children, enumerate(entry)))
+        return {'L': children}
+    return {'S': str(entry)}
+
+
+def _decode(root, root_entries, to_number):
+    """Decode (key, wire value) entries into root, then every nested map and list they contain"""
+    pending = [(root, root_entries)]
+    while pending:
+        target, entries = pending.pop()
+        for key, value in entries:
+            try:
+                (type_name, raw), = value.items()
+            except (AttributeError, ValueError):
+                raise TypeError('Value must be a nonempty dictionary whose key is a valid dynamodb type.')
+
+            if type_name == 'S':
+                decoded = raw
+            elif type_name == 'N':
+                decoded = to_number(raw)
+            elif type_name == 'M':
+                decoded = {}
+                pending.append((decoded, raw.items()))
+            elif type_name == 'L':
+                decoded = [None] * len(raw)
+                pending.append((decoded, enumerate(raw)))
+            elif type_name == 'BOOL':
+                decoded = raw
+            elif type_name == 'NULL':
+                decoded = None
+            elif type_name == 'SS':
+                decoded = set(raw)
+            elif type_name == 'NS':
+                decoded = set(map(_to_decimal, raw))
+            elif type_name == 'B':
+                decoded = Binary(raw)
+            elif type_name == 'BS':
+                decoded = set(map(Binary, raw))
+            else:
+                raise TypeError(f'Dynamodb type {type_name} is not supported')
+            target[key] = decoded
+
+
+def _to_decimal(raw):
+    return DYNAMODB_CONTEXT.create_decimal(raw)
+
+
+def _to_json_number(raw):
+    if '.' not in raw and 'e' not in raw and 'E' not in raw:
+        return int(raw)
+    number = Decimal(raw)
+    if number == number.to_integral_value():
+        return int(number)
+    return float(number)
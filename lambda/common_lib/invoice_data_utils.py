@@ -52,7 +52,9 @@ def update_invoice_effective_date(reference_number, reference_type, scheduled_da
             operation_data['effectiveDate'] = effective_date
             
             # Update the invoice analytics data
-            success = db_utils.update_invoice_analytics_data(invoice['invoiceId'], analytics_data)
+            success = db_utils.update_invoice_analytics_data(
+                invoice['invoiceId'], analytics_data, invoice.get('createdAt')
+            )
             if success:
                 print(f"Updated effectiveDate to {effective_date} for invoice {invoice['invoiceId']}")
                 return True
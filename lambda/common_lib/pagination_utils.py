@@ -0,0 +1,135 @@
+"""
+Pagination utilities for list APIs
+
+List APIs share one contract: a `limit` query parameter and an opaque `cursor`
+query parameter taken from the `nextCursor` of the previous page, with `hasMore`
+telling whether another page follows. A cursor wraps the DynamoDB resume
+position (query index and LastEvaluatedKey) of a db_utils page query and is
+signed with a key derived from SHARED_KEY. It is bound to the query criteria it
+was issued for and expires after CURSOR_TTL_SECONDS, so clients can't forge
+start keys or resume a different query.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+import request_utils as req
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CURSOR_TTL_SECONDS = 24 * 60 * 60
+
+_signing_key = {'key': None}
+
+
+def get_page_request(event, scope, default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE):
+    """
+    Read the page size and resume position of a list request
+
+    Args:
+        event: API Gateway event with the limit and cursor query parameters
+        scope: JSON-serializable query criteria the cursor must have been issued for
+        default_limit: Page size when no limit (or an invalid one) is given
+        max_limit: Largest page size; larger limits are clamped to it
+
+    Returns:
+        tuple: (limit, resume position or None for the first page)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    limit_param = req.get_query_param(event, 'limit') if event else None
+    try:
+        limit = int(limit_param) if limit_param else default_limit
+    except ValueError:
+        limit = default_limit
+    limit = min(max(limit, 1), max_limit)
+
+    cursor = req.get_query_param(event, 'cursor') if event else None
+    return limit, decode_cursor(cursor, scope)
+
+
+def get_page_fields(next_position, scope):
+    """Get the nextCursor and hasMore response fields for the position after a page"""
+    return {
+        'nextCursor': encode_cursor(next_position, scope),
+        'hasMore': next_position is not None
+    }
+
+
+def encode_cursor(position, scope):
+    """Encode and sign a resume position for the given query criteria (None stays None)"""
+    if position is None:
+        return None
+    payload = json.dumps({
+        'p': position,
+        's': _get_scope_digest(scope),
+        'e': int(time.time()) + CURSOR_TTL_SECONDS
+    }, separators=(',', ':')).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor, scope):
+    """
+    Verify a cursor created by encode_cursor and get its resume position
+
+    Args:
+        cursor: Cursor string (None or empty for the first page)
+        scope: Query criteria of the current request
+
+    Returns:
+        Resume position, or None for the first page
+
+    Raises:
+        ValueError: If the cursor is malformed, forged, expired or issued for other criteria
+    """
+    if not cursor:
+        return None
+    try:
+        payload_part, signature_part = cursor.split('.')
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid cursor")
+
+    data = json.loads(payload)
+    if data.get('e', 0) < time.time():
+        raise ValueError("Cursor has expired")
+    if data.get('s') != _get_scope_digest(scope):
+        raise ValueError("Cursor does not match the query parameters")
+    return data.get('p')
+
+
+def _get_scope_digest(scope):
+    encoded = json.dumps(scope, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def _sign(payload):
+    return hmac.new(_get_signing_key(), payload, hashlib.sha256).digest()[:16]
+
+
+def _get_signing_key():
+    if _signing_key['key'] is None:
+        shared_key = os.environ.get('SHARED_KEY')
+        if shared_key:
+            _signing_key['key'] = hmac.new(shared_key.encode(), b'pagination-cursor', hashlib.sha256).digest()
+        else:
+            # Cursors then only verify within this container
+            print("Warning: SHARED_KEY environment variable is not set, signing cursors with a temporary key")
+            _signing_key['key'] = secrets.token_bytes(32)
+    return _signing_key['key']
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
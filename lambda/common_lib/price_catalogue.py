@@ -0,0 +1,104 @@
+"""
+Price Catalogue
+
+This module loads the ServicePrices and ItemPrices tables once per Lambda
+container and serves pricing lookups by (serviceId, planId) and
+(categoryId, itemId) from memory, so pricing an order or appointment costs no
+DynamoDB round trips on a warm container.
+
+The catalogue is reloaded when the 'prices' counter in the CacheVersions table
+changes (incremented by the price tables' stream consumer), checked at most
+every VERSION_CHECK_SECONDS, and in any case after REFRESH_SECONDS.
+"""
+import time
+
+import db_utils as db
+
+CACHE_NAME = 'prices'
+REFRESH_SECONDS = 900
+VERSION_CHECK_SECONDS = 5
+
+# Loaded catalogue and its freshness; kept across warm invocations
+_state = {'catalogue': None, 'loaded_at': 0.0, 'version': None, 'checked_at': 0.0, 'failed_at': 0.0}
+
+
+class PriceCatalogue:
+    """In-memory service and item price records with keyed lookups"""
+
+    def __init__(self, service_prices, item_prices):
+        self.service_prices = service_prices
+        self.item_prices = item_prices
+        self._services = {
+            (int(record['serviceId']), int(record['planId'])): record
+            for record in service_prices if 'serviceId' in record and 'planId' in record
+        }
+        self._items = {
+            (int(record['categoryId']), int(record['itemId'])): record
+            for record in item_prices if 'categoryId' in record and 'itemId' in record
+        }
+
+    def get_service(self, service_id, plan_id):
+        """Get the service price record of a service plan, or None if unknown"""
+        key = _to_key(service_id, plan_id)
+        return self._services.get(key) if key else None
+
+    def get_item(self, category_id, item_id):
+        """Get the item price record of a category item, or None if unknown"""
+        key = _to_key(category_id, item_id)
+        return self._items.get(key) if key else None
+
+
+def get_catalogue():
+    """
+    Get the current price catalogue, loading or refreshing it when needed
+
+    Returns:
+        PriceCatalogue: Loaded catalogue, or None if the price tables couldn't be read
+    """
+    now = time.time()
+    catalogue = _state['catalogue']
+    if catalogue is not None and now - _state['loaded_at'] >= REFRESH_SECONDS:
+        catalogue = None
+
+    version = _state['version']
+    if db.CACHE_VERSIONS_TABLE and (catalogue is None or now - _state['checked_at'] >= VERSION_CHECK_SECONDS):
+        versions = db.get_cache_versions([CACHE_NAME])
+        if versions is not None:
+            _state['checked_at'] = now
+            version = versions.get(CACHE_NAME, 0)
+            if version != _state['version']:
+                catalogue = None
+
+    if catalogue is None:
+        # After a failed load, callers read single records until the retry delay has passed
+        if now - _state['failed_at'] < VERSION_CHECK_SECONDS:
+            return None
+        catalogue = _load()
+        if catalogue is None:
+            _state['failed_at'] = now
+            return None
+        _state.update(catalogue=catalogue, loaded_at=now, version=version)
+    return catalogue
+
+
+def invalidate():
+    """Drop the loaded catalogue so the next lookup reloads it"""
+    _state['catalogue'] = None
+
+
+def _load():
+    try:
+        service_prices = db.get_all_service_prices(raise_on_error=True)
+        item_prices = db.get_all_item_prices(raise_on_error=True)
+    except Exception as e:
+        print(f"Error loading price catalogue: {e}")
+        return None
+    print(f"Loaded price catalogue: {len(service_prices)} service prices, {len(item_prices)} item prices")
+    return PriceCatalogue(service_prices, item_prices)
+
+
+def _to_key(first_id, second_id):
+    try:
+        return int(first_id), int(second_id)
+    except (TypeError, ValueError):
+        return None
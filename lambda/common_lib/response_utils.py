@@ -10,21 +10,43 @@ response_headers = {
 
 def convert_decimal(obj):
     """Convert Decimal objects to float for JSON serialization"""
+    # Records deserialized with db_utils are already JSON-safe, so they are returned as they are
+    if not _contains_decimal(obj):
+        return obj
+    return _convert_decimal(obj)
+
+def _convert_decimal(obj):
     if isinstance(obj, list):
-        return [convert_decimal(i) for i in obj]
+        return [_convert_decimal(i) for i in obj]
     elif isinstance(obj, dict):
-        return {k: convert_decimal(v) for k, v in obj.items()}
+        return {k: _convert_decimal(v) for k, v in obj.items()}
     elif isinstance(obj, Decimal):
         return float(obj)
     return obj
 
+def _contains_decimal(obj):
+    """Check without copying whether any list or dict value below obj is a Decimal"""
+    pending = [obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Decimal):
+            return True
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, list):
+            pending.extend(value)
+    return False
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
 def safe_json_dumps(data):
     """Safely serialize data to JSON with proper error handling"""
     try:
-        # First convert any Decimal objects
-        converted_data = convert_decimal(data)
-        # Then serialize to JSON
-        return json.dumps(converted_data, default=str)
+        # Decimal objects are converted while serializing instead of copying the data first
+        return json.dumps(data, default=_json_default)
     except Exception as e:
         print(f"JSON serialization error: {str(e)}")
         print(f"Data type: {type(data)}")
@@ -0,0 +1,167 @@
+"""
+Staff Record Cache
+
+This module keeps staff records in an in-process TTL + LRU cache that survives
+warm Lambda invocations, keyed by both userEmail and userId, so permission checks
+and mechanic lookups don't query the Staff table on every request.
+
+Entries are invalidated across containers through the 'staff' counter in the
+CacheVersions table, which the Staff table stream consumer increments on every
+staff change. Each container re-reads the counter at most every
+VERSION_CHECK_SECONDS and drops every entry when it has changed.
+"""
+import copy
+import time
+from collections import OrderedDict
+
+import db_utils as db
+
+CACHE_NAME = 'staff'
+MAX_ENTRIES = 256
+TTL_SECONDS = 300
+VERSION_CHECK_SECONDS = 5
+
+KEY_EMAIL = 'userEmail'
+KEY_USER_ID = 'userId'
+
+# (key type, key value) -> (staff record, expires_at); kept across warm invocations
+_entries = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_version_state = {'version': None, 'checked_at': 0.0}
+
+
+def get_by_email(email, load):
+    """
+    Get a staff record by email, loading it on a cache miss
+
+    Args:
+        email: Staff user email
+        load: Function returning the staff record (or None) from the Staff table
+
+    Returns:
+        dict: Staff record, or None if not found
+    """
+    return _get(KEY_EMAIL, email, load)
+
+
+def get_by_user_id(user_id, load):
+    """Get a staff record by user ID, loading it on a cache miss (see get_by_email)"""
+    return _get(KEY_USER_ID, user_id, load)
+
+
+def get_many_by_user_id(user_ids, load_many):
+    """
+    Get the staff records of several user IDs, loading the uncached ones together
+
+    Args:
+        user_ids: List of staff user IDs
+        load_many: Function returning a dict of staff records keyed by user ID for a list of IDs
+
+    Returns:
+        dict: Staff records keyed by user ID (IDs without a record are omitted)
+    """
+    _check_version()
+    records = {}
+    missing = []
+    now = time.time()
+    for user_id in dict.fromkeys(user_ids):
+        if not user_id:
+            continue
+        key = (KEY_USER_ID, user_id)
+        entry = _entries.get(key)
+        if entry is not None and entry[1] > now:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            records[user_id] = copy.deepcopy(entry[0])
+        else:
+            _entries.pop(key, None)
+            _stats['misses'] += 1
+            missing.append(user_id)
+
+    if missing:
+        loaded = load_many(missing)
+        for user_id, record in loaded.items():
+            _store(record)
+            records[user_id] = record
+    return records
+
+
+def invalidate(email=None, user_id=None):
+    """Drop the cached record of a staff member under both of its keys"""
+    for key in ((KEY_EMAIL, email), (KEY_USER_ID, user_id)):
+        entry = _entries.pop(key, None) if key[1] else None
+        if entry:
+            _stats['invalidations'] += 1
+            record = entry[0]
+            _entries.pop((KEY_EMAIL, record.get('userEmail')), None)
+            _entries.pop((KEY_USER_ID, record.get('userId')), None)
+
+
+def clear():
+    """Drop every cached staff record"""
+    if _entries:
+        _stats['invalidations'] += 1
+    _entries.clear()
+
+
+def get_stats():
+    """Get the cache hit/miss counters of this container"""
+    lookups = _stats['hits'] + _stats['misses']
+    return dict(
+        _stats,
+        size=len(_entries),
+        hit_rate=round(_stats['hits'] / lookups, 3) if lookups else 0.0
+    )
+
+
+def _get(key_type, key_value, load):
+    if not key_value:
+        return load()
+
+    _check_version()
+    key = (key_type, key_value)
+    entry = _entries.get(key)
+    if entry is not None:
+        record, expires_at = entry
+        if expires_at > time.time():
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return copy.deepcopy(record)
+        del _entries[key]
+
+    _stats['misses'] += 1
+    record = load()
+    # Lookups that found nothing (or failed) aren't cached, so new staff are seen immediately
+    if record:
+        _store(record)
+    return record
+
+
+def _store(record):
+    expires_at = time.time() + TTL_SECONDS
+    stored = copy.deepcopy(record)
+    for key in ((KEY_EMAIL, record.get('userEmail')), (KEY_USER_ID, record.get('userId'))):
+        if key[1]:
+            _entries[key] = (stored, expires_at)
+            _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+def _check_version():
+    """Drop every entry when the shared staff cache version has changed"""
+    if not db.CACHE_VERSIONS_TABLE:
+        return
+    now = time.time()
+    if now - _version_state['checked_at'] < VERSION_CHECK_SECONDS:
+        return
+
+    versions = db.get_cache_versions([CACHE_NAME])
+    if versions is None:
+        # Keep serving entries (still bounded by their TTL) and retry on the next check
+        return
+    _version_state['checked_at'] = now
+    version = versions.get(CACHE_NAME, 0)
+    if version != _version_state['version']:
+        clear()
+        _version_state['version'] = version
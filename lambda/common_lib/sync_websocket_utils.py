@@ -188,22 +188,15 @@ def send_staff_notification(wsgw_client, notification_data, assigned_to=None, ex
         # Get staff connections
         staff_connections = db.get_assigned_or_all_staff_connections(assigned_to=assigned_to)
         
-        success_count = 0
-        total_count = 0
+        # Skip the connections of the excluded user
+        connection_ids = [
+            staff_connection.get('connectionId') for staff_connection in staff_connections
+            if not (exclude_user_id and staff_connection.get('userId') == exclude_user_id)
+        ]
         
-        for staff_connection in staff_connections:
-            # Skip if this connection should be excluded
-            if exclude_user_id and staff_connection.get('userId') == exclude_user_id:
-                continue
-                
-            total_count += 1
-            connection_id = staff_connection.get('connectionId')
-            if connection_id:
-                if wsgw.send_notification(wsgw_client, connection_id, notification_data):
-                    success_count += 1
-        
-        print(f"Sent staff notifications: {success_count}/{total_count} successful")
-        return success_count > 0
+        result = wsgw.send_notifications(wsgw_client, connection_ids, notification_data)
+        print(f"Sent staff notifications: {result['sent']}/{len(connection_ids)} successful")
+        return result['sent'] > 0
         
     except Exception as e:
         print(f"Error sending staff notifications: {str(e)}")
@@ -3,86 +3,179 @@ Unavailable Slots Manager for API operations
 
 This module provides managers for unavailable slots operations,
 including reading and updating slot availability.
+
+Time slots are handled as integer minutes since midnight in TimeSlotSet
+and are only formatted as "HH:MM-HH:MM" strings at the API boundary.
 """
 
-from datetime import datetime, timedelta, time
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+from heapq import merge as merge_sorted
 from zoneinfo import ZoneInfo
 
+import availability_index
 import db_utils as db
 import request_utils as req
 from exceptions import BusinessLogicError
 from data_access_utils import DataAccessManager
 
+# Same hours/minutes accepted by datetime.strptime('%H:%M')
+TIME_SLOT_PATTERN = re.compile(r'(2[0-3]|[01]\d|\d):([0-5]\d|\d)-(2[0-3]|[01]\d|\d):([0-5]\d|\d)')
+
 
 def parse_time_slot(slot_str):
-    """Parse a time slot string into start and end time objects"""
-    try:
-        start_str, end_str = slot_str.split('-')
-        start_time = datetime.strptime(start_str, '%H:%M').time()
-        end_time = datetime.strptime(end_str, '%H:%M').time()
-        return start_time, end_time
-    except ValueError:
+    """Parse a "HH:MM-HH:MM" time slot string into start and end minutes since midnight"""
+    parsed = _parse_time_slot(slot_str) if isinstance(slot_str, str) else None
+    if parsed is None:
         raise ValueError(f"Invalid time slot format: {slot_str}")
+    return parsed
+
+
+@lru_cache(maxsize=1024)
+def _parse_time_slot(slot_str):
+    match = TIME_SLOT_PATTERN.fullmatch(slot_str)
+    if not match:
+        return None
+    start_hour, start_minute, end_hour, end_minute = map(int, match.groups())
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
 
 
-def format_time_slot(start_time, end_time):
-    """Format start and end time objects into a time slot string"""
-    return f"{start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}"
+def format_time_slot(start_minute, end_minute):
+    """Format start and end minutes since midnight into a time slot string"""
+    return f"{start_minute // 60:02d}:{start_minute % 60:02d}-{end_minute // 60:02d}:{end_minute % 60:02d}"
 
 
-def time_slots_overlap(slot1_start, slot1_end, slot2_start, slot2_end):
-    """Check if two time slots overlap or are adjacent"""
-    # Convert to minutes for easier comparison
-    slot1_start_min = slot1_start.hour * 60 + slot1_start.minute
-    slot1_end_min = slot1_end.hour * 60 + slot1_end.minute
-    slot2_start_min = slot2_start.hour * 60 + slot2_start.minute
-    slot2_end_min = slot2_end.hour * 60 + slot2_end.minute
+def count_overlapping_slots(ranges, start_minute, end_minute):
+    """Count the (start, end) minute ranges that overlap or touch the given range"""
+    return sum(1 for range_start, range_end in ranges if range_start <= end_minute and range_end >= start_minute)
+
+
+class TimeSlotSet:
+    """
+    Set of time ranges stored as sorted start/end minute arrays
     
-    # Check if they overlap or are adjacent (touching)
-    return not (slot1_end_min < slot2_start_min or slot2_end_min < slot1_start_min)
+    Ranges are closed, so ranges that overlap or touch are merged by the
+    constructors and union. The ranges never overlap, although a subtraction
+    can leave two ranges sharing an endpoint (e.g. removing 10:00-10:00 from
+    09:00-12:00).
+    """
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts=None, ends=None):
+        self.starts = starts if starts is not None else []
+        self.ends = ends if ends is not None else []
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """Build a set from (start, end) minute ranges, merging overlapping and touching ranges"""
+        return cls._from_sorted_ranges(sorted(ranges))
+
+    @classmethod
+    def from_slots(cls, slots):
+        """Build a set from "HH:MM-HH:MM" strings, skipping invalid slots"""
+        ranges = []
+        for slot in slots:
+            try:
+                start_minute, end_minute = parse_time_slot(slot)
+            except ValueError as e:
+                print(f"Warning: Skipping invalid slot {slot}: {e}")
+                continue
+            if start_minute > end_minute:
+                print(f"Warning: Skipping slot {slot} that ends before it starts")
+                continue
+            ranges.append((start_minute, end_minute))
+        return cls.from_ranges(ranges)
 
-    # # Only count as overlap if there is a true intersection (not just touching)
-    # # i.e., [a, b) and [c, d) overlap iff a < d and c < b
-    # return slot1_start_min < slot2_end_min and slot2_start_min < slot1_end_min
+    @classmethod
+    def _from_sorted_ranges(cls, ranges):
+        starts = []
+        ends = []
+        for start_minute, end_minute in ranges:
+            if ends and start_minute <= ends[-1]:
+                if end_minute > ends[-1]:
+                    ends[-1] = end_minute
+            else:
+                starts.append(start_minute)
+                ends.append(end_minute)
+        return cls(starts, ends)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __eq__(self, other):
+        return isinstance(other, TimeSlotSet) and self.starts == other.starts and self.ends == other.ends
+
+    def to_slots(self):
+        """Format the ranges as "HH:MM-HH:MM" strings"""
+        return [format_time_slot(start_minute, end_minute) for start_minute, end_minute in self]
+
+    def union(self, other):
+        """Ranges covered by either set"""
+        return TimeSlotSet._from_sorted_ranges(merge_sorted(self, other))
+
+    def subtract(self, other):
+        """
+        Remove the ranges of another set, splitting partially covered ranges
+        
+        Only the interior of a removed range is taken out, so the remaining
+        pieces keep the removed range's endpoints.
+        """
+        starts = []
+        ends = []
+        other_starts, other_ends = other.starts, other.ends
+        for start_minute, end_minute in self:
+            current = start_minute
+            # Start at the first removed range ending after this range starts
+            index = bisect_right(other_ends, start_minute)
+            while index < len(other_starts) and other_starts[index] < end_minute:
+                if other_ends[index] > current:
+                    if current < other_starts[index]:
+                        starts.append(current)
+                        ends.append(other_starts[index])
+                    if other_ends[index] >= end_minute:
+                        current = None
+                        break
+                    current = other_ends[index]
+                index += 1
+            if current is not None:
+                starts.append(current)
+                ends.append(end_minute)
+        return TimeSlotSet(starts, ends)
+
+    def intersection(self, other):
+        """Ranges covered by both sets"""
+        starts = []
+        ends = []
+        index = other_index = 0
+        while index < len(self.starts) and other_index < len(other.starts):
+            start_minute = max(self.starts[index], other.starts[other_index])
+            end_minute = min(self.ends[index], other.ends[other_index])
+            if start_minute <= end_minute:
+                starts.append(start_minute)
+                ends.append(end_minute)
+            if self.ends[index] < other.ends[other_index]:
+                index += 1
+            else:
+                other_index += 1
+        return TimeSlotSet(starts, ends)
+
+    def overlaps(self, start_minute, end_minute):
+        """Check whether any range overlaps or touches the given range"""
+        return self.count_overlapping(start_minute, end_minute) > 0
+
+    def count_overlapping(self, start_minute, end_minute):
+        """Count the ranges that overlap or touch the given range"""
+        return max(0, bisect_right(self.starts, end_minute) - bisect_left(self.ends, start_minute))
 
 
 def merge_time_slots(slots):
     """Merge overlapping or adjacent time slots"""
-    if not slots:
-        return []
-    
-    # Parse all slots into (start_time, end_time) tuples
-    parsed_slots = []
-    for slot in slots:
-        try:
-            start_time, end_time = parse_time_slot(slot)
-            parsed_slots.append((start_time, end_time))
-        except ValueError as e:
-            print(f"Warning: Skipping invalid slot {slot}: {e}")
-            continue
-    
-    if not parsed_slots:
-        return []
-    
-    # Sort by start time
-    parsed_slots.sort(key=lambda x: (x[0].hour, x[0].minute))
-    
-    merged = []
-    current_start, current_end = parsed_slots[0]
-    
-    for start_time, end_time in parsed_slots[1:]:
-        if time_slots_overlap(current_start, current_end, start_time, end_time):
-            # Merge overlapping or adjacent slots
-            current_end = max(current_end, end_time, key=lambda t: t.hour * 60 + t.minute)
-        else:
-            # No overlap, add current slot and start new one
-            merged.append(format_time_slot(current_start, current_end))
-            current_start, current_end = start_time, end_time
-    
-    # Add the last slot
-    merged.append(format_time_slot(current_start, current_end))
-    
-    return merged
+    return TimeSlotSet.from_slots(slots).to_slots()
 
 
 def subtract_time_slots(existing_slots, slots_to_remove):
@@ -93,67 +186,7 @@ def subtract_time_slots(existing_slots, slots_to_remove):
     if not slots_to_remove:
         return existing_slots
     
-    # Parse existing slots
-    existing_parsed = []
-    for slot in existing_slots:
-        try:
-            start_time, end_time = parse_time_slot(slot)
-            existing_parsed.append((start_time, end_time))
-        except ValueError as e:
-            print(f"Warning: Skipping invalid existing slot {slot}: {e}")
-            continue
-    
-    # Parse slots to remove
-    remove_parsed = []
-    for slot in slots_to_remove:
-        try:
-            start_time, end_time = parse_time_slot(slot)
-            remove_parsed.append((start_time, end_time))
-        except ValueError as e:
-            print(f"Warning: Skipping invalid remove slot {slot}: {e}")
-            continue
-    
-    result = []
-    
-    for existing_start, existing_end in existing_parsed:
-        current_segments = [(existing_start, existing_end)]
-        
-        # For each slot to remove, check if it affects current segments
-        for remove_start, remove_end in remove_parsed:
-            new_segments = []
-            
-            for seg_start, seg_end in current_segments:
-                # Convert to minutes for easier comparison
-                seg_start_min = seg_start.hour * 60 + seg_start.minute
-                seg_end_min = seg_end.hour * 60 + seg_end.minute
-                remove_start_min = remove_start.hour * 60 + remove_start.minute
-                remove_end_min = remove_end.hour * 60 + remove_end.minute
-                
-                # Check if remove slot overlaps with current segment
-                if remove_end_min <= seg_start_min or remove_start_min >= seg_end_min:
-                    # No overlap, keep segment as is
-                    new_segments.append((seg_start, seg_end))
-                else:
-                    # There's overlap, split the segment
-                    # Add part before the remove slot (if any)
-                    if seg_start_min < remove_start_min:
-                        before_end_min = remove_start_min
-                        before_end = time(before_end_min // 60, before_end_min % 60)
-                        new_segments.append((seg_start, before_end))
-                    
-                    # Add part after the remove slot (if any)
-                    if seg_end_min > remove_end_min:
-                        after_start_min = remove_end_min
-                        after_start = time(after_start_min // 60, after_start_min % 60)
-                        new_segments.append((after_start, seg_end))
-            
-            current_segments = new_segments
-        
-        # Add remaining segments to result
-        for seg_start, seg_end in current_segments:
-            result.append(format_time_slot(seg_start, seg_end))
-    
-    return result
+    return TimeSlotSet.from_slots(existing_slots).subtract(TimeSlotSet.from_slots(slots_to_remove)).to_slots()
 
 
 class UnavailableSlotManager(DataAccessManager):
@@ -223,8 +256,85 @@ class UnavailableSlotManager(DataAccessManager):
         # Validate date format
         self.validate_date_parameter(date, 'date')
         
-        # Get manually unavailable slots
-        unavailable_slots_record = db.get_unavailable_slots(date)
+        unavailable_slots_records, scheduled_slots_by_date = self._load_dates([date])
+        return self._build_unavailable_slots(date, unavailable_slots_records.get(date), scheduled_slots_by_date[date])
+    
+    def _get_unavailable_slots_date_range(self, start_date, end_date):
+        """Get unavailable slots for a date range"""
+        # Validate date range
+        self.validate_date_range(start_date, end_date)
+        dates = self._get_dates_in_range(start_date, end_date)
+        
+        unavailable_slots_records, scheduled_slots_by_date = self._load_dates(dates)
+        result = {
+            date_str: self._build_unavailable_slots(
+                date_str, unavailable_slots_records.get(date_str), scheduled_slots_by_date[date_str]
+            )
+            for date_str in dates
+        }
+        
+        return {
+            'dateRange': {
+                'startDate': start_date,
+                'endDate': end_date
+            },
+            'unavailableSlotsByDate': result
+        }
+    
+    def _get_dates_in_range(self, start_date, end_date):
+        """Get every YYYY-MM-DD date from start_date to end_date (inclusive)"""
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        return [
+            (start_dt + timedelta(days=offset)).strftime('%Y-%m-%d')
+            for offset in range((end_dt - start_dt).days + 1)
+        ]
+    
+    def _load_dates(self, dates):
+        """
+        Load the manually set slots and the appointment slots of several dates
+        
+        Reads the availability index (one batch request for all dates) when it has
+        been built. Otherwise the manually set slots are read with one batch request,
+        the scheduled appointments with one query per date and the paid pending
+        appointments once (filtered and projected by DynamoDB), bucketed by date.
+        
+        Returns:
+            tuple: (unavailable slots records keyed by date, scheduled slots lists keyed by date)
+        """
+        indexed = availability_index.load_dates(dates)
+        if indexed is not None:
+            return indexed
+        
+        unavailable_slots_records = db.get_unavailable_slots_by_dates(dates) or {}
+        appointments_by_date = db.get_appointments_by_scheduled_dates(dates)
+        pending_slots_by_date = availability_index.get_pending_slots_by_date(db.get_paid_pending_appointments())
+        
+        scheduled_slots_by_date = {
+            date_str: (
+                availability_index.get_scheduled_slots(appointments_by_date.get(date_str, []))
+                + pending_slots_by_date.get(date_str, [])
+            )
+            for date_str in dates
+        }
+        return unavailable_slots_records, scheduled_slots_by_date
+    
+    def _build_unavailable_slots(self, date, unavailable_slots_record, scheduled_slots):
+        """Build the unavailable slots payload of a date from its record and scheduled slots"""
+        manually_unavailable_slots = self._get_manually_unavailable_slots(unavailable_slots_record)
+
+        # Merge both lists
+        all_unavailable_slots = self._merge_unavailable_slots(manually_unavailable_slots, scheduled_slots)
+
+        return {
+            'date': date,
+            'unavailableSlots': all_unavailable_slots,
+            'manuallyUnavailableSlots': manually_unavailable_slots,
+            'scheduledSlots': scheduled_slots
+        }
+    
+    def _get_manually_unavailable_slots(self, unavailable_slots_record):
+        """Get the manually set slots of an unavailable slots record as "HH:MM-HH:MM" strings"""
         manually_unavailable_slots = []
         
         if unavailable_slots_record and 'timeSlots' in unavailable_slots_record:
@@ -249,125 +359,7 @@ class UnavailableSlotManager(DataAccessManager):
                 except Exception as e:
                     print(f"Warning: Error processing manually unavailable slot {slot}: {str(e)}")
 
-        # Get scheduled appointment slots
-        scheduled_slots = self._get_scheduled_appointment_slots(date)
-
-        # Merge both lists
-        all_unavailable_slots = self._merge_unavailable_slots(manually_unavailable_slots, scheduled_slots)
-
-        return {
-            'date': date,
-            'unavailableSlots': all_unavailable_slots,
-            'manuallyUnavailableSlots': manually_unavailable_slots,
-            'scheduledSlots': scheduled_slots
-        }
-    
-    def _get_unavailable_slots_date_range(self, start_date, end_date):
-        """Get unavailable slots for a date range"""
-        # Validate date range
-        start_dt, end_dt = self.validate_date_range(start_date, end_date)
-        
-        # Process each date in range
-        result = {}
-        current_date = start_dt
-        
-        while current_date <= end_dt:
-            date_str = current_date.strftime('%Y-%m-%d')
-            result[date_str] = self._get_unavailable_slots_single_date(date_str)
-            current_date += timedelta(days=1)
-        
-        return {
-            'dateRange': {
-                'startDate': start_date,
-                'endDate': end_date
-            },
-            'unavailableSlotsByDate': result
-        }
-    
-    def _get_scheduled_appointment_slots(self, date):
-        """Get time slots that are scheduled for appointments on the given date"""
-        try:
-            scheduled_slots = []
-            
-            # Get appointments scheduled for this specific date
-            scheduled_appointments = db.get_appointments_by_scheduled_date(date)
-
-            for appointment in scheduled_appointments:
-                try:
-                    # Check if appointment is confirmed or pending (not cancelled or completed)
-                    status = appointment.get('status', '').upper() 
-                    appointment_id = appointment.get('appointmentId', 'unknown')
-                    
-                    if status not in ['CANCELLED', 'COMPLETED']:
-                        scheduled_time_slot = appointment.get('scheduledTimeSlot')
-                        if scheduled_time_slot and isinstance(scheduled_time_slot, dict):
-                            start_time = scheduled_time_slot.get('start')
-                            end_time = scheduled_time_slot.get('end')
-                            if start_time and end_time:
-                                time_slot = f"{start_time}-{end_time}"
-                                scheduled_slots.append({
-                                    'timeSlot': time_slot,
-                                    'reason': 'scheduled_appointment',
-                                    'appointmentId': appointment_id,
-                                    'status': status
-                                })
-                            else:
-                                print(f"Warning: Missing start/end time in scheduledTimeSlot for appointment {appointment_id}")
-                        else:
-                            print(f"Info: No scheduledTimeSlot for appointment {appointment_id} (status: {status})")
-                            
-                except Exception as e:
-                    print(f"Warning: Error processing scheduled appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
-
-            # Get pending appointments with paid status
-            pending_appointments = db.get_appointments_by_status('PENDING')
-            
-            for appointment in pending_appointments:
-                try:
-                    appointment_id = appointment.get('appointmentId', 'unknown')
-                    payment_status = appointment.get('paymentStatus', 'unknown')
-                    
-                    if appointment.get('paymentStatus') == 'paid':
-                        status = appointment.get('status', '').upper()
-                        selected_time_slots = appointment.get('selectedSlots')
-                        
-                        if selected_time_slots and isinstance(selected_time_slots, list):
-                            for slot in selected_time_slots:
-                                try:
-                                    if isinstance(slot, dict):
-                                        slot_date = slot.get('date')
-                                        slot_priority = slot.get('priority')
-                                        
-                                        if slot_date == date and slot_priority and int(slot_priority) == 1:
-                                            start_time = slot.get('start')
-                                            end_time = slot.get('end')
-                                            if start_time and end_time:
-                                                time_slot = f"{start_time}-{end_time}"
-                                                scheduled_slots.append({
-                                                    'timeSlot': time_slot,
-                                                    'reason': 'pending_appointment',
-                                                    'appointmentId': appointment_id,
-                                                    'status': status
-                                                })
-                                            else:
-                                                print(f"Warning: Missing start/end time in selected slot for appointment {appointment_id}")
-                                    else:
-                                        print(f"Warning: Invalid slot format in selectedSlots for appointment {appointment_id}")
-                                except Exception as e:
-                                    print(f"Warning: Error processing slot for appointment {appointment_id}: {str(e)}")
-                        else:
-                            print(f"Info: No valid selectedSlots for paid pending appointment {appointment_id}")
-                            
-                except Exception as e:
-                    print(f"Warning: Error processing pending appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
-
-            return scheduled_slots
-            
-        except Exception as e:
-            print(f"Error getting scheduled appointments for {date}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return []
+        return manually_unavailable_slots
     
     def _merge_unavailable_slots(self, manually_unavailable, scheduled_slots):
         """Merge manually unavailable slots and scheduled appointment slots"""
@@ -436,103 +428,22 @@ class UnavailableSlotManager(DataAccessManager):
         except ValueError as e:
             raise BusinessLogicError(f"Invalid timeslot format: {str(e)}", 400)
         
-        # Get manually unavailable slots
-        unavailable_slots_record = db.get_unavailable_slots(date)
-        manually_unavailable_slots = []
+        unavailable_slots_records, scheduled_slots_by_date = self._load_dates([date])
         
-        if unavailable_slots_record and 'timeSlots' in unavailable_slots_record:
-            raw_time_slots = unavailable_slots_record['timeSlots']
-            
-            # Convert time slots to consistent format
-            for slot in raw_time_slots:
-                try:
-                    if isinstance(slot, str):
-                        # Already in "HH:MM-HH:MM" format
-                        manually_unavailable_slots.append(slot)
-                    elif isinstance(slot, dict):
-                        # Convert from object format
-                        if 'startTime' in slot and 'endTime' in slot:
-                            time_slot = f"{slot['startTime']}-{slot['endTime']}"
-                            manually_unavailable_slots.append(time_slot)
-                        elif 'start' in slot and 'end' in slot:
-                            time_slot = f"{slot['start']}-{slot['end']}"
-                            manually_unavailable_slots.append(time_slot)
-                        else:
-                            print(f"Warning: Unknown manually set slot format: {slot}")
-                except Exception as e:
-                    print(f"Warning: Error processing manually unavailable slot {slot}: {str(e)}")
-
         # Check if requested timeslot overlaps with manually blocked slots
-        blocked = False
-        for slot_str in manually_unavailable_slots:
-            try:
-                manual_start, manual_end = parse_time_slot(slot_str)
-                if time_slots_overlap(check_start, check_end, manual_start, manual_end):
-                    blocked = True
-                    break
-            except ValueError as e:
-                print(f"Warning: Invalid manually unavailable slot format {slot_str}: {e}")
-                continue
-
-        # Count appointments that overlap with requested timeslot
-        appointments_count = 0
-        
-        # Get scheduled appointment slots (confirmed appointments)
-        scheduled_appointments = db.get_appointments_by_scheduled_date(date)
-        for appointment in scheduled_appointments:
-            try:
-                # Check if appointment is confirmed or pending (not cancelled or completed)
-                status = appointment.get('status', '').upper() 
-                
-                if status not in ['CANCELLED', 'COMPLETED']:
-                    scheduled_time_slot = appointment.get('scheduledTimeSlot')
-                    if scheduled_time_slot and isinstance(scheduled_time_slot, dict):
-                        start_time = scheduled_time_slot.get('start')
-                        end_time = scheduled_time_slot.get('end')
-                        if start_time and end_time:
-                            try:
-                                appt_start, appt_end = parse_time_slot(f"{start_time}-{end_time}")
-                                if time_slots_overlap(check_start, check_end, appt_start, appt_end):
-                                    appointments_count += 1
-                            except ValueError as e:
-                                print(f"Warning: Invalid scheduled appointment slot format {start_time}-{end_time}: {e}")
-                        
-            except Exception as e:
-                print(f"Warning: Error processing scheduled appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
+        manually_unavailable_slots = self._get_manually_unavailable_slots(unavailable_slots_records.get(date))
+        blocked = TimeSlotSet.from_slots(manually_unavailable_slots).overlaps(check_start, check_end)
 
-        # Get pending appointments with paid status (priority 1 slots)
-        pending_appointments = db.get_appointments_by_status('PENDING')
-        for appointment in pending_appointments:
+        # Count scheduled appointments and paid pending appointments (priority 1 slots)
+        # that overlap with requested timeslot
+        appointment_slots = scheduled_slots_by_date[date]
+        appointment_ranges = []
+        for slot in appointment_slots:
             try:
-                appointment_id = appointment.get('appointmentId', 'unknown')
-                payment_status = appointment.get('paymentStatus', 'unknown')
-                
-                if appointment.get('paymentStatus') == 'paid':
-                    selected_time_slots = appointment.get('selectedSlots')
-                    
-                    if selected_time_slots and isinstance(selected_time_slots, list):
-                        for slot in selected_time_slots:
-                            try:
-                                if isinstance(slot, dict):
-                                    slot_date = slot.get('date')
-                                    slot_priority = slot.get('priority')
-                                    
-                                    if slot_date == date and slot_priority and int(slot_priority) == 1:
-                                        start_time = slot.get('start')
-                                        end_time = slot.get('end')
-                                        if start_time and end_time:
-                                            try:
-                                                pending_start, pending_end = parse_time_slot(f"{start_time}-{end_time}")
-                                                if time_slots_overlap(check_start, check_end, pending_start, pending_end):
-                                                    appointments_count += 1
-                                            except ValueError as e:
-                                                print(f"Warning: Invalid pending appointment slot format {start_time}-{end_time}: {e}")
-                                        
-                            except Exception as e:
-                                print(f"Warning: Error processing slot for appointment {appointment_id}: {str(e)}")
-                        
-            except Exception as e:
-                print(f"Warning: Error processing pending appointment {appointment.get('appointmentId', 'unknown')}: {str(e)}")
+                appointment_ranges.append(parse_time_slot(slot['timeSlot']))
+            except ValueError as e:
+                print(f"Warning: Invalid appointment slot format for appointment {slot['appointmentId']}: {e}")
+        appointments_count = count_overlapping_slots(appointment_ranges, check_start, check_end)
         
         return {
             'date': date,
@@ -599,61 +510,13 @@ class UnavailableSlotManager(DataAccessManager):
             if not isinstance(time_slots, list):
                 raise BusinessLogicError("timeSlots must be an array", 400)
             
-            # Get current slots
+            # Get current slots and convert current and input slots to consistent string format
             current_record = db.get_unavailable_slots(date)
-            raw_current_slots = current_record.get('timeSlots', []) if current_record else []
-            
-            # Convert current slots to consistent string format
-            current_slots = []
-            for slot in raw_current_slots:
-                try:
-                    if isinstance(slot, str):
-                        current_slots.append(slot)
-                    elif isinstance(slot, dict):
-                        if 'startTime' in slot and 'endTime' in slot:
-                            time_slot = f"{slot['startTime']}-{slot['endTime']}"
-                            current_slots.append(time_slot)
-                        elif 'start' in slot and 'end' in slot:
-                            time_slot = f"{slot['start']}-{slot['end']}"
-                            current_slots.append(time_slot)
-                        else:
-                            print(f"Warning: Unknown current slot format: {slot}")
-                    else:
-                        print(f"Warning: Unexpected slot type {type(slot)}: {slot}")
-                except Exception as e:
-                    print(f"Warning: Error processing current slot {slot}: {str(e)}")
-            
-            # Convert input time_slots to consistent string format
-            normalized_time_slots = []
-            for slot in time_slots:
-                try:
-                    if isinstance(slot, str):
-                        normalized_time_slots.append(slot)
-                    elif isinstance(slot, dict):
-                        if 'startTime' in slot and 'endTime' in slot:
-                            time_slot = f"{slot['startTime']}-{slot['endTime']}"
-                            normalized_time_slots.append(time_slot)
-                        elif 'start' in slot and 'end' in slot:
-                            time_slot = f"{slot['start']}-{slot['end']}"
-                            normalized_time_slots.append(time_slot)
-                        else:
-                            print(f"Warning: Unknown input slot format: {slot}")
-                    else:
-                        print(f"Warning: Unexpected input slot type {type(slot)}: {slot}")
-                except Exception as e:
-                    print(f"Warning: Error processing input slot {slot}: {str(e)}")
+            current_slots = self._normalize_time_slots(current_record.get('timeSlots', []) if current_record else [], 'current')
+            normalized_time_slots = self._normalize_time_slots(time_slots, 'input')
             
             # Apply operation with smart slot handling
-            if operation == 'set':
-                # For set operation, just use the new slots (after merging)
-                new_slots = merge_time_slots(normalized_time_slots)
-            elif operation == 'add':
-                # For add operation, merge existing and new slots
-                all_slots = current_slots + normalized_time_slots
-                new_slots = merge_time_slots(all_slots)
-            elif operation == 'remove':
-                # For remove operation, subtract slots from existing ones
-                new_slots = subtract_time_slots(current_slots, normalized_time_slots)
+            new_slots = self._apply_slot_operation(operation, current_slots, normalized_time_slots)
             
             # Update database
             staff_user_id = staff_context['staff_user_id']
@@ -672,13 +535,14 @@ class UnavailableSlotManager(DataAccessManager):
             raise BusinessLogicError(f"Invalid operation: {operation}. Must be 'get', 'set', 'add', or 'remove'", 400)
     
     def _update_unavailable_slots_date_range(self, start_date, end_date, operation, time_slots, staff_context):
-        """Update unavailable slots for a date range"""
-        # Validate date range - note: this returns timestamps, not datetime objects
-        start_timestamp, end_timestamp = self.validate_date_range(start_date, end_date)
+        """
+        Update unavailable slots for a date range
         
-        # Convert timestamps back to datetime objects for iteration
-        start_dt = datetime.fromtimestamp(start_timestamp, ZoneInfo('Australia/Perth'))
-        end_dt = datetime.fromtimestamp(end_timestamp, ZoneInfo('Australia/Perth'))
+        The current slots of every date are read with one batch request, the new
+        slots are computed in memory and written back with chunked batch writes.
+        """
+        # Validate date range
+        self.validate_date_range(start_date, end_date)
         
         if operation == 'get':
             return self._get_unavailable_slots_date_range(start_date, end_date)
@@ -687,23 +551,48 @@ class UnavailableSlotManager(DataAccessManager):
             if not time_slots:
                 raise BusinessLogicError("timeSlots parameter is required for set/add/remove operations", 400)
             
+            if not isinstance(time_slots, list):
+                raise BusinessLogicError("timeSlots must be an array", 400)
+            
+            dates = self._get_dates_in_range(start_date, end_date)
+            current_records = db.get_unavailable_slots_by_dates(dates)
+            if current_records is None:
+                raise BusinessLogicError("Failed to read the current unavailable slots", 500)
+            
+            normalized_time_slots = self._normalize_time_slots(time_slots, 'input')
+            staff_user_id = staff_context['staff_user_id']
+            timestamp = datetime.now(ZoneInfo('Australia/Perth')).isoformat()
+            
             # Apply operation to each date in range
             results = {}
-            current_date = start_dt
-            
-            while current_date <= end_dt:
-                date_str = current_date.strftime('%Y-%m-%d')
+            new_slots_by_date = {}
+            for date_str in dates:
                 try:
-                    result = self._update_unavailable_slots_single_date(
-                        date_str, operation, time_slots, staff_context
+                    current_record = current_records.get(date_str)
+                    current_slots = self._normalize_time_slots(
+                        current_record.get('timeSlots', []) if current_record else [], 'current'
                     )
-                    results[date_str] = result
+                    new_slots = self._apply_slot_operation(operation, current_slots, normalized_time_slots)
+                    new_slots_by_date[date_str] = new_slots
+                    results[date_str] = {
+                        'date': date_str,
+                        'operation': operation,
+                        'previousSlots': current_slots,
+                        'newSlots': new_slots,
+                        'updatedBy': staff_user_id,
+                        'timestamp': timestamp
+                    }
                 except Exception as e:
                     results[date_str] = {
                         'error': str(e),
                         'date': date_str
                     }
-                current_date += timedelta(days=1)
+            
+            for date_str in db.update_unavailable_slots_by_dates(new_slots_by_date, staff_user_id):
+                results[date_str] = {
+                    'error': f"Failed to update unavailable slots for {date_str}",
+                    'date': date_str
+                }
             
             return {
                 'dateRange': {
@@ -712,12 +601,46 @@ class UnavailableSlotManager(DataAccessManager):
                 },
                 'operation': operation,
                 'results': results,
-                'updatedBy': staff_context['staff_user_id'],
-                'timestamp': datetime.now(ZoneInfo('Australia/Perth')).isoformat()
+                'updatedBy': staff_user_id,
+                'timestamp': timestamp
             }
         
         else:
             raise BusinessLogicError(f"Invalid operation: {operation}. Must be 'get', 'set', 'add', or 'remove'", 400)
+    
+    def _normalize_time_slots(self, raw_slots, description):
+        """Convert time slots in string or object format to "HH:MM-HH:MM" strings"""
+        normalized_slots = []
+        for slot in raw_slots:
+            try:
+                if isinstance(slot, str):
+                    normalized_slots.append(slot)
+                elif isinstance(slot, dict):
+                    if 'startTime' in slot and 'endTime' in slot:
+                        time_slot = f"{slot['startTime']}-{slot['endTime']}"
+                        normalized_slots.append(time_slot)
+                    elif 'start' in slot and 'end' in slot:
+                        time_slot = f"{slot['start']}-{slot['end']}"
+                        normalized_slots.append(time_slot)
+                    else:
+                        print(f"Warning: Unknown {description} slot format: {slot}")
+                else:
+                    print(f"Warning: Unexpected {description} slot type {type(slot)}: {slot}")
+            except Exception as e:
+                print(f"Warning: Error processing {description} slot {slot}: {str(e)}")
+        return normalized_slots
+    
+    def _apply_slot_operation(self, operation, current_slots, time_slots):
+        """Apply a set, add or remove operation to a date's current slots"""
+        if operation == 'set':
+            # For set operation, just use the new slots (after merging)
+            return merge_time_slots(time_slots)
+        elif operation == 'add':
+            # For add operation, merge existing and new slots
+            return merge_time_slots(current_slots + time_slots)
+        else:
+            # For remove operation, subtract slots from existing ones
+            return subtract_time_slots(current_slots, time_slots)
 
 
 def get_unavailable_slot_manager():
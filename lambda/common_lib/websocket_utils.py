@@ -93,17 +93,14 @@ class ConnectionManager(WebSocketManager):
             "lastSeen": str(int(datetime.now(ZoneInfo('Australia/Perth')).timestamp()))
         }
 
-        # delete all uninitialized connections
-        db.delete_all_uninitialized_connections()
-        
         if not connection_item.get('staff'):
             db.update_user_disconnected_time(user_id)
             user_record = db.get_user_record(user_id)
             assigned_to = user_record.get('assignedTo') if user_record else ''
             staff_connections = db.get_assigned_or_all_staff_connections(assigned_to)
-            for connection in staff_connections:
-                staff_conn_id = connection.get('connectionId')
-                wsgw.send_notification(wsgw_client, staff_conn_id, message_body)
+            wsgw.send_notifications(
+                wsgw_client, [connection.get('connectionId') for connection in staff_connections], message_body
+            )
 
         print(f"Connection closed for connectionId: {connection_id} with userId: {user_id}")
         return {"statusCode": 200}
@@ -193,10 +190,9 @@ class UserInitManager(WebSocketManager):
         }
         receivers = db.get_assigned_or_all_staff_connections(assigned_to=assigned_to)
         if receivers:
-            for staff_conn in receivers:
-                if staff_conn and staff_conn.get('connectionId'):
-                    staff_conn_id = staff_conn.get('connectionId')
-                    wsgw.send_notification(wsgw_client, staff_conn_id, message_body)
+            wsgw.send_notifications(
+                wsgw_client, [staff_conn.get('connectionId') for staff_conn in receivers if staff_conn], message_body
+            )
         
         # Send success notification to user
         user_data = {
@@ -1,4 +1,6 @@
-import boto3, os, json
+import boto3, os, json, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # Environment variables
@@ -7,7 +9,37 @@ WEBSOCKET_API_ID = os.environ.get('WEBSOCKET_API_ID')
 AWS_REGION = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'production')
 
+# Concurrent posts of a fan-out; also the connection pool size of the clients
+FANOUT_MAX_WORKERS = 10
+
+# Delivery statuses of a post to a connection
+STATUS_SENT = 'sent'
+STATUS_GONE = 'gone'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_ERROR = 'error'
+STALE_STATUSES = (STATUS_GONE, STATUS_NOT_FOUND)
+
+# Shared by every client: a pool large enough for a full fan-out, kept-alive connections
+# and short timeouts, since a post to a connection is a small request
+CLIENT_CONFIG = Config(
+    max_pool_connections=FANOUT_MAX_WORKERS,
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=5,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+# Endpoint URL -> API Gateway Management API client; kept across warm invocations
+_clients = {}
+_clients_lock = threading.Lock()
+
 def get_apigateway_client(domain=None):
+    """
+    Get the API Gateway Management API client of the WebSocket endpoint
+    
+    Clients are created once per endpoint URL and reused for the life of the
+    container, keeping their pooled connections open between invocations.
+    """
     try:
         if WEBSOCKET_ENDPOINT_URL:
             endpoint_url = WEBSOCKET_ENDPOINT_URL
@@ -20,35 +52,105 @@ def get_apigateway_client(domain=None):
         else:
             print("Error: No WebSocket endpoint URL or API ID configured")
             return None
-            
-        print(f"Creating API Gateway Management client with endpoint: {endpoint_url}")
-        return boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+        
+        client = _clients.get(endpoint_url)
+        if client is None:
+            with _clients_lock:
+                client = _clients.get(endpoint_url)
+                if client is None:
+                    print(f"Creating API Gateway Management client with endpoint: {endpoint_url}")
+                    client = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url, config=CLIENT_CONFIG)
+                    _clients[endpoint_url] = client
+        return client
     except Exception as e:
         print(f"Error creating API Gateway Management client: {e}")
         return None
 
 def send_notification(client, connection_id, data):
+    status = _post_to_connection(client, connection_id, json.dumps(data))
+    if status == STATUS_SENT:
+        print(f"Notification sent to {connection_id}")
+        return True
+    if status in STALE_STATUSES:
+        # Clean up stale connection from database
+        import db_utils as db
+        db.delete_connection(connection_id)
+    return False
+
+def send_notifications(client, connection_ids, data):
+    """
+    Send the same notification to several connections concurrently
+    
+    The payload is serialized once and posted over a bounded thread pool sharing
+    the client's connection pool. Connections that are gone are deleted together
+    in batches afterwards.
+    
+    Args:
+        client: API Gateway Management API client
+        connection_ids: WebSocket connection IDs (duplicates and empty IDs are skipped)
+        data: Notification data to send
+    
+    Returns:
+        dict: Per-connection results ({'connection_id', 'status', 'elapsed_ms'}) with the
+              sent, failed and stale counts and the total elapsed seconds
+    """
+    started = time.perf_counter()
+    connection_ids = [connection_id for connection_id in dict.fromkeys(connection_ids) if connection_id]
+    payload = json.dumps(data)
+
+    def post(connection_id):
+        post_started = time.perf_counter()
+        try:
+            status = _post_to_connection(client, connection_id, payload)
+        except Exception as e:
+            print(f"Error sending notification to {connection_id}: {e}")
+            status = STATUS_ERROR
+        return {
+            'connection_id': connection_id,
+            'status': status,
+            'elapsed_ms': round((time.perf_counter() - post_started) * 1000, 1)
+        }
+
+    if len(connection_ids) > 1:
+        with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(connection_ids))) as executor:
+            results = list(executor.map(post, connection_ids))
+    else:
+        results = [post(connection_id) for connection_id in connection_ids]
+
+    stale_ids = [result['connection_id'] for result in results if result['status'] in STALE_STATUSES]
+    if stale_ids:
+        import db_utils as db
+        db.delete_connections(stale_ids)
+
+    summary = {
+        'results': results,
+        'sent': sum(1 for result in results if result['status'] == STATUS_SENT),
+        'failed': sum(1 for result in results if result['status'] != STATUS_SENT),
+        'stale': len(stale_ids),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
+    print(f"Sent notification to {summary['sent']}/{len(results)} connections "
+          f"({summary['stale']} stale) in {summary['elapsed_seconds']}s")
+    return summary
+
+def _post_to_connection(client, connection_id, payload):
+    """Post a serialized payload to a connection and return the delivery status"""
     try:
         client.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps(data)
+            Data=payload
         )
-        print(f"Notification sent to {connection_id}")
-        return True
+        return STATUS_SENT
     except ClientError as e:
         error_code = e.response['Error']['Code']
         if error_code == 'GoneException':
             print(f"Connection {connection_id} is no longer available (GoneException).")
-            # Clean up stale connection from database
-            import db_utils as db
-            db.delete_connection(connection_id)
+            return STATUS_GONE
         elif error_code == 'NotFoundException':
             print(f"Connection {connection_id} not found (NotFoundException). The WebSocket API endpoint may be incorrect.")
             print(f"Error details: {e}")
-            # Also clean up the stale connection
-            import db_utils as db
-            db.delete_connection(connection_id)
+            return STATUS_NOT_FOUND
         else:
             print(f"Error sending notification to {connection_id}: {e}")
             print(f"Error code: {error_code}")
-        return False
+        return STATUS_ERROR
@@ -0,0 +1,38 @@
+import db_utils as db
+import price_catalogue
+import staff_cache
+
+# Table name prefix (before '-<environment>') -> cache invalidated by its changes
+STREAM_CACHE_NAMES = {
+    'Staff': staff_cache.CACHE_NAME,
+    'ServicePrices': price_catalogue.CACHE_NAME,
+    'ItemPrices': price_catalogue.CACHE_NAME,
+}
+
+def lambda_handler(event, context):
+    """
+    Invalidate in-memory caches when their source tables change
+
+    Consumes DynamoDB stream records and increments the CacheVersions counter of
+    each affected cache once per batch. Failures are raised so the batch is retried.
+    """
+    cache_names = []
+    for record in event.get('Records', []):
+        cache_name = get_cache_name(record.get('eventSourceARN', ''))
+        if cache_name and cache_name not in cache_names:
+            cache_names.append(cache_name)
+
+    for cache_name in cache_names:
+        if not db.increment_cache_version(cache_name):
+            raise Exception(f"Failed to invalidate cache {cache_name}")
+
+    print(f"Processed {len(event.get('Records', []))} stream records, invalidated caches: {cache_names}")
+    return {'invalidated': cache_names}
+
+def get_cache_name(event_source_arn):
+    """Get the cache fed by the table of a stream ARN (arn:...:table/<Table>-<env>/stream/...)"""
+    try:
+        table_name = event_source_arn.split(':table/', 1)[1].split('/', 1)[0]
+    except IndexError:
+        return None
+    return STREAM_CACHE_NAMES.get(table_name.rsplit('-', 1)[0])
@@ -61,9 +61,10 @@ def get_staff_fcm_tokens(staff_user_ids):
     tokens = []
     
     try:
+        # Get the staff records holding the FCM tokens in one bulk lookup
+        staff_records = db.get_staff_by_user_ids(staff_user_ids)
         for staff_user_id in staff_user_ids:
-            # Get staff record to retrieve FCM token
-            staff_record = db.get_staff_record_by_user_id(staff_user_id)
+            staff_record = staff_records.get(staff_user_id)
             if staff_record:
                 staff_record = resp.convert_decimal(staff_record)
                 fcm_token = staff_record.get('fcmToken')
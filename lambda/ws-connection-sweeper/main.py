@@ -0,0 +1,10 @@
+import db_utils as db
+
+def lambda_handler(event, context):
+    """
+    Remove stale WebSocket connections on a schedule
+
+    Deletes connections that were never initialized or have expired, in batches,
+    so the disconnect handler no longer scans the Connections table.
+    """
+    return db.sweep_stale_connections()
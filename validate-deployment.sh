@@ -544,7 +544,7 @@ validate_deployment() {
         "api-get-inquiries" "api-create-inquiry"
         "api-get-upload-url" "api-get-analytics" "api-get-staff-roles"
         "api-notify" "api-take-user" "api-get-connections" "api-get-messages" "api-get-last-messages" "api-send-message"
-        "ws-connect" "ws-disconnect" "ws-init" "ws-ping" "ws-staff-init"
+        "ws-connect" "ws-disconnect" "ws-init" "ws-ping" "ws-staff-init" "ws-connection-sweeper"
         "sqs-process-invoice-queue"
     )
     